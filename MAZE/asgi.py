@@ -2,6 +2,7 @@
 ASGI config for MAZE project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+/evs/live (server-sent events) is answered here, every other path goes to Django.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.0/howto/deployment/asgi/
@@ -13,4 +14,14 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'MAZE.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from evs.live import live_application
+
+
+async def application(scope, receive, send):
+    # Django 4.0 iterates streaming responses synchronously, so long-lived event streams bypass it
+    if scope["type"] == "http" and scope["path"] == "/evs/live":
+        return await live_application(scope, receive, send)
+
+    return await django_application(scope, receive, send)
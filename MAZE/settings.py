@@ -159,7 +159,69 @@ APPEND_SLASH = False
 
 LOGGING = LOGGING
 
+# EvCharger API crawling
+EV_API_MAX_WORKERS  = 6
+EV_API_MAX_RETRIES  = 4
+EV_API_TIMEOUT      = (5, 60)
+EV_API_BACKOFF_BASE = 1
+EV_API_BACKOFF_MAX  = 30
+
+# ingestion run telemetry; a run is flagged once it uses INGESTION_ALERT_RATIO of its cron period (seconds)
+INGESTION_RUN_PERIODS = {
+    "charger_status"        : 10 * 60,
+    "stations_and_chargers" : 7 * 24 * 60 * 60
+}
+INGESTION_ALERT_RATIO = 0.8
+
+# pages checkpointed by a failed run are not fetched again by the runs that follow within this many seconds
+# of its start. charger_status never resumes: getChargerStatus returns the changes of the last 10 minutes
+# (its `period`), so the pages of a later run hold other rows, and a rerun fetches the whole window again
+INGESTION_RESUME_SECONDS = {
+    "stations_and_chargers" : 24 * 60 * 60
+}
+
+# charger_histories retention; raw rows are kept for CHARGER_HISTORY_RETENTION_DAYS, rolled up per hour and per day
+CHARGER_HISTORY_RETENTION_DAYS              = 30
+CHARGER_HISTORY_PARTITIONS_AHEAD            = 7
+CHARGER_STATUS_HOURLY_ROLLUP_RETENTION_DAYS = 14
+
+# region_snapshots, one row per region at the end of every ingestion run
+REGION_SNAPSHOT_RETENTION_DAYS = 90
+
+# data versions bumped by the cron jobs and read by the web processes (see core.versions)
+DATA_VERSION_DIR = os.path.join(BASE_DIR, "versions")
+
+# manage.py test keeps its data versions in a temporary DATA_VERSION_DIR
+TEST_RUNNER = "core.runner.TestRunner"
+
+# per-process tile cache of the map views (see core.tiles)
+MAP_TILE_CACHE_BYTES = 64 * 1024 * 1024
+MAP_TILE_MIN_ZOOM    = 8
+MAP_TILE_MAX_ZOOM    = 16
+MAP_TILE_MAX_TILES   = 16
+
+# mode=clusters groups the map into about MAP_CLUSTER_GRID x MAP_CLUSTER_GRID cells once the viewport diagonal exceeds MAP_CLUSTER_MIN_KM
+MAP_CLUSTER_MIN_KM = 20
+MAP_CLUSTER_GRID   = 8
+
+# /evs/changes; tokens lag the clock by DELTA_SYNC_OVERLAP_SECONDS, older tokens with too many changes must reload the map
+DELTA_SYNC_OVERLAP_SECONDS = 60
+DELTA_SYNC_MAX_CHANGES     = 5000
+
+# /evs/live, served by MAZE.asgi only; every server process checks the "evs" data version every LIVE_POLL_SECONDS
+# and subscriptions are indexed by LIVE_CELL_SIZE degree cells, a viewport may cover at most LIVE_MAX_CELLS of them
+LIVE_POLL_SECONDS      = 1
+LIVE_KEEPALIVE_SECONDS = 15
+LIVE_CELL_SIZE         = 0.1
+LIVE_MAX_CELLS         = 400
+LIVE_QUEUE_SIZE        = 32
+
+# station_cafes links every cafe within the largest radius (m) to a station, /evs/with-cafes accepts any of them
+STATION_CAFE_RADII_M = (100, 300, 500)
+
 CRONJOBS = [
     ('*/10 * * * *', 'evs.charger_history.UpdateChargerHistory', '>> '+os.path.join(BASE_DIR,'evs/crontab_charger_histories.log'+' 2>&1')),
-    ("00 00 * * 7", 'evs.station_charger.update_stations_and_chargers', '>> '+os.path.join(BASE_DIR,'evs/crontab_stations_and_chargers.log'+' 2>&1'))
+    ("00 00 * * 7", 'evs.station_charger.update_stations_and_chargers', '>> '+os.path.join(BASE_DIR,'evs/crontab_stations_and_chargers.log'+' 2>&1')),
+    ('05 * * * *', 'evs.history_maintenance.maintain_charger_histories', '>> '+os.path.join(BASE_DIR,'evs/crontab_history_maintenance.log'+' 2>&1')),
+    ('30 04 * * *', 'django.core.management.call_command', ['check_station_summaries'], {'repair': True}, '>> '+os.path.join(BASE_DIR,'evs/crontab_station_summaries.log'+' 2>&1'))
 ]
\ No newline at end of file
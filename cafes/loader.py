@@ -0,0 +1,146 @@
+import csv
+import json
+
+from enum import Enum
+
+from django.db import transaction
+
+from cafes.models   import Cafe
+from commons.models import Region, Category
+from core.geo       import grid_cell
+from core.utils     import chunked, bulk_upsert
+from evs.proximity  import refresh_cafe_stations
+
+
+class BatchSize(Enum):
+    UPSERT = 5000
+
+
+# cafe field -> column of the source, override with load_cafes --column field=column
+SOURCE_COLUMNS = {
+    "name"                    : "name",
+    "road_name_address"       : "road_name_address",
+    "land_lot_number_address" : "land_lot_number_address",
+    "latitude"                : "latitude",
+    "longitude"               : "longitude",
+    "region"                  : "region",
+    "category"                : "category"
+}
+
+
+def read_csv(path, encoding):
+    with open(path, newline="", encoding=encoding) as source:
+        yield from csv.DictReader(source)
+
+
+def read_json_lines(path, encoding):
+    with open(path, encoding=encoding) as source:
+        for line in source:
+            if line.strip():
+                yield json.loads(line)
+
+
+def read_json(path, encoding):
+    # a JSON array is parsed as a whole, use JSON lines for sources that do not fit in memory
+    with open(path, encoding=encoding) as source:
+        yield from json.load(source)
+
+
+READERS = {
+    ".csv"   : read_csv,
+    ".jsonl" : read_json_lines,
+    ".json"  : read_json
+}
+
+
+def natural_key(values):
+    return values["road_name_address"], values["name"]
+
+
+class CafeLoader:
+    """
+    Upserts cafes from source records in chunks, matching stored cafes on (road name address, name).
+
+    Regions (by zcode or city) and categories (by type) are resolved from maps loaded once;
+    records that cannot be resolved are counted as skipped. Records repeating the natural key
+    of an earlier one are counted as duplicates and not loaded, the first one wins. Loading
+    the same source again changes nothing, so a failed load can simply be rerun.
+    """
+    def __init__(self, columns=SOURCE_COLUMNS, default_category=None):
+        self.columns          = columns
+        self.default_category = default_category
+        self.regions          = {}
+        self.categories       = dict(Category.objects.values_list("type", "id"))
+
+        for zcode, city in Region.objects.values_list("zcode", "city"):
+            self.regions[str(zcode)] = self.regions[city] = zcode
+
+        self.keys = set()
+        self.read = self.created = self.updated = self.skipped = self.duplicates = 0
+
+    def cafe_values(self, record):
+        def field(name):
+            return (record.get(self.columns[name]) or "").strip()
+
+        latitude  = float(field("latitude"))
+        longitude = float(field("longitude"))
+        values    = {
+            "name"                    : field("name"),
+            "road_name_address"       : field("road_name_address"),
+            "land_lot_number_address" : field("land_lot_number_address"),
+            "latitude"                : latitude,
+            "longitude"               : longitude,
+            "grid_cell"               : grid_cell(latitude, longitude),
+            "region_id"               : self.regions[field("region")],
+            "category_id"             : self.categories[field("category") or self.default_category]
+        }
+
+        if not values["name"] or not values["road_name_address"]:
+            raise ValueError("a cafe needs a name and a road name address")
+
+        return values
+
+    def load(self, records):
+        for chunk in chunked(records, BatchSize.UPSERT.value):
+            rows = {}
+            for record in chunk:
+                try:
+                    values = self.cafe_values(record)
+                except (KeyError, ValueError):
+                    self.skipped += 1
+                    continue
+
+                key = natural_key(values)
+                if key in self.keys:
+                    self.duplicates += 1
+                    continue
+
+                self.keys.add(key)
+                rows[key] = values
+
+            self.read += len(chunk)
+            self.write(rows)
+
+    def stored(self, keys, *fields):
+        # looked up by address alone, an IN list on both columns makes the database probe every combination;
+        # {natural key: cafe}, or {natural key: (fields...)} when fields are given
+        cafes = Cafe.objects.filter(road_name_address__in={road_name_address for road_name_address, _ in keys})
+
+        if fields:
+            return {(road_name_address, name): values for road_name_address, name, *values in cafes.values_list("road_name_address", "name", *fields) if (road_name_address, name) in keys}
+
+        return {(cafe.road_name_address, cafe.name): cafe for cafe in cafes if (cafe.road_name_address, cafe.name) in keys}
+
+    def write(self, rows):
+        with transaction.atomic():
+            existing  = self.stored(rows.keys())
+            locations = {key: (cafe.latitude, cafe.longitude) for key, cafe in existing.items()}
+
+            created, updated = bulk_upsert(Cafe, rows, existing, BatchSize.UPSERT.value)
+            self.created += created
+            self.updated += updated
+
+            # bulk_create does not return ids on MySQL, so added cafes are looked up again by their key
+            moved_keys = {key for key in rows if key not in locations or locations[key] != (existing[key].latitude, existing[key].longitude)}
+            if moved_keys:
+                refresh_cafe_stations([cafe_id for cafe_id, in self.stored(moved_keys, "id").values()])
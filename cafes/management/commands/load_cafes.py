@@ -0,0 +1,44 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core         import versions
+from cafes.loader import CafeLoader, READERS, SOURCE_COLUMNS
+
+
+class Command(BaseCommand):
+    help = "Upserts cafes from a CSV, JSON or JSON lines file, matching stored cafes on road name address and name"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--encoding", default="utf-8-sig", help="e.g. cp949 for public data exports")
+        parser.add_argument("--column", action="append", default=[], metavar="FIELD=COLUMN", help=f"source column of a cafe field, fields: {', '.join(SOURCE_COLUMNS)}")
+        parser.add_argument("--category", help="category type of records without a category column")
+
+    def handle(self, *args, **options):
+        extension = os.path.splitext(options["path"])[1].lower()
+        if extension not in READERS:
+            raise CommandError(f"unsupported source {extension or options['path']}, expected one of {', '.join(READERS)}")
+
+        columns = dict(SOURCE_COLUMNS)
+        for mapping in options["column"]:
+            field, _, column = mapping.partition("=")
+            if field not in columns or not column:
+                raise CommandError(f"invalid --column {mapping}")
+            columns[field] = column
+
+        loader = CafeLoader(columns, options["category"])
+        start  = time.perf_counter()
+
+        try:
+            loader.load(READERS[extension](options["path"], options["encoding"]))
+        finally:
+            if loader.created or loader.updated:
+                versions.bump("cafes")
+
+        seconds   = time.perf_counter() - start
+        unchanged = loader.read - loader.skipped - loader.duplicates - loader.created - loader.updated
+
+        self.stdout.write(f"cafes read: {loader.read} created: {loader.created} updated: {loader.updated} unchanged: {unchanged} skipped: {loader.skipped} duplicates: {loader.duplicates}")
+        self.stdout.write(self.style.SUCCESS(f"loaded in {seconds:.2f}s, {loader.read / seconds if seconds else 0:.0f} rows/s"))
@@ -0,0 +1,40 @@
+# Generated by Django 4.0.4 on 2026-10-18 17:20
+
+from django.db import migrations, models
+
+from core.geo import grid_cell
+
+
+def fill_grid_cells(apps, schema_editor):
+    Cafe = apps.get_model('cafes', 'Cafe')
+
+    cafes = list(Cafe.objects.only('id', 'latitude', 'longitude'))
+    for cafe in cafes:
+        cafe.grid_cell = grid_cell(cafe.latitude, cafe.longitude)
+
+    Cafe.objects.bulk_update(cafes, ['grid_cell'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cafes', '0002_rename_zcode_cafe_region'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cafe',
+            name='grid_cell',
+            field=models.PositiveIntegerField(editable=False, null=True),
+        ),
+        migrations.RunPython(fill_grid_cells, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='cafe',
+            name='grid_cell',
+            field=models.PositiveIntegerField(editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='cafe',
+            index=models.Index(fields=['grid_cell', 'latitude', 'longitude'], name='cafes_grid_cell'),
+        ),
+    ]
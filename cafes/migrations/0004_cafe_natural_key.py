@@ -0,0 +1,17 @@
+# Generated by Django 4.0.4 on 2026-10-18 17:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cafes', '0003_cafe_grid_cell'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cafe',
+            index=models.Index(fields=['road_name_address', 'name'], name='cafes_natural_key'),
+        ),
+    ]
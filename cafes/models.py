@@ -1,8 +1,8 @@
 from django.db import models
-from core.models import TimeStampModel
+from core.models import TimeStampModel, GridCellModel
 
 
-class Cafe(TimeStampModel):
+class Cafe(TimeStampModel, GridCellModel):
     land_lot_number_address = models.CharField(max_length=100)
     road_name_address       = models.CharField(max_length=100)
     name                    = models.CharField(max_length=50)
@@ -12,4 +12,8 @@ class Cafe(TimeStampModel):
     region                  = models.ForeignKey("commons.Region", on_delete=models.PROTECT)
 
     class Meta:
-        db_table = "cafes"
\ No newline at end of file
+        db_table = "cafes"
+        indexes  = [
+            models.Index(fields=["grid_cell", "latitude", "longitude"], name="cafes_grid_cell"),
+            models.Index(fields=["road_name_address", "name"], name="cafes_natural_key")
+        ]
\ No newline at end of file
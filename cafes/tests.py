@@ -1,3 +1,126 @@
-from django.test import TestCase
+import io
+import os
+import csv
+import json
+import tempfile
 
-# Create your tests here.
+from django.test                 import TestCase, override_settings
+from django.core.management      import call_command
+from django.core.management.base import CommandError
+
+from cafes.models   import Cafe
+from commons.models import Region, Category
+
+
+FIELDS = ["name", "road_name_address", "land_lot_number_address", "latitude", "longitude", "region", "category"]
+
+
+def cafe_row(number, **fields):
+    return dict({
+        "name"                    : f"cafe {number}",
+        "road_name_address"       : f"road {number}",
+        "land_lot_number_address" : f"lot {number}",
+        "latitude"                : f"{37.5 + number / 1000:.6f}",
+        "longitude"               : f"{127.0 + number / 1000:.6f}",
+        "region"                  : "서울",
+        "category"                : "cafe"
+    }, **fields)
+
+
+@override_settings(DATA_VERSION_DIR=os.path.join(tempfile.gettempdir(), "maze-test-versions"))
+class LoadCafesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Region.objects.create(zcode=11, city="서울")
+        Category.objects.create(id=1, type="cafe")
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write_csv(self, rows, fields=FIELDS):
+        path = os.path.join(self.directory.name, "cafes.csv")
+        with open(path, "w", newline="", encoding="utf-8") as source:
+            writer = csv.DictWriter(source, fields)
+            writer.writeheader()
+            writer.writerows(rows)
+        return path
+
+    def load(self, path, *args):
+        stdout = io.StringIO()
+        call_command("load_cafes", path, *args, stdout=stdout)
+        return stdout.getvalue().splitlines()[0]
+
+    def test_load_and_reload(self):
+        path = self.write_csv([cafe_row(number) for number in range(3)])
+
+        self.assertEqual(self.load(path), "cafes read: 3 created: 3 updated: 0 unchanged: 0 skipped: 0 duplicates: 0")
+        self.assertEqual(Cafe.objects.count(), 3)
+
+        path = self.write_csv([cafe_row(0, land_lot_number_address="moved lot"), cafe_row(1), cafe_row(2)])
+
+        self.assertEqual(self.load(path), "cafes read: 3 created: 0 updated: 1 unchanged: 2 skipped: 0 duplicates: 0")
+        self.assertEqual(Cafe.objects.get(name="cafe 0").land_lot_number_address, "moved lot")
+
+    def test_duplicates_and_skipped(self):
+        path = self.write_csv([
+            cafe_row(0),
+            cafe_row(0, land_lot_number_address="second lot"),
+            cafe_row(1, region="부산"),
+            cafe_row(2, latitude=""),
+            cafe_row(3)
+        ])
+
+        self.assertEqual(self.load(path), "cafes read: 5 created: 2 updated: 0 unchanged: 0 skipped: 2 duplicates: 1")
+        self.assertEqual(Cafe.objects.get(name="cafe 0").land_lot_number_address, "lot 0")
+
+    def test_columns_and_json_lines(self):
+        path = os.path.join(self.directory.name, "cafes.jsonl")
+        with open(path, "w", encoding="utf-8") as source:
+            for number in range(2):
+                row = cafe_row(number)
+                row["상호명"] = row.pop("name")
+                source.write(json.dumps(row) + "\n")
+
+        self.assertEqual(self.load(path, "--column", "name=상호명"), "cafes read: 2 created: 2 updated: 0 unchanged: 0 skipped: 0 duplicates: 0")
+        self.assertEqual(set(Cafe.objects.values_list("name", flat=True)), {"cafe 0", "cafe 1"})
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(CommandError):
+            self.load(os.path.join(self.directory.name, "cafes.xlsx"))
+
+        with self.assertRaises(CommandError):
+            self.load(self.write_csv([]), "--column", "unknown=column")
+
+
+@override_settings(MAP_CLUSTER_MIN_KM=20, MAP_CLUSTER_GRID=8)
+class CafeClusterTest(TestCase):
+    large_viewport = {"SW_latitude" : 37.0, "SW_longitude" : 126.5, "NE_latitude" : 38.0, "NE_longitude" : 127.5, "mode" : "clusters"}
+
+    @classmethod
+    def setUpTestData(cls):
+        Region.objects.create(zcode=11, city="서울")
+        Category.objects.create(id=1, type="cafe")
+
+        for number, (latitude, longitude) in enumerate([(37.1 + step * 0.07, 126.6 + step * 0.07) for step in range(12)] + [(35.1, 129.0)]):
+            Cafe.objects.create(
+                land_lot_number_address = f"lot {number}",
+                road_name_address       = f"road {number}",
+                name                    = f"cafe {number}",
+                latitude                = latitude,
+                longitude               = longitude,
+                category_id             = 1,
+                region_id               = 11
+            )
+
+    def test_clusters_add_up_the_viewport(self):
+        clusters = self.client.get("/cafes", self.large_viewport).json()["clusters"]
+
+        self.assertGreater(len(clusters), 1)
+        self.assertEqual(sum(cluster["total_cafe"] for cluster in clusters), 12)
+
+    def test_small_viewport_gets_cafes(self):
+        response = self.client.get("/cafes", {"SW_latitude" : 37.09, "SW_longitude" : 126.59, "NE_latitude" : 37.11, "NE_longitude" : 126.61, "mode" : "clusters"}).json()
+
+        self.assertNotIn("clusters", response)
+        self.assertEqual([cafe["name"] for cafe in response["results"]], ["cafe 0"])
@@ -2,12 +2,15 @@ from enum import Enum
 
 from haversine import haversine
 
+from django.conf            import settings
 from django.http            import JsonResponse
 from django.views           import View
 from django.core.exceptions import ValidationError
-from django.db.models       import Q
 
 from cafes.models     import Cafe
+from core             import versions
+from core.geo         import bounding_box, is_large_viewport, cluster_size, clusters
+from core.tiles       import TileCache, tiled_response
 from core.validations import validate_range, validate_search_position
 
 
@@ -23,6 +26,15 @@ class Category(Enum):
     CAFE    = 2
 
 
+class MapMode(Enum):
+    TILES    = "tiles"
+    CLUSTERS = "clusters"
+
+
+# map tiles served by this process, see core.tiles
+tile_cache = TileCache(settings.MAP_TILE_CACHE_BYTES)
+
+
 class CafeMapView(View):
     def get(self, request):
         try:
@@ -33,34 +45,58 @@ class CafeMapView(View):
 
             # validate_range(NE_latitude, SW_latitude, NE_longitude, SW_longitude)  # 프론트 이슈(첫 렌더시 range 벗어남)
 
-            rectangle_boundary = (
-                    Q(latitude__range  = (SW_latitude, NE_latitude)) &
-                    Q(longitude__range = (SW_longitude, NE_longitude))
+            boundary = (SW_latitude, SW_longitude, NE_latitude, NE_longitude)
+
+            if request.GET.get("mode") == MapMode.CLUSTERS.value and is_large_viewport(*boundary):
+                return JsonResponse({"clusters" : self.cafe_clusters(boundary)}, status=200)
+
+            if request.GET.get("mode") == MapMode.TILES.value:
+                return tiled_response(
+                    tile_cache,
+                    versions.current("cafes"),
+                    boundary,
+                    ("cafes",),
+                    lambda tile_boundary: self.cafe_results(tile_boundary, half_open=True)
                 )
-            
-            near_cafes = Cafe.objects\
-                .select_related("category", "region")\
-                .filter(rectangle_boundary)
-
-            results = [{
-                "id"                      : near_cafe.id,
-                "land_lot_number_address" : near_cafe.land_lot_number_address,
-                "road_name_address"       : near_cafe.road_name_address,
-                "name"                    : near_cafe.name,
-                "latitude"                : near_cafe.latitude,
-                "longitude"               : near_cafe.longitude,
-                "category"                : near_cafe.category.type,
-                "region"                  : near_cafe.region.city
-            } for near_cafe in near_cafes]
+
+            results = self.cafe_results(boundary)
 
             return JsonResponse({"results" : results}, status=200)
 
         except KeyError:
             return JsonResponse({"MESSAGE" : "KEY_ERROR"}, status=400)
+
+        except ValueError:
+            return JsonResponse({"MESSAGE" : "VALUE_ERROR"}, status=400)
         
         except ValidationError as error:
             return JsonResponse({"MESSAGE": error.message}, status=error.code)
 
+    def cafe_results(self, boundary, half_open=False):
+        near_cafes = Cafe.objects\
+            .select_related("category", "region")\
+            .filter(bounding_box(*boundary, half_open=half_open))
+
+        return [{
+            "id"                      : near_cafe.id,
+            "land_lot_number_address" : near_cafe.land_lot_number_address,
+            "road_name_address"       : near_cafe.road_name_address,
+            "name"                    : near_cafe.name,
+            "latitude"                : near_cafe.latitude,
+            "longitude"               : near_cafe.longitude,
+            "category"                : near_cafe.category.type,
+            "region"                  : near_cafe.region.city
+        } for near_cafe in near_cafes]
+
+    def cafe_clusters(self, boundary):
+        cafe_clusters = clusters(Cafe.objects.filter(bounding_box(*boundary)), cluster_size(*boundary))
+
+        return [{
+            "latitude"   : cafe_cluster["latitude"],
+            "longitude"  : cafe_cluster["longitude"],
+            "total_cafe" : cafe_cluster["count"]
+        } for cafe_cluster in cafe_clusters]
+
 
 class SearchNearestCafeView(View):
     def get(self, request):
@@ -77,9 +113,11 @@ class SearchNearestCafeView(View):
 
         while nearest_cafe:
             range += 1
-            search_range = (
-                    Q(latitude__range  = (search_position_latitude - Length.LATITUDE_100m.value * range, search_position_latitude + Length.LATITUDE_100m.value * range)) &
-                    Q(longitude__range = (search_position_longitude - Length.LONGITUDE_100m.value * range, search_position_longitude + Length.LONGITUDE_100m.value * range))
+            search_range = bounding_box(
+                    search_position_latitude - Length.LATITUDE_100m.value * range,
+                    search_position_longitude - Length.LONGITUDE_100m.value * range,
+                    search_position_latitude + Length.LATITUDE_100m.value * range,
+                    search_position_longitude + Length.LONGITUDE_100m.value * range
                 )
 
             cafes = Cafe.objects.filter(search_range)
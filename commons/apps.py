@@ -1,6 +1,19 @@
 from django.apps import AppConfig
+from django.db.models import signals
 
 
 class CommonsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'commons'
+
+    def ready(self):
+        from commons.lookups import bump_version
+        from commons.models  import Region, Category
+        from evs.models      import ChargerType, ChargingStatus
+
+        # ingestion only ever changes charger outputs, which update_stations_and_chargers checks itself
+        for model in (Region, Category, ChargerType, ChargingStatus):
+            signals.post_save.connect(bump_version, sender=model, dispatch_uid=f"lookups_post_save_{model.__name__}")
+            signals.post_delete.connect(bump_version, sender=model, dispatch_uid=f"lookups_post_delete_{model.__name__}")
+
+        signals.post_migrate.connect(bump_version, sender=self, dispatch_uid="lookups_post_migrate")
@@ -0,0 +1,19 @@
+from core       import versions
+from evs.models import Charger
+
+# data version of the ParentTableView payload
+VERSION = "lookups"
+
+
+def charger_outputs():
+    return list(Charger.objects
+        .filter(output__isnull=False)
+        .values_list("output", flat=True)
+        .order_by("output")
+        .distinct()
+    )
+
+
+def bump_version(**kwargs):
+    # receiver for changes of the reference tables behind the payload
+    versions.bump(VERSION)
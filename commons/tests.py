@@ -1,3 +1,103 @@
-from django.test import TestCase
+import os
+import tempfile
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+
+from cafes.models   import Cafe
+from commons.models import Region, Category
+from evs.models     import Station, Charger, ChargerType, ChargingStatus
+from evs.summaries  import refresh_station_summaries
+
+
+@override_settings(DATA_VERSION_DIR=os.path.join(tempfile.gettempdir(), "maze-test-versions"))
+class ParentTableTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Region.objects.create(zcode=11, city="서울")
+        Category.objects.create(id=1, type="cafe")
+
+    def test_etag_and_not_modified(self):
+        response = self.client.get("/commons")
+        ETag     = response["ETag"]
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["results"]["regions"], [{"city": "서울"}])
+
+        with self.assertNumQueries(0):
+            response = self.client.get("/commons", HTTP_IF_NONE_MATCH=ETag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], ETag)
+
+    def test_lookup_change_renews_etag(self):
+        ETag = self.client.get("/commons")["ETag"]
+
+        Region.objects.create(zcode=26, city="부산")
+        response = self.client.get("/commons", HTTP_IF_NONE_MATCH=ETag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], ETag)
+        self.assertEqual(response.json()["results"]["regions"], [{"city": "서울"}, {"city": "부산"}])
+
+
+@override_settings(DATA_VERSION_DIR=os.path.join(tempfile.gettempdir(), "maze-test-versions"))
+class MapTest(TestCase):
+    viewport = {"SW_latitude" : 37.4, "SW_longitude" : 126.9, "NE_latitude" : 37.6, "NE_longitude" : 127.1}
+
+    @classmethod
+    def setUpTestData(cls):
+        Region.objects.create(zcode=11, city="서울")
+        Category.objects.create(id=1, type="cafe")
+        Category.objects.create(id=2, type="ev")
+        ChargerType.objects.create(code=1, explanation="DC차데모")
+        ChargingStatus.objects.bulk_create([ChargingStatus(code=code, explanation=str(code)) for code in (1, 2, 3, 4, 5, 9)])
+
+        for station_id, latitude, longitude in (("ST000001", 37.5, 127.0), ("ST000002", 35.1, 129.0)):
+            station = Station.objects.create(
+                id                        = station_id,
+                name                      = station_id,
+                detail_location           = "B1",
+                latitude                  = latitude,
+                longitude                 = longitude,
+                business_id               = "ST",
+                business_name             = "test",
+                business_manamgement_name = "test",
+                category_id               = 2,
+                region_id                 = 11
+            )
+            Charger.objects.create(station=station, index_in_station=1, output=50, charger_type_id=1, charging_status_id=2)
+        refresh_station_summaries(["ST000001", "ST000002"])
+
+        for name, latitude, longitude in (("inside", 37.51, 127.01), ("outside", 35.1, 129.0)):
+            Cafe.objects.create(
+                land_lot_number_address = f"{name} lot",
+                road_name_address       = f"{name} road",
+                name                    = name,
+                latitude                = latitude,
+                longitude               = longitude,
+                category_id             = 1,
+                region_id               = 11
+            )
+
+    def test_stations_and_cafes_in_viewport(self):
+        response = self.client.get("/commons/map", self.viewport)
+        results  = {result["type"]: result for result in response.json()["results"]}
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["results"]), 2)
+        self.assertEqual((results["station"]["id"], results["station"]["detail_location"], results["station"]["category"]), ("ST000001", "B1", "ev"))
+        self.assertEqual(results["station"]["chargers"]["count_of_status"]["ready_charger"], 1)
+        self.assertEqual(results["station"]["chargers"]["quick_and_slow"]["of_ready_charger"], {"quick" : 1, "slow" : 0})
+        self.assertEqual(results["station"]["chargers"]["usable_of_all"], "YES")
+        self.assertEqual((results["cafe"]["name"], results["cafe"]["land_lot_number_address"], results["cafe"]["category"]), ("inside", "inside lot", "cafe"))
+
+    def test_category_filter(self):
+        for categories, kinds in ((["cafe"], ["cafe"]), (["ev"], ["station"]), (["cafe", "ev"], ["cafe", "station"]), (["unknown"], [])):
+            with self.subTest(categories=categories):
+                results = self.client.get("/commons/map", dict(self.viewport, category=categories)).json()["results"]
+
+                self.assertEqual(sorted(result["type"] for result in results), kinds)
+
+    def test_invalid_viewport(self):
+        self.assertEqual(self.client.get("/commons/map", {"SW_latitude" : 37.4}).json(), {"MESSAGE" : "KEY_ERROR"})
+        self.assertEqual(self.client.get("/commons/map", dict(self.viewport, NE_latitude="north")).json(), {"MESSAGE" : "VALUE_ERROR"})
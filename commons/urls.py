@@ -1,6 +1,7 @@
 from django.urls import path
-from commons.views import ParentTableView
+from commons.views import ParentTableView, MapView
 
 urlpatterns = [
-    path("", ParentTableView.as_view())
+    path("", ParentTableView.as_view()),
+    path("/map", MapView.as_view())
 ]
\ No newline at end of file
@@ -1,13 +1,17 @@
-import hashlib
-import json
-
 from enum import Enum
 
-from django.http  import JsonResponse
-from django.views import View
+from django.http       import JsonResponse, HttpResponse, HttpResponseNotModified
+from django.utils.http import quote_etag, parse_etags
+from django.views      import View
+from django.db.models  import F, Value, CharField, IntegerField
 
+from commons        import lookups
 from commons.models import Region, Category
-from evs.models     import ChargerType, ChargingStatus, Charger
+from evs.models     import ChargerType, ChargingStatus, Station
+from evs.summaries  import COUNTERS
+from cafes.models   import Cafe
+from core           import versions
+from core.geo       import bounding_box
 
 
 def include_charger_types():
@@ -39,16 +43,40 @@ class Usable(Enum):
     NO  = "NO"
 
 
+# {data version: rendered ParentTableView body} of this process, only the current version is kept
+lookup_cache = {}
+
+
 class ParentTableView(View):
+    """
+    Lookup tables for the search filters. The body is rendered once per "lookups" data version,
+    which also serves as the ETag, so a request with a matching If-None-Match costs no queries.
+    """
     def get(self, request):
+        version = versions.current(lookups.VERSION)
+        ETag    = quote_etag(f"{lookups.VERSION}-{version}")
+
+        if ETag in parse_etags(request.META.get("HTTP_IF_NONE_MATCH", "")):
+            response = HttpResponseNotModified()
+            response["ETag"] = ETag
+            return response
+
+        if version not in lookup_cache:
+            lookup_cache.clear()
+            lookup_cache[version] = JsonResponse({"results" : self.lookup_results()}, status=200).content
+
+        response = HttpResponse(lookup_cache[version], content_type="application/json")
+        response["ETag"] = ETag
+        return response
+
+    def lookup_results(self):
         regions          = Region.objects.all()
         categories       = Category.objects.all()
         charger_statuses = ChargingStatus.objects.all()
-        chargers         = Charger.objects.values("output").order_by("output").distinct()
 
         filtering_include_search = include_charger_types()
 
-        results = {
+        return {
                 "regions" : [{ 
                     "city" : region.city
                 } for region in regions],
@@ -62,9 +90,9 @@ class ParentTableView(View):
                     } for charger_status in charger_statuses],
                     "outputs" : {
                         "output" : [{
-                            "capacity" : str(charger["output"]) + "kw",
-                            "query"    : charger["output"]
-                        } for charger in chargers if charger["output"] != None]
+                            "capacity" : str(output) + "kw",
+                            "query"    : output
+                        } for output in lookups.charger_outputs()]
                     },
                     "usable" : { 
                         "title" : "사용가능한 충전기 보기",
@@ -72,10 +100,108 @@ class ParentTableView(View):
                     }
                 },
             }
-    
-        If_None_Match = request.META.get("HTTP_IF_NONE_MATCH", None)
-        ETag_hash     = hashlib.md5(json.dumps({"results" : results}).encode('utf-8')).hexdigest()
-        if  If_None_Match == ETag_hash:
-            return JsonResponse({"MESSAGE" : "NOT_MODIFIED"}, status=304)
 
-        return JsonResponse({"results" : results}, status=200)
\ No newline at end of file
+
+class MapKind(Enum):
+    STATION = "station"
+    CAFE    = "cafe"
+
+
+# columns shared by stations and cafes, in the order both halves of the union select them
+MAP_FIELDS = ("id", "name", "road_name_address", "latitude", "longitude", "category__type", "region__city")
+
+
+class MapView(View):
+    """
+    Stations and cafes of a viewport in one query, a UNION ALL of the two bounding-box lookups.
+    `category` (repeatable, commons category types) narrows the layers, all of them by default.
+    Stations carry the counters of their summary instead of the per-charger detail of EVMapView.
+    """
+    def get(self, request):
+        try:
+            SW_latitude  = float(request.GET["SW_latitude"])
+            SW_longitude = float(request.GET["SW_longitude"])
+            NE_latitude  = float(request.GET["NE_latitude"])
+            NE_longitude = float(request.GET["NE_longitude"])
+            categories   = request.GET.getlist("category", None)
+
+            boundary = bounding_box(SW_latitude, SW_longitude, NE_latitude, NE_longitude)
+
+            stations = Station.objects.filter(boundary)
+            cafes    = Cafe.objects.filter(boundary)
+
+            if categories:
+                stations = stations.filter(category__type__in=categories)
+                cafes    = cafes.filter(category__type__in=categories)
+
+            # annotations are selected after the fields and in the order they are defined, so both halves line up
+            stations = stations\
+                .annotate(kind=Value(MapKind.STATION.value, output_field=CharField()), detail=F("detail_location"))\
+                .annotate(**{counter: F(f"summary__{counter}") for counter in COUNTERS})\
+                .values_list(*MAP_FIELDS, "kind", "detail", *COUNTERS)
+
+            cafes = cafes\
+                .annotate(kind=Value(MapKind.CAFE.value, output_field=CharField()), detail=F("land_lot_number_address"))\
+                .annotate(**{counter: Value(None, output_field=IntegerField()) for counter in COUNTERS})\
+                .values_list(*MAP_FIELDS, "kind", "detail", *COUNTERS)
+
+            results = [self.map_result(row) for row in stations.union(cafes, all=True)]
+
+            return JsonResponse({"results" : results}, status=200)
+
+        except KeyError:
+            return JsonResponse({"MESSAGE" : "KEY_ERROR"}, status=400)
+
+        except ValueError:
+            return JsonResponse({"MESSAGE" : "VALUE_ERROR"}, status=400)
+
+    def map_result(self, row):
+        id, name, road_name_address, latitude, longitude, category, region, kind, detail, *counters = row
+
+        if kind == MapKind.CAFE.value:
+            return {
+                "type"                    : kind,
+                "id"                      : int(id),
+                "land_lot_number_address" : detail,
+                "road_name_address"       : road_name_address,
+                "name"                    : name,
+                "latitude"                : latitude,
+                "longitude"               : longitude,
+                "category"                : category,
+                "region"                  : region
+            }
+
+        counts = dict(zip(COUNTERS, counters))
+        return {
+            "type"              : kind,
+            "id"                : id,
+            "name"              : name,
+            "detail_location"   : detail,
+            "road_name_address" : road_name_address,
+            "latitude"          : latitude,
+            "longitude"         : longitude,
+            "category"          : category,
+            "region"            : region,
+            "chargers"          : {
+                "usable_of_all"   : Usable.YES.value if counts["ready_charger"] else Usable.NO.value,
+                "count_of_status" : {
+                    "total_charger"                 : counts["total_charger"],
+                    "communication_abnomal_charger" : counts["communication_abnomal_charger"],
+                    "ready_charger"                 : counts["ready_charger"],
+                    "charging_charger"              : counts["charging_charger"],
+                    "suspending_charger"            : counts["suspending_charger"],
+                    "inspecting_charger"            : counts["inspecting_charger"],
+                    "not_confirmed_charger"         : counts["not_confirmed_charger"]
+                },
+                "quick_and_slow"  : {
+                    "of_total_charger" : {
+                        "quick" : counts["quick_charger"],
+                        "slow"  : counts["slow_charger"]
+                    },
+                    "of_ready_charger" : {
+                        "quick" : counts["quick_charger_of_ready"],
+                        "slow"  : counts["slow_charger_of_ready"]
+                    }
+                }
+            }
+        }
@@ -0,0 +1,96 @@
+import math
+
+from haversine import haversine
+
+from django.conf                import settings
+from django.db.models           import Q, F, Avg, Count, FloatField, ExpressionWrapper
+from django.db.models.functions import Floor
+
+
+# grid cells are CELL_SIZE x CELL_SIZE degrees (about 1.1 km x 0.9 km around Seoul),
+# numbered row by row from (-90, -180)
+CELL_SIZE = 0.01
+COLUMNS   = math.ceil(360 / CELL_SIZE)
+
+# a bounding box spanning more cell rows than this is looked up as a single cell range
+MAX_CELL_RANGES = 64
+
+
+def finite(degrees):
+    # float degrees; math.floor would raise OverflowError for inf, which request handlers do not expect
+    degrees = float(degrees)
+    if not math.isfinite(degrees):
+        raise ValueError(f"not a finite coordinate: {degrees}")
+    return degrees
+
+
+def cell_row(latitude):
+    return math.floor((finite(latitude) + 90) / CELL_SIZE)
+
+
+def cell_column(longitude):
+    return math.floor((finite(longitude) + 180) / CELL_SIZE)
+
+
+def grid_cell(latitude, longitude):
+    return cell_row(latitude) * COLUMNS + cell_column(longitude)
+
+
+def cell_ranges(SW_latitude, SW_longitude, NE_latitude, NE_longitude):
+    # every cell row of the box is one contiguous range of cell numbers
+    first_row, last_row       = cell_row(SW_latitude), cell_row(NE_latitude)
+    first_column, last_column = cell_column(SW_longitude), cell_column(NE_longitude)
+
+    if last_row - first_row >= MAX_CELL_RANGES:
+        return [(first_row * COLUMNS + first_column, last_row * COLUMNS + last_column)]
+
+    return [(row * COLUMNS + first_column, row * COLUMNS + last_column) for row in range(first_row, last_row + 1)]
+
+
+def bounding_box(SW_latitude, SW_longitude, NE_latitude, NE_longitude, prefix="", half_open=False):
+    """
+    Q for the rows of a GridCellModel inside the box. The grid_cell ranges let the
+    database range-scan the grid cell index; latitude / longitude keep the result exact.
+    With `half_open` the north and east edges are excluded, so adjacent boxes never share a row.
+    """
+    cells = Q()
+    for first_cell, last_cell in cell_ranges(SW_latitude, SW_longitude, NE_latitude, NE_longitude):
+        cells |= Q(**{f"{prefix}grid_cell__range": (first_cell, last_cell)})
+
+    if half_open:
+        return cells & Q(**{
+            f"{prefix}latitude__gte"  : SW_latitude,
+            f"{prefix}latitude__lt"   : NE_latitude,
+            f"{prefix}longitude__gte" : SW_longitude,
+            f"{prefix}longitude__lt"  : NE_longitude
+        })
+
+    return cells & Q(**{
+        f"{prefix}latitude__range"  : (SW_latitude, NE_latitude),
+        f"{prefix}longitude__range" : (SW_longitude, NE_longitude)
+    })
+
+
+def is_large_viewport(SW_latitude, SW_longitude, NE_latitude, NE_longitude):
+    return haversine((SW_latitude, SW_longitude), (NE_latitude, NE_longitude)) > settings.MAP_CLUSTER_MIN_KM
+
+
+def cluster_size(SW_latitude, SW_longitude, NE_latitude, NE_longitude):
+    # power of two degrees, so cluster cells stay put while the map is panned at one zoom level
+    span = max(NE_latitude - SW_latitude, NE_longitude - SW_longitude, CELL_SIZE) / settings.MAP_CLUSTER_GRID
+    return 2.0 ** math.ceil(math.log2(span))
+
+
+def clusters(queryset, size, **aggregates):
+    """
+    Groups the rows of a GridCellModel queryset into size x size degree cells in the
+    database; every cell carries its centroid, its row count and the given aggregates.
+    """
+    return queryset\
+        .annotate(
+            cluster_row    = Floor(ExpressionWrapper(F("latitude") / size, output_field=FloatField())),
+            cluster_column = Floor(ExpressionWrapper(F("longitude") / size, output_field=FloatField()))
+        )\
+        .values("cluster_row", "cluster_column")\
+        .annotate(latitude=Avg("latitude"), longitude=Avg("longitude"), count=Count("pk"), **aggregates)\
+        .order_by()
@@ -0,0 +1,24 @@
+import tempfile
+
+from django.test        import override_settings
+from django.test.runner import DiscoverRunner
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Keeps the data versions of a test run (see core.versions) in a temporary directory, apart from
+    the ones of the processes on the host. The test databases are migrated after setup_test_environment,
+    so the versions bumped by post_migrate receivers land there as well.
+    """
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+
+        self.version_dir      = tempfile.TemporaryDirectory(prefix="maze-test-versions-")
+        self.version_settings = override_settings(DATA_VERSION_DIR=self.version_dir.name)
+        self.version_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.version_settings.disable()
+        self.version_dir.cleanup()
+
+        super().teardown_test_environment(**kwargs)
@@ -1,3 +1,57 @@
-from django.test import TestCase
+import os
 
-# Create your tests here.
+from django.conf            import settings
+from django.test            import SimpleTestCase, override_settings
+from django.core.exceptions import ValidationError
+
+from core.geo   import grid_cell, cell_ranges
+from core.tiles import tile_x, tile_y, tile_bounds, viewport_tiles
+
+
+class GridCellTest(SimpleTestCase):
+    def test_cell_ranges_cover_box(self):
+        ranges = cell_ranges(37.4890, 127.0170, 37.5070, 127.0400)
+
+        for latitude, longitude in ((37.4890, 127.0170), (37.5070, 127.0400), (37.5, 127.03)):
+            self.assertTrue(any(first <= grid_cell(latitude, longitude) <= last for first, last in ranges))
+
+    def test_non_finite_coordinates(self):
+        for latitude, longitude in ((float("inf"), 127), (37.5, float("-inf")), (float("nan"), 127)):
+            with self.subTest(latitude=latitude, longitude=longitude), self.assertRaises(ValueError):
+                grid_cell(latitude, longitude)
+
+
+@override_settings(MAP_TILE_MIN_ZOOM=8, MAP_TILE_MAX_ZOOM=16, MAP_TILE_MAX_TILES=16)
+class ViewportTilesTest(SimpleTestCase):
+    def test_deepest_zoom_within_max_tiles(self):
+        tiles = viewport_tiles(37.4890, 127.0170, 37.5070, 127.0400)
+        zoom  = tiles[0][0] + 1
+
+        deeper_tiles = (tile_x(127.0400, zoom) - tile_x(127.0170, zoom) + 1) * (tile_y(37.4890, zoom) - tile_y(37.5070, zoom) + 1)
+
+        self.assertLessEqual(len(tiles), 16)
+        self.assertGreater(deeper_tiles, 16)
+
+    def test_tiles_cover_viewport(self):
+        SW_latitude, SW_longitude, NE_latitude, NE_longitude = 37.52, 126.93, 37.60, 127.05
+        bounds = [tile_bounds(*tile) for tile in viewport_tiles(SW_latitude, SW_longitude, NE_latitude, NE_longitude)]
+
+        self.assertLessEqual(min(bound[0] for bound in bounds), SW_latitude)
+        self.assertLessEqual(min(bound[1] for bound in bounds), SW_longitude)
+        self.assertGreaterEqual(max(bound[2] for bound in bounds), NE_latitude)
+        self.assertGreaterEqual(max(bound[3] for bound in bounds), NE_longitude)
+
+    def test_too_large_at_min_zoom(self):
+        with self.assertRaisesMessage(ValidationError, "TOO_LARGE_RANGE"):
+            viewport_tiles(-85, -180, 85, 180)
+
+    def test_non_finite_viewport(self):
+        for viewport in ((float("inf"), 127, 38, 128), (37, float("nan"), 38, 128)):
+            with self.subTest(viewport=viewport), self.assertRaisesMessage(ValidationError, "INVALID_VIEWPORT"):
+                viewport_tiles(*viewport)
+
+
+class TestRunnerTest(SimpleTestCase):
+    def test_data_versions_are_kept_apart(self):
+        # post_migrate bumps "lookups" while the test databases are created, before any override_settings of a test
+        self.assertNotEqual(os.path.realpath(settings.DATA_VERSION_DIR), os.path.realpath(os.path.join(settings.BASE_DIR, "versions")))
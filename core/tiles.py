@@ -0,0 +1,120 @@
+import json
+import math
+import threading
+
+from collections import OrderedDict
+
+from django.conf            import settings
+from django.http            import HttpResponse
+from django.core.exceptions import ValidationError
+
+from core.utils import encode_items
+
+
+def tile_x(longitude, zoom):
+    return min(max(math.floor((longitude + 180) / 360 * 2 ** zoom), 0), 2 ** zoom - 1)
+
+
+def tile_y(latitude, zoom):
+    latitude = math.radians(latitude)
+    return min(max(math.floor((1 - math.asinh(math.tan(latitude)) / math.pi) / 2 * 2 ** zoom), 0), 2 ** zoom - 1)
+
+
+def tile_longitude(x, zoom):
+    return x / 2 ** zoom * 360 - 180
+
+
+def tile_latitude(y, zoom):
+    return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / 2 ** zoom))))
+
+
+def tile_bounds(zoom, x, y):
+    # (SW latitude, SW longitude, NE latitude, NE longitude) of a slippy map tile
+    return tile_latitude(y + 1, zoom), tile_longitude(x, zoom), tile_latitude(y, zoom), tile_longitude(x + 1, zoom)
+
+
+def viewport_tiles(SW_latitude, SW_longitude, NE_latitude, NE_longitude):
+    """
+    (zoom, x, y) of the tiles covering the viewport, at the deepest zoom level
+    between MAP_TILE_MIN_ZOOM and MAP_TILE_MAX_ZOOM that needs at most MAP_TILE_MAX_TILES tiles.
+    Raises ValidationError for a viewport that needs more tiles even at MAP_TILE_MIN_ZOOM.
+    """
+    if not all(map(math.isfinite, (SW_latitude, SW_longitude, NE_latitude, NE_longitude))):
+        raise ValidationError("INVALID_VIEWPORT", code=400)
+
+    for zoom in range(settings.MAP_TILE_MAX_ZOOM, settings.MAP_TILE_MIN_ZOOM - 1, -1):
+        xs = range(tile_x(SW_longitude, zoom), tile_x(NE_longitude, zoom) + 1)
+        ys = range(tile_y(NE_latitude, zoom), tile_y(SW_latitude, zoom) + 1)
+
+        if len(xs) * len(ys) <= settings.MAP_TILE_MAX_TILES:
+            return [(zoom, x, y) for y in ys for x in xs]
+
+    raise ValidationError("TOO_LARGE_RANGE", code=400)
+
+
+class TileCache:
+    """
+    Serialized payloads of map tiles with LRU eviction, bounded by `max_bytes`.
+
+    Entries belong to one data version (see core.versions); the first lookup
+    with a newer version drops everything cached for the previous one.
+    """
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size      = 0
+        self.version   = None
+        self.entries   = OrderedDict()
+        self.lock      = threading.Lock()
+        self.hits      = 0
+        self.misses    = 0
+
+    def get(self, version, key, render):
+        with self.lock:
+            if version != self.version:
+                self.entries.clear()
+                self.size    = 0
+                self.version = version
+
+            payload = self.entries.get(key)
+            if payload is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return payload
+
+            self.misses += 1
+
+        payload = render()
+
+        with self.lock:
+            if version == self.version and key not in self.entries and len(payload) <= self.max_bytes:
+                self.entries[key] = payload
+                self.size        += len(payload)
+
+                while self.size > self.max_bytes:
+                    _, evicted  = self.entries.popitem(last=False)
+                    self.size  -= len(evicted)
+
+        return payload
+
+
+def tile_name(zoom, x, y):
+    return f"{zoom}/{x}/{y}"
+
+
+def tiled_response(cache, version, viewport, key, render_tile):
+    """
+    Snaps the viewport to tiles, serves every tile from `cache` (rendering the
+    missing ones with `render_tile(tile bounds)`) and stitches them into one response.
+    Tiles are half-open boxes, so a row never appears in two tiles.
+    """
+    tiles    = viewport_tiles(*viewport)
+    payloads = [
+        cache.get(version, (key, tile), lambda tile=tile: encode_items(render_tile(tile_bounds(*tile))))
+        for tile in tiles
+    ]
+
+    body = b"".join([
+        b'{"tiles": ', json.dumps([tile_name(*tile) for tile in tiles]).encode(),
+        b', "results": [', b", ".join(payload for payload in payloads if payload), b"]}"
+    ])
+    return HttpResponse(body, content_type="application/json")
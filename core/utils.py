@@ -1,6 +1,11 @@
-import functools, time
+import base64, functools, json, time
 
-from django.db import connection, reset_queries
+from decimal import Decimal
+
+from django.db                    import connection, reset_queries
+from django.db.models             import DecimalField
+from django.utils                 import timezone
+from django.core.serializers.json import DjangoJSONEncoder
 
 def query_debugger(func):
     @functools.wraps(func)
@@ -17,4 +22,109 @@ def query_debugger(func):
         print(f"Finished in : {(end - start):.2f}s")
         print(f"-------------------------------------------------------------------")
         return result
-    return wrapper
\ No newline at end of file
+    return wrapper
+
+def chunked(iterable, size):
+    chunk = []
+    for element in iterable:
+        chunk.append(element)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+
+    if chunk:
+        yield chunk
+
+
+def normalize_field_value(field, value):
+    value = field.to_python(value)
+
+    if isinstance(field, DecimalField) and value is not None:
+        value = value.quantize(Decimal(1).scaleb(-field.decimal_places), context=field.context)
+
+    return value
+
+
+def bulk_upsert(model, rows, existing, batch_size):
+    """
+    rows     : {natural key: {attname: value}}
+    existing : {natural key: instance already stored}
+
+    Creates missing rows and updates only the rows whose values changed.
+    Returns (number of created rows, number of updated rows).
+    """
+    fields = {field.attname: field for field in model._meta.concrete_fields}
+    now    = timezone.now()
+
+    created_instances = []
+    updated_instances = []
+    update_fields     = set()
+
+    for key, values in rows.items():
+        values   = {attname: normalize_field_value(fields[attname], value) for attname, value in values.items()}
+        instance = existing.get(key)
+
+        if instance is None:
+            created_instances.append(model(**values))
+            continue
+
+        changed_attnames = [attname for attname, value in values.items() if getattr(instance, attname) != value]
+        if not changed_attnames:
+            continue
+
+        for attname in changed_attnames:
+            setattr(instance, attname, values[attname])
+        update_fields.update(fields[attname].name for attname in changed_attnames)
+
+        if "updated_at" in fields:
+            instance.updated_at = now
+            update_fields.add("updated_at")
+
+        updated_instances.append(instance)
+
+    model.objects.bulk_create(created_instances, batch_size=batch_size)
+    if updated_instances:
+        model.objects.bulk_update(updated_instances, sorted(update_fields), batch_size=batch_size)
+
+    return len(created_instances), len(updated_instances)
+
+
+def encode_items(items):
+    # the items of a JSON array without the brackets, so chunks of one array can be joined byte-wise
+    return json.dumps(items, cls=DjangoJSONEncoder)[1:-1].encode()
+
+
+def encode_cursor(key):
+    return base64.urlsafe_b64encode(str(key).encode()).decode()
+
+
+def decode_cursor(cursor):
+    # raises ValueError for a cursor that was not made by encode_cursor; b64decode alone skips stray characters
+    key = base64.urlsafe_b64decode(cursor.encode()).decode()
+
+    if not key or encode_cursor(key) != cursor:
+        raise ValueError("invalid cursor")
+
+    return key
+
+
+def accepts_exactly(request, media_type):
+    # unlike request.accepts(), a wildcard such as */* does not count
+    return any(f"{accepted.main_type}/{accepted.sub_type}" == media_type for accepted in request.accepted_types)
+
+
+class Lookup:
+    """
+    Distinct values in order of first appearance, for columnar payloads that
+    send an index instead of repeating the value.
+    """
+    def __init__(self):
+        self.values    = []
+        self.positions = {}
+
+    def index(self, value):
+        if value not in self.positions:
+            self.positions[value] = len(self.values)
+            self.values.append(value)
+
+        return self.positions[value]
@@ -0,0 +1,33 @@
+import os
+import tempfile
+import time
+
+from django.conf import settings
+
+
+def version_path(name):
+    return os.path.join(settings.DATA_VERSION_DIR, name)
+
+
+def current(name):
+    """
+    Version of a data set, shared by every process on the host without a database query.
+    0 until the data set is bumped for the first time.
+    """
+    try:
+        with open(version_path(name)) as version_file:
+            return int(version_file.read() or 0)
+    except FileNotFoundError:
+        return 0
+
+
+def bump(name):
+    # written to a temporary file and renamed, so readers never see a partial version
+    os.makedirs(settings.DATA_VERSION_DIR, exist_ok=True)
+    version = max(time.time_ns(), current(name) + 1)
+
+    with tempfile.NamedTemporaryFile("w", dir=settings.DATA_VERSION_DIR, delete=False) as version_file:
+        version_file.write(str(version))
+
+    os.replace(version_file.name, version_path(name))
+    return version
@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta
+
+from django.conf  import settings
+from django.utils import timezone
+
+from core.utils import encode_cursor, decode_cursor
+from evs.models import Charger, StationSummary
+
+
+def sync_token():
+    # tokens trail the clock, so rows written by a transaction that commits late are sent again rather than missed
+    since = timezone.now() - timedelta(seconds=settings.DELTA_SYNC_OVERLAP_SECONDS)
+    return since, encode_cursor(since.isoformat())
+
+
+def token_time(token):
+    # raises ValueError for a token that was not made by sync_token
+    return datetime.fromisoformat(decode_cursor(token))
+
+
+def changed_chargers(since, *filters, limit=None):
+    changed = Charger.objects\
+        .filter(*filters, updated_at__gt=since)\
+        .order_by("updated_at")\
+        .values_list("id", "station_id", "index_in_station", "charging_status__explanation", "updated_at")
+
+    if limit is not None:
+        changed = changed[:limit]
+
+    return [{
+        "id"               : charger_id,
+        "station_id"       : station_id,
+        "index_in_station" : index_in_station,
+        "charging_status"  : charging_status,
+        "updated_at"       : updated_at
+    } for charger_id, station_id, index_in_station, charging_status, updated_at in changed]
+
+
+def station_statuses(station_ids):
+    # EVMapView's count_of_status / quick_and_slow of the given stations, from their summaries
+    return [{
+        "id"              : summary.station_id,
+        "count_of_status" : {
+            "total_charger"                 : summary.total_charger,
+            "communication_abnomal_charger" : summary.communication_abnomal_charger,
+            "ready_charger"                 : summary.ready_charger,
+            "charging_charger"              : summary.charging_charger,
+            "suspending_charger"            : summary.suspending_charger,
+            "inspecting_charger"            : summary.inspecting_charger,
+            "not_confirmed_charger"         : summary.not_confirmed_charger
+        },
+        "quick_and_slow"  : {
+            "of_total_charger" : {
+                "quick" : summary.quick_charger,
+                "slow"  : summary.slow_charger
+            },
+            "of_ready_charger" : {
+                "quick" : summary.quick_charger_of_ready,
+                "slow"  : summary.slow_charger_of_ready
+            }
+        }
+    } for summary in StationSummary.objects.filter(station_id__in=station_ids)]
@@ -1,127 +1,321 @@
-import requests
+import numpy as np
 import pandas as pd
 
-from datetime import datetime
+from enum        import Enum
+from itertools   import repeat
+from collections import defaultdict
 
-from bs4 import BeautifulSoup
+from django.conf  import settings
+from django.db    import connection, transaction
+from django.utils import timezone
 
-from django.conf import settings
-from django.db   import transaction
+from core            import versions
+from core.utils      import chunked
+from evs.models      import ChargerHistory, Charger, IngestionRun, STATE_FIELDS, FINGERPRINT_OFFSET, FINGERPRINT_PRIME, state_fingerprint
+from evs.telemetry   import RunRecorder
+from evs.checkpoints import Checkpoints
+from evs.summaries   import refresh_station_summaries, snapshot_region_summaries
+from evs.fetch       import PageFetcher, REGION
+from evs             import nearest
+from evs.parsers     import charger_status_record, charger_status_columns, raw_fields, python_values
 
-from evs.models import ChargerHistory, Charger
 
+CHARGER_FRAME_COLUMNS = ["station_id", "index_in_station", "id", "charging_status_id", "state_fingerprint"]
 
-def getChargerStatusAPI():
-    URL = 'http://apis.data.go.kr/B552584/EvCharger/getChargerStatus'
+HISTORY_DATETIMES = ["charger_status_update_datetime", "last_charging_start_datetime", "last_charging_end_datetime", "now_charging_start_datetime"]
 
-    region = {
-        '서울' : 11,
-        '경기' : 41,
-        '인천' : 28
-    }
+
+class BatchSize(Enum):
+    LOOKUP = 1000
+    UPDATE = 1000
+    INSERT = 5000
+
+
+def charger_status_fetcher(session=None, columnar=False):
+    URL = 'http://apis.data.go.kr/B552584/EvCharger/getChargerStatus'
 
     MAX_SHIFT_SIZE = 10000
-    totalCount     = 1e9
     UPDATE_PERIOD  = 10
 
+    params = {
+        'serviceKey' : settings.DECODED_SERVICE_KEY,
+        'numOfRows'  : MAX_SHIFT_SIZE,
+        'period'     : UPDATE_PERIOD
+    }
+    if columnar:
+        return PageFetcher(URL, params, raw_fields, session=session, decode=charger_status_columns)
+
+    return PageFetcher(URL, params, charger_status_record, session=session)
+
+def getChargerStatusAPI(session=None, columnar=False, recorder=None):
     item_list = []
-    
-    print("------------------------------------------------------------------------------------------------------")
-    print("crawling_start\n")
-    crawling_start_time = datetime.now()
-    for city, zcode in region.items():
-        pageNo = 0
-        print("city: ", city)
-
-        while pageNo <= (totalCount / MAX_SHIFT_SIZE):
-            pageNo += 1
-            params = {
-                'serviceKey' : settings.DECODED_SERVICE_KEY,
-                'pageNo'     : pageNo,
-                'numOfRows'  : MAX_SHIFT_SIZE,
-                'period'     : UPDATE_PERIOD,
-                'zcode'      : zcode
-            }
-
-            response = requests.get(URL, params=params)
-
-            content = response.text
-
-            xml = BeautifulSoup(content, "lxml-xml")
-
-            header = xml.find("header")
-            items  = xml.find("items")
-
-            header_list = [{
-                "resultCode" : header.find("resultCode").text.strip(),
-                "resultMsg"  : header.find("resultMsg").text.strip(),
-                "totalCount" : header.find("totalCount").text.strip(),
-                "pageNo"     : header.find("pageNo").text.strip(),
-                "numOfRows"  : header.find("numOfRows").text.strip(),
-            }]
-            totalCount = int(header.find("totalCount").text.strip())
-
-
-            for item in items:
-                item_list.append({
-                    "business_id"                    : item.find("busiId").text.strip(),
-                    "station_id"                     : item.find("statId").text.strip(),
-                    "index_in_station"               : int(item.find("chgerId").text.strip()),
-                    "charging_status"                : int(item.find("stat").text.strip()),
-                    "charger_status_update_datetime" : item.find("statUpdDt").text.strip()[0:4]+'-'+item.find("statUpdDt").text.strip()[4:6]+'-'+item.find("statUpdDt").text.strip()[6:8]+' '+item.find("statUpdDt").text.strip()[8:10]+":"+item.find("statUpdDt").text.strip()[10:12]+":"+item.find("statUpdDt").text.strip()[12:14] if item.find("statUpdDt").text else None,
-                    "last_charging_start_datetime"   : item.find("lastTsdt").text.strip()[0:4]+'-'+item.find("lastTsdt").text.strip()[4:6]+'-'+item.find("lastTsdt").text.strip()[6:8]+' '+item.find("lastTsdt").text.strip()[8:10]+":"+item.find("lastTsdt").text.strip()[10:12]+":"+item.find("lastTsdt").text.strip()[12:14] if item.find("lastTsdt").text else None,
-                    "last_charging_end_datetime"     : item.find("lastTedt").text.strip()[0:4]+'-'+item.find("lastTedt").text.strip()[4:6]+'-'+item.find("lastTedt").text.strip()[6:8]+' '+item.find("lastTedt").text.strip()[8:10]+":"+item.find("lastTedt").text.strip()[10:12]+":"+item.find("lastTedt").text.strip()[12:14] if item.find("lastTedt").text else None,
-                    "now_charging_start_datetime"    : item.find("nowTsdt").text.strip()[0:4]+'-'+item.find("nowTsdt").text.strip()[4:6]+'-'+item.find("nowTsdt").text.strip()[6:8]+' '+item.find("nowTsdt").text.strip()[8:10]+":"+item.find("nowTsdt").text.strip()[10:12]+":"+item.find("nowTsdt").text.strip()[12:14] if item.find("nowTsdt").text else None, 
-                })
-    crawling_end_time = datetime.now()
-
-    print("crawling_complete\n")
-    print("crawling start time", crawling_start_time)
-    print("crawling end time", crawling_end_time)
-    print("crawling running time", crawling_end_time - crawling_start_time, "\n")
-
-    response_df = pd.DataFrame(header_list)
-    ev_df       = pd.DataFrame(item_list)
-
-    print(response_df.head(len(header_list)))
-    print(ev_df.head(len(item_list)))
-    
+    frames    = []
+
+    fetcher = charger_status_fetcher(session, columnar)
+
+    print("cities: ", *REGION)
+    for page in fetcher.iter_pages(REGION.values()):
+        if columnar:
+            frames.append(page.records)
+        else:
+            item_list.extend(page.records)
+
+        if recorder:
+            recorder.add_page(page)
+
+    if columnar:
+        item_list = pd.concat(frames, ignore_index=True) if frames else charger_status_columns([])
+
     return item_list
 
-def UpdateChargerHistory():
+def get_chargers(keys):
+    station_ids = {station_id for station_id, _ in keys}
+    chargers    = {}
 
-    item_list = getChargerStatusAPI()
+    for station_id_chunk in chunked(station_ids, BatchSize.LOOKUP.value):
+        stored_chargers = Charger.objects\
+            .filter(station_id__in=station_id_chunk)\
+            .only("id", "station_id", "index_in_station", "charging_status_id", "state_fingerprint")
 
-    update_required = []
+        chargers.update({(charger.station_id, charger.index_in_station): charger for charger in stored_chargers})
+
+    return chargers
+
+def bulk_update_charger_history(item_list):
+    chargers = get_chargers({(item["station_id"], item["index_in_station"]) for item in item_list})
+
+    update_required    = []
+    skipped            = 0
+    charger_ids_status = defaultdict(set)
+    moved_station_ids  = set()
+    changed_chargers   = {}
+    histories          = []
+
+    for item in item_list:
+        charger = chargers.get((item["station_id"], item["index_in_station"]))
+
+        if charger is None:
+            update_required.append((item["station_id"], item["index_in_station"]))
+            continue
+
+        fingerprint = state_fingerprint(item)
+        if charger.state_fingerprint == fingerprint:
+            skipped += 1
+            continue
+
+        if charger.charging_status_id != item["charging_status"]:
+            charger.charging_status_id = item["charging_status"]
+            charger_ids_status[item["charging_status"]].add(charger.id)
+            moved_station_ids.add(charger.station_id)
+
+        charger.state_fingerprint    = fingerprint
+        changed_chargers[charger.id] = charger
+        histories.append(ChargerHistory(
+            charger_status_update_datetime = item["charger_status_update_datetime"],
+            last_charging_start_datetime   = item["last_charging_start_datetime"],
+            last_charging_end_datetime     = item["last_charging_end_datetime"],
+            now_charging_start_datetime    = item["now_charging_start_datetime"],
+            charging_status_id             = item["charging_status"],
+            charger_id                     = charger.id
+        ))
+
+    now = timezone.now()
+
+    with transaction.atomic():
+        for charging_status, status_charger_ids in charger_ids_status.items():
+            for charger_id_chunk in chunked(status_charger_ids, BatchSize.UPDATE.value):
+                Charger.objects\
+                    .filter(id__in=charger_id_chunk)\
+                    .update(charging_status_id=charging_status, updated_at=now)
+
+        Charger.objects.bulk_update(changed_chargers.values(), ["state_fingerprint"], batch_size=BatchSize.UPDATE.value)
+        ChargerHistory.objects.bulk_create(histories, batch_size=BatchSize.INSERT.value)
+        refresh_station_summaries(moved_station_ids)
+
+    return update_required, skipped
+
+def get_charger_frame(station_ids):
+    frames = []
+
+    for station_id_chunk in chunked(station_ids, BatchSize.LOOKUP.value):
+        chargers = Charger.objects\
+            .filter(station_id__in=station_id_chunk)\
+            .values_list("station_id", "index_in_station", "id", "charging_status_id", "state_fingerprint")
+
+        # object columns, a NULL fingerprint would otherwise turn the column into lossy floats
+        frames.append(pd.DataFrame(list(chargers), columns=CHARGER_FRAME_COLUMNS, dtype=object))
+
+    charger_frame = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=CHARGER_FRAME_COLUMNS, dtype=object)
+    return charger_frame.astype({"index_in_station": "int64", "id": "int64", "charging_status_id": "int64", "state_fingerprint": "Int64"})
+
+def frame_fingerprints(frame):
+    # state_fingerprint() of every row, over whole columns; NaT is already NULL_STATE as int64
+    fingerprints = np.full(len(frame), FINGERPRINT_OFFSET, dtype="uint64")
+
+    for field in STATE_FIELDS:
+        column = frame[field]
+        if pd.api.types.is_datetime64_dtype(column):
+            codes = column.to_numpy("datetime64[s]").view("int64")
+        else:
+            codes = column.to_numpy("int64")
+
+        fingerprints = (fingerprints ^ codes.view("uint64")) * np.uint64(FINGERPRINT_PRIME)
 
-    print("\nstart update charger_histories table")
-    update_start_time = datetime.now()
+    return fingerprints.view("int64")
+
+def update_fingerprints(charger_ids, fingerprints):
+    # one UPDATE ... CASE per batch, what bulk_update would send, without a Charger instance per row
+    table      = connection.ops.quote_name(Charger._meta.db_table)
+    batch_size = min(BatchSize.UPDATE.value, connection.ops.bulk_batch_size(["id", "state_fingerprint", "id"], charger_ids))
+
+    with connection.cursor() as cursor:
+        for start in range(0, len(charger_ids), batch_size):
+            ids   = charger_ids[start:start + batch_size]
+            cases = np.column_stack((ids, fingerprints[start:start + batch_size])).ravel().tolist()
+
+            cursor.execute(
+                f"UPDATE {table} SET state_fingerprint = CASE id {' '.join(['WHEN %s THEN %s'] * len(ids))} END "
+                f"WHERE id IN ({', '.join(['%s'] * len(ids))})",
+                [*cases, *ids.tolist()]
+            )
+
+def insert_histories(frame, now):
+    # charger_histories rows straight from the columns of `frame`, without a ChargerHistory instance per row
+    fields = [ChargerHistory._meta.get_field(name) for name in (*HISTORY_DATETIMES, "charging_status", "charger", "created_at", "updated_at")]
+    now    = connection.ops.adapt_datetimefield_value(now)
+    rows   = zip(
+        *([connection.ops.adapt_datetimefield_value(value) for value in python_values(frame[field])] for field in HISTORY_DATETIMES),
+        frame["charging_status"].tolist(),
+        frame["id"].tolist(),
+        repeat(now),
+        repeat(now)
+    )
+
+    with connection.cursor() as cursor:
+        for chunk in chunked(rows, BatchSize.INSERT.value):
+            cursor.executemany(
+                f"INSERT INTO {connection.ops.quote_name(ChargerHistory._meta.db_table)} "
+                f"({', '.join(connection.ops.quote_name(field.column) for field in fields)}) VALUES ({', '.join(['%s'] * len(fields))})",
+                chunk
+            )
+
+def bulk_update_charger_history_columns(frame):
+    merged = frame.merge(
+        get_charger_frame(frame["station_id"].unique()),
+        on  = ["station_id", "index_in_station"],
+        how = "left"
+    )
+
+    unknown         = merged["id"].isna()
+    update_required = list(zip(merged.loc[unknown, "station_id"], merged.loc[unknown, "index_in_station"].tolist()))
+
+    known        = merged[~unknown].drop_duplicates("id", keep="last")
+    fingerprints = frame_fingerprints(known)
+    changed_mask = known["state_fingerprint"].ne(fingerprints).fillna(True).to_numpy(dtype=bool)
+
+    changed      = known[changed_mask].assign(id=lambda changed: changed["id"].astype("int64"), state_fingerprint=fingerprints[changed_mask])
+    skipped      = len(merged) - len(update_required) - len(changed)
+    status_moved = changed[changed["charging_status"] != changed["charging_status_id"]]
+
+    now = timezone.now()
+
+    with transaction.atomic():
+        for charging_status, status_charger_ids in status_moved.groupby("charging_status")["id"]:
+            for charger_id_chunk in chunked(status_charger_ids.tolist(), BatchSize.UPDATE.value):
+                Charger.objects\
+                    .filter(id__in=charger_id_chunk)\
+                    .update(charging_status_id=int(charging_status), updated_at=now)
+
+        update_fingerprints(changed["id"].to_numpy(), changed["state_fingerprint"].to_numpy())
+        insert_histories(changed, now)
+        refresh_station_summaries(status_moved["station_id"].unique().tolist())
+
+    return update_required, skipped
+
+def update_charger_history_one_by_one(item_list):
+    update_required   = []
+    skipped           = 0
+    moved_station_ids = set()
 
     for item in item_list:
         with transaction.atomic():
             try: 
                 charger = Charger.objects.get(station_id=item["station_id"], index_in_station=item["index_in_station"])
+            except Charger.DoesNotExist:
+                update_required.append((item["station_id"], item["index_in_station"]))
+                continue
+
+            fingerprint = state_fingerprint(item)
+            if charger.state_fingerprint == fingerprint:
+                skipped += 1
+                continue
+
+            charger.state_fingerprint = fingerprint
+
+            # like the bulk path, updated_at only moves when the status does
+            if charger.charging_status_id != item["charging_status"]:
+                moved_station_ids.add(charger.station_id)
                 charger.charging_status_id = item["charging_status"]
                 charger.save()
+            else:
+                charger.save(update_fields=["state_fingerprint"])
 
-                ChargerHistory.objects.create(
-                    charger_status_update_datetime = item["charger_status_update_datetime"],
-                    last_charging_start_datetime   = item["last_charging_start_datetime"],
-                    last_charging_end_datetime     = item["last_charging_end_datetime"],
-                    now_charging_start_datetime    = item["now_charging_start_datetime"],
-                    charging_status_id             = item["charging_status"],
-                    charger_id                     = charger.id
-                )
-            except Charger.DoesNotExist:
-                update_required.append((item["station_id"], item["index_in_station"]))
+            ChargerHistory.objects.create(
+                charger_status_update_datetime = item["charger_status_update_datetime"],
+                last_charging_start_datetime   = item["last_charging_start_datetime"],
+                last_charging_end_datetime     = item["last_charging_end_datetime"],
+                now_charging_start_datetime    = item["now_charging_start_datetime"],
+                charging_status_id             = item["charging_status"],
+                charger_id                     = charger.id
+            )
+
+    refresh_station_summaries(moved_station_ids)
+
+    return update_required, skipped
+
+def UpdateChargerHistory(bulk=True, session=None, columnar=False):
+    print("------------------------------------------------------------------------------------------------------")
+
+    if columnar:
+        write = bulk_update_charger_history_columns
+    elif bulk:
+        write = bulk_update_charger_history
+    else:
+        write = update_charger_history_one_by_one
+
+    update_required = []
+
+    with RunRecorder(IngestionRun.Job.CHARGER_STATUS) as recorder:
+        checkpoints = Checkpoints(IngestionRun.Job.CHARGER_STATUS, recorder.run)
+        completed   = checkpoints.completed()
+
+        print("cities: ", *REGION)
+        print("resumed pages:", sum(len(page_numbers) for _, page_numbers in completed.values()))
+
+        # a status run never resumes (see INGESTION_RESUME_SECONDS), a rerun fetches the whole window
+        # again and the pages a failed run already wrote come back as unchanged fingerprints
+        pages         = charger_status_fetcher(session, columnar).iter_pages(REGION.values(), completed)
+        pages_written = 0
+        try:
+            for page in recorder.crawl(pages):
+                with recorder.phase("write"):
+                    written = checkpoints.commit(page, write)
+
+                if written:
+                    versions.bump("evs")
+                    pages_written += 1
+
+                    page_update_required, skipped = written
+                    update_required.extend(page_update_required)
+                    recorder.run.skipped += skipped
+        finally:
+            if pages_written:
+                versions.bump(nearest.VERSION)
+
+        recorder.run.unknown_chargers = len(update_required)
+        snapshot_region_summaries(recorder.run)
 
     print("Update Required")
     print("(station_id, index_in_station)")
     print(*update_required, sep="\n")
-
-    print("\nUpdateChargerHistory complete")
-    update_end_time = datetime.now()
-    print("update start time", update_start_time)
-    print("update end time", update_end_time)
-    print("update running time :", update_end_time - update_start_time)
-    print("------------------------------------------------------------------------------------------------------")
\ No newline at end of file
+    print("------------------------------------------------------------------------------------------------------")
@@ -0,0 +1,72 @@
+from datetime import timedelta
+
+from django.conf      import settings
+from django.db        import transaction, IntegrityError
+from django.db.models import Max
+
+from evs.models import IngestionRun, IngestionCheckpoint
+
+
+class Checkpoints:
+    """
+    Per (zcode, pageNo) progress of an ingestion job within its current cycle.
+
+    A cycle starts with a run and is carried on by the runs that follow it until one
+    succeeds, for at most INGESTION_RESUME_SECONDS of the job; jobs without a resume
+    window start a cycle with every run. A page's rows and its
+    checkpoint are committed in one transaction, so a rerun after a failure only fetches
+    the pages that are missing, and an overlapping run that loses the race for a page
+    discards its copy.
+    """
+    def __init__(self, job, run):
+        self.job         = job
+        self.run         = run
+        self.cycle_start = self.resumed_cycle() or run.started_at
+
+        IngestionCheckpoint.objects.filter(job=job, cycle_start__lt=self.cycle_start).delete()
+
+    def resumed_cycle(self):
+        # the start of the last cycle of the job, unless a run completed it or it is too old to resume
+        resume_seconds = settings.INGESTION_RESUME_SECONDS.get(self.job)
+        if not resume_seconds:
+            return None
+
+        cycle_start = IngestionCheckpoint.objects.filter(job=self.job).aggregate(cycle_start=Max("cycle_start"))["cycle_start"]
+
+        if cycle_start is None or cycle_start < self.run.started_at - timedelta(seconds=resume_seconds):
+            return None
+
+        if IngestionRun.objects.filter(job=self.job, status=IngestionRun.Status.SUCCEEDED, started_at__gte=cycle_start).exists():
+            return None
+
+        return cycle_start
+
+    def completed(self):
+        completed   = {}
+        checkpoints = IngestionCheckpoint.objects\
+            .filter(job=self.job, cycle_start=self.cycle_start)\
+            .values_list("zcode", "page_no", "total_count")
+
+        for zcode, page_no, total_count in checkpoints:
+            completed.setdefault(zcode, (total_count, set()))[1].add(page_no)
+
+        return completed
+
+    def commit(self, page, write):
+        # returns what `write` returned, or None when another run already committed the page
+        with transaction.atomic():
+            try:
+                with transaction.atomic():
+                    IngestionCheckpoint.objects.create(
+                        job         = self.job,
+                        cycle_start = self.cycle_start,
+                        zcode       = page.zcode,
+                        page_no     = page.page_no,
+                        total_count = page.total_count,
+                        rows        = len(page.records),
+                        run         = self.run
+                    )
+            except IntegrityError:
+                return None
+
+            return write(page.records)
@@ -0,0 +1,178 @@
+import math
+import random
+import time
+import threading
+
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import requests
+
+from lxml              import etree
+from requests.adapters import HTTPAdapter
+
+from django.conf import settings
+
+from evs.parsers import PageStream, CHUNK_SIZE
+
+
+REGION = {
+    '서울' : 11,
+    '경기' : 41,
+    '인천' : 28
+}
+
+RETRY_EXCEPTIONS = (
+    requests.exceptions.Timeout,
+    requests.exceptions.ConnectionError,
+    requests.exceptions.ChunkedEncodingError,
+    etree.XMLSyntaxError,
+)
+
+RESULT_CODE_NORMAL = "00"
+
+_session      = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    global _session
+
+    with _session_lock:
+        if _session is None:
+            adapter  = HTTPAdapter(pool_connections=1, pool_maxsize=settings.EV_API_MAX_WORKERS)
+            _session = requests.Session()
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+
+    return _session
+
+
+class ServerError(Exception):
+    pass
+
+
+class ApiError(Exception):
+    # the API answered, but with an error in place of a page (served with HTTP 200)
+    pass
+
+
+class Page:
+    def __init__(self, zcode, page_no, header, records, latency, fetch_seconds, retries):
+        self.zcode         = zcode
+        self.page_no       = page_no
+        self.header        = header
+        self.records       = records
+        self.latency       = latency
+        self.fetch_seconds = fetch_seconds
+        self.retries       = retries
+
+    @property
+    def parse_seconds(self):
+        return self.latency - self.fetch_seconds
+
+    @property
+    def total_count(self):
+        return int(self.header["totalCount"])
+
+
+class PageFetcher:
+    """
+    Fetches every page of an EvCharger API operation for several zcodes over a
+    shared pooled session, at most `max_workers` pages at a time.
+
+    The first page of each zcode tells how many pages follow; the rest are
+    queued as soon as it arrives. Pages are yielded in completion order.
+    """
+    def __init__(self, url, params, to_record, session=None, max_workers=None, decode=list):
+        self.url         = url
+        self.params      = params
+        self.to_record   = to_record
+        self.decode      = decode
+        self.session     = session or get_session()
+        self.max_workers = max_workers or settings.EV_API_MAX_WORKERS
+
+    def iter_pages(self, zcodes, completed=None):
+        # completed: {zcode: (total count, {page numbers})} of pages that must not be fetched again
+        completed = completed or {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = set()
+            for zcode in zcodes:
+                total_count, page_numbers = completed.get(zcode, (None, set()))
+
+                if 1 in page_numbers:
+                    pending |= {executor.submit(self.fetch_page, zcode, page_no) for page_no in self.remaining_pages(total_count, page_numbers)}
+                else:
+                    pending.add(executor.submit(self.fetch_page, zcode, 1))
+
+            try:
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+                    for future in done:
+                        page = future.result()
+
+                        if page.page_no == 1:
+                            _, page_numbers = completed.get(page.zcode, (None, set()))
+                            pending |= {executor.submit(self.fetch_page, page.zcode, page_no) for page_no in self.remaining_pages(page.total_count, page_numbers | {1})}
+
+                        print(f"zcode {page.zcode} page {page.page_no}: {len(page.records)} rows in {page.latency:.2f}s (retries {page.retries})")
+
+                        yield page
+            finally:
+                for future in pending:
+                    future.cancel()
+
+    def remaining_pages(self, total_count, page_numbers):
+        last_page_no = math.ceil(total_count / self.params["numOfRows"])
+        return [page_no for page_no in range(1, last_page_no + 1) if page_no not in page_numbers]
+
+    def fetch_page(self, zcode, page_no):
+        params = dict(self.params, zcode=zcode, pageNo=page_no)
+
+        for retries in range(settings.EV_API_MAX_RETRIES + 1):
+            start = time.perf_counter()
+            try:
+                with self.session.get(self.url, params=params, stream=True, timeout=settings.EV_API_TIMEOUT) as response:
+                    if response.status_code >= 500:
+                        raise ServerError(f"{response.status_code} from {self.url}")
+                    response.raise_for_status()
+
+                    fetch_seconds = [time.perf_counter() - start]
+                    page          = PageStream(timed(response.iter_content(chunk_size=CHUNK_SIZE), fetch_seconds), self.to_record)
+                    records       = self.decode(page)
+
+                check_result(page.header, self.url)
+                return Page(zcode, page_no, page.header, records, time.perf_counter() - start, sum(fetch_seconds), retries)
+
+            except (ServerError, *RETRY_EXCEPTIONS):
+                if retries == settings.EV_API_MAX_RETRIES:
+                    raise
+
+                time.sleep(backoff(retries))
+
+
+def check_result(header, url):
+    if not header:
+        raise ApiError(f"no result header in the response from {url}")
+
+    if header.get("resultCode") != RESULT_CODE_NORMAL:
+        raise ApiError(f"{url} answered {header.get('resultCode')}: {header.get('resultMsg', '')}")
+
+
+def timed(chunks, seconds):
+    # appends the time spent waiting on each chunk so network time can be told apart from parsing
+    chunks = iter(chunks)
+    while True:
+        start = time.perf_counter()
+        chunk = next(chunks, None)
+        seconds.append(time.perf_counter() - start)
+
+        if chunk is None:
+            return
+        yield chunk
+
+
+def backoff(retries):
+    # exponential backoff with full jitter
+    return random.uniform(0, min(settings.EV_API_BACKOFF_MAX, settings.EV_API_BACKOFF_BASE * 2 ** retries))
@@ -0,0 +1,236 @@
+from enum        import Enum
+from datetime    import datetime, timedelta
+from operator    import itemgetter
+from itertools   import groupby
+from collections import defaultdict
+
+from django.conf                import settings
+from django.db                  import transaction
+from django.db.models           import Max, Min, Sum, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils               import timezone
+
+from core.utils     import chunked
+from evs.models     import Charger, ChargerHistory, ChargerStatusRollup
+from evs.partitions import is_partitioned, add_partitions, drop_partitions
+
+
+class BatchSize(Enum):
+    LOOKUP = 1000
+    INSERT = 5000
+    DELETE = 10000
+
+
+HOUR = timedelta(hours=1)
+DAY  = timedelta(days=1)
+
+
+def start_of_hour(moment):
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def start_of_day(moment):
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def histories_by_status_time():
+    # status_at: the API's charger_status_update_datetime, or the time the row was fetched when it is missing
+    return ChargerHistory.objects.annotate(status_at=Coalesce("charger_status_update_datetime", "created_at"))
+
+
+def histories_from(start):
+    # a row is always fetched after its status changed, so created_at >= start prunes the partitions to scan
+    return histories_by_status_time().filter(created_at__gte=start, status_at__gte=start)
+
+
+def statuses_at(start):
+    # chargers whose status did not change from `start` on are still in their current status;
+    # the others were in the status of their last history row before `start`
+    statuses         = dict(Charger.objects.values_list("id", "charging_status_id"))
+    changed_chargers = histories_from(start).values_list("charger_id", flat=True).distinct()
+
+    previous_status = histories_by_status_time()\
+        .filter(charger_id=OuterRef("id"), status_at__lt=start)\
+        .order_by("-status_at")\
+        .values("charging_status_id")[:1]
+
+    for charger_id_chunk in chunked(changed_chargers, BatchSize.LOOKUP.value):
+        statuses.update(Charger.objects
+            .filter(id__in=charger_id_chunk)
+            .annotate(previous_status=Subquery(previous_status))
+            .values_list("id", "previous_status")
+        )
+
+    return statuses
+
+
+def hourly_durations(charger_id, charging_status, since, until):
+    # yields ((hour, charger id, charging status), seconds) of the time from `since` to `until`, split at the hours
+    while since < until:
+        hour_end = min(start_of_hour(since) + HOUR, until)
+        yield (start_of_hour(since), charger_id, charging_status), (hour_end - since).total_seconds()
+        since = hour_end
+
+
+def charger_durations(charger_id, charging_status, changes, start, end):
+    durations = defaultdict(float)
+    moment    = start
+
+    for status_at, next_charging_status in changes:
+        if charging_status is not None:
+            for key, seconds in hourly_durations(charger_id, charging_status, moment, status_at):
+                durations[key] += seconds
+        moment, charging_status = status_at, next_charging_status
+
+    if charging_status is not None:
+        for key, seconds in hourly_durations(charger_id, charging_status, moment, end):
+            durations[key] += seconds
+
+    return durations
+
+
+def status_durations(start, end):
+    """
+    Yields {(hour, charger id, charging status): seconds} per charger for every hour from `start` to `end`,
+    from one scan of the histories in between ordered by charger and status time.
+    """
+    statuses  = statuses_at(start)
+    histories = histories_from(start)\
+        .filter(status_at__lt=end)\
+        .order_by("charger_id", "status_at")\
+        .values_list("charger_id", "status_at", "charging_status_id")
+
+    for charger_id, changes in groupby(histories.iterator(chunk_size=BatchSize.INSERT.value), key=itemgetter(0)):
+        yield charger_durations(charger_id, statuses.pop(charger_id, None), [change[1:] for change in changes], start, end)
+
+    # chargers without a change in between kept one status all along
+    for charger_id, charging_status in statuses.items():
+        yield charger_durations(charger_id, charging_status, [], start, end)
+
+
+def replace_rollups(period, period_start, rollups):
+    with transaction.atomic():
+        ChargerStatusRollup.objects.filter(period=period, period_start=period_start).delete()
+        ChargerStatusRollup.objects.bulk_create(rollups, batch_size=BatchSize.INSERT.value)
+
+
+def rollup_hours(until):
+    last_hour = ChargerStatusRollup.objects\
+        .filter(period=ChargerStatusRollup.Period.HOUR)\
+        .aggregate(last_hour=Max("period_start"))["last_hour"]
+
+    if last_hour:
+        start = last_hour + HOUR
+    else:
+        first_history = ChargerHistory.objects.aggregate(first_history=Min("created_at"))["first_history"]
+        if first_history is None:
+            return 0
+        start = start_of_hour(max(first_history, until - timedelta(days=settings.CHARGER_HISTORY_RETENTION_DAYS)))
+
+    if start >= until:
+        return 0
+
+    rollups = (
+        ChargerStatusRollup(
+            period             = ChargerStatusRollup.Period.HOUR,
+            period_start       = hour,
+            seconds            = round(seconds),
+            charging_status_id = charging_status,
+            charger_id         = charger_id
+        )
+        for durations in status_durations(start, until)
+        for (hour, charger_id, charging_status), seconds in durations.items() if round(seconds)
+    )
+
+    with transaction.atomic():
+        ChargerStatusRollup.objects.filter(period=ChargerStatusRollup.Period.HOUR, period_start__gte=start, period_start__lt=until).delete()
+        for rollup_chunk in chunked(rollups, BatchSize.INSERT.value):
+            ChargerStatusRollup.objects.bulk_create(rollup_chunk)
+
+    return round((until - start) / HOUR)
+
+
+def rollup_days(until):
+    periods = ChargerStatusRollup.objects.values("period").annotate(last=Max("period_start"))
+    last    = {period["period"]: period["last"] for period in periods}
+
+    if ChargerStatusRollup.Period.HOUR not in last:
+        return 0
+
+    if ChargerStatusRollup.Period.DAY in last:
+        day = last[ChargerStatusRollup.Period.DAY] + DAY
+    else:
+        first_hour = ChargerStatusRollup.objects.filter(period=ChargerStatusRollup.Period.HOUR).aggregate(first_hour=Min("period_start"))["first_hour"]
+        day        = start_of_day(first_hour)
+
+    # a day is rolled up once its last hour is
+    rolled_up = 0
+    while day + DAY <= min(until, last[ChargerStatusRollup.Period.HOUR] + HOUR):
+        hourly_rollups = ChargerStatusRollup.objects\
+            .filter(period=ChargerStatusRollup.Period.HOUR, period_start__gte=day, period_start__lt=day + DAY)\
+            .values("charger_id", "charging_status_id")\
+            .annotate(total_seconds=Sum("seconds"))
+
+        replace_rollups(ChargerStatusRollup.Period.DAY, day, [
+            ChargerStatusRollup(
+                period             = ChargerStatusRollup.Period.DAY,
+                period_start       = day,
+                seconds            = rollup["total_seconds"],
+                charging_status_id = rollup["charging_status_id"],
+                charger_id         = rollup["charger_id"]
+            )
+            for rollup in hourly_rollups
+        ])
+        day       += DAY
+        rolled_up += 1
+
+    return rolled_up
+
+
+def delete_in_chunks(queryset):
+    deleted = 0
+    while True:
+        ids = list(queryset.values_list("id", flat=True)[:BatchSize.DELETE.value])
+        if not ids:
+            return deleted
+
+        deleted += queryset.model.objects.filter(id__in=ids).delete()[0]
+
+
+def expire_histories(now):
+    # raw rows are only dropped once their day has been rolled up
+    last_day = ChargerStatusRollup.objects\
+        .filter(period=ChargerStatusRollup.Period.DAY)\
+        .aggregate(last_day=Max("period_start"))["last_day"]
+
+    if last_day is None:
+        cutoff = None
+    else:
+        cutoff = min(start_of_day(now) - timedelta(days=settings.CHARGER_HISTORY_RETENTION_DAYS), last_day + DAY)
+
+    if is_partitioned():
+        added   = add_partitions(start_of_day(now) + timedelta(days=settings.CHARGER_HISTORY_PARTITIONS_AHEAD))
+        dropped = drop_partitions(cutoff) if cutoff else []
+        print("partitions added  :", *added)
+        print("partitions dropped:", *dropped)
+    elif cutoff:
+        print("histories deleted :", delete_in_chunks(ChargerHistory.objects.filter(created_at__lt=cutoff)))
+
+    hourly_cutoff = start_of_day(now) - timedelta(days=settings.CHARGER_STATUS_HOURLY_ROLLUP_RETENTION_DAYS)
+    print("hourly rollups deleted:", delete_in_chunks(ChargerStatusRollup.objects.filter(period=ChargerStatusRollup.Period.HOUR, period_start__lt=hourly_cutoff)))
+
+
+def maintain_charger_histories():
+    print("------------------------------------------------------------------------------------------------------")
+    print("maintain charger_histories start\n")
+    start_time = datetime.now()
+    now        = timezone.now()
+
+    print("hours rolled up :", rollup_hours(start_of_hour(now)))
+    print("days rolled up  :", rollup_days(start_of_day(now)))
+    expire_histories(now)
+
+    end_time = datetime.now()
+    print("\nmaintain charger_histories complete")
+    print("running time :", end_time - start_time)
+    print("------------------------------------------------------------------------------------------------------")
@@ -0,0 +1,256 @@
+import asyncio
+import json
+import math
+
+from collections  import defaultdict
+from urllib.parse import parse_qs
+
+from asgiref.sync                 import sync_to_async
+from django.conf                  import settings
+from django.db                    import close_old_connections
+from django.core.serializers.json import DjangoJSONEncoder
+
+from core        import versions
+from evs.models  import Station
+from evs.changes import sync_token, changed_chargers, station_statuses
+
+
+def live_cells(SW_latitude, SW_longitude, NE_latitude, NE_longitude):
+    if not all(map(math.isfinite, (SW_latitude, SW_longitude, NE_latitude, NE_longitude))):
+        raise ValueError("viewport is not finite")
+
+    rows    = range(math.floor(SW_latitude / settings.LIVE_CELL_SIZE), math.floor(NE_latitude / settings.LIVE_CELL_SIZE) + 1)
+    columns = range(math.floor(SW_longitude / settings.LIVE_CELL_SIZE), math.floor(NE_longitude / settings.LIVE_CELL_SIZE) + 1)
+
+    if not rows or not columns or len(rows) * len(columns) > settings.LIVE_MAX_CELLS:
+        raise ValueError("viewport is empty or too large")
+
+    return [(row, column) for row in rows for column in columns]
+
+
+def live_cell(latitude, longitude):
+    return math.floor(latitude / settings.LIVE_CELL_SIZE), math.floor(longitude / settings.LIVE_CELL_SIZE)
+
+
+class Subscription:
+    """
+    One /evs/live connection, subscribed to a viewport and/or a set of station ids.
+    Events are queued until the connection sends them; a client that falls
+    LIVE_QUEUE_SIZE events behind is told to resync instead.
+    """
+    def __init__(self, viewport=None, station_ids=()):
+        self.viewport    = viewport
+        self.station_ids = frozenset(station_ids)
+        self.cells       = live_cells(*viewport) if viewport else []
+        self.queue       = asyncio.Queue(maxsize=settings.LIVE_QUEUE_SIZE)
+        self.overflowed  = False
+
+    @classmethod
+    def from_query_string(cls, query_string):
+        params      = parse_qs(query_string.decode())
+        station_ids = params.get("station_id", [])
+        viewport    = None
+
+        if "SW_latitude" in params or not station_ids:
+            viewport = tuple(float(params[name][0]) for name in ("SW_latitude", "SW_longitude", "NE_latitude", "NE_longitude"))
+
+        return cls(viewport, station_ids)
+
+    def matches(self, station_id, latitude, longitude):
+        if station_id in self.station_ids:
+            return True
+
+        if self.viewport is None:
+            return False
+
+        SW_latitude, SW_longitude, NE_latitude, NE_longitude = self.viewport
+        return SW_latitude <= latitude <= NE_latitude and SW_longitude <= longitude <= NE_longitude
+
+    def push(self, event):
+        if self.overflowed:
+            return
+
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+
+class SubscriptionIndex:
+    # subscriptions by LIVE_CELL_SIZE grid cell and by station id, so a change is matched against the few that can see it
+    def __init__(self):
+        self.by_cell    = defaultdict(set)
+        self.by_station = defaultdict(set)
+        self.count      = 0
+
+    def __len__(self):
+        return self.count
+
+    def add(self, subscription):
+        for cell in subscription.cells:
+            self.by_cell[cell].add(subscription)
+        for station_id in subscription.station_ids:
+            self.by_station[station_id].add(subscription)
+        self.count += 1
+
+    def remove(self, subscription):
+        for cell in subscription.cells:
+            self.by_cell[cell].discard(subscription)
+            if not self.by_cell[cell]:
+                del self.by_cell[cell]
+        for station_id in subscription.station_ids:
+            self.by_station[station_id].discard(subscription)
+            if not self.by_station[station_id]:
+                del self.by_station[station_id]
+        self.count -= 1
+
+    def matching(self, station_id, latitude, longitude):
+        candidates = self.by_cell.get(live_cell(latitude, longitude), set()) | self.by_station.get(station_id, set())
+        return [subscription for subscription in candidates if subscription.matches(station_id, latitude, longitude)]
+
+
+class ChangeFeed:
+    """
+    Fans charger status changes out to the subscriptions of this server process.
+
+    Ingestion bumps the "evs" data version after every committed page, so one task per
+    process watches the version every LIVE_POLL_SECONDS and only queries the changed
+    chargers when it moved. The task runs while there are subscriptions.
+    """
+    def __init__(self):
+        self.subscriptions = SubscriptionIndex()
+        self.task          = None
+        self.version       = None
+        self.since         = None
+        self.sent          = set()
+
+    def subscribe(self, subscription):
+        self.subscriptions.add(subscription)
+
+        if self.task is None or self.task.done():
+            self.version, self.since, self.sent = versions.current("evs"), sync_token()[0], set()
+            self.task = asyncio.ensure_future(self.run())
+
+    def unsubscribe(self, subscription):
+        self.subscriptions.remove(subscription)
+
+    async def run(self):
+        while self.subscriptions:
+            await asyncio.sleep(settings.LIVE_POLL_SECONDS)
+
+            version = versions.current("evs")
+            if version == self.version:
+                continue
+
+            self.version = version
+            self.publish(*await sync_to_async(self.collect)())
+
+    def collect(self):
+        close_old_connections()
+        since, token = sync_token()
+
+        # the windows of consecutive polls overlap; charger changes already pushed are skipped
+        changes    = [change for change in changed_chargers(self.since) if (change["id"], change["updated_at"]) not in self.sent]
+        self.sent  = {key for key in self.sent | {(change["id"], change["updated_at"]) for change in changes} if key[1] > since}
+        self.since = since
+
+        station_ids = {change["station_id"] for change in changes}
+        coordinates = {
+            station_id: (float(latitude), float(longitude))
+            for station_id, latitude, longitude in Station.objects.filter(id__in=station_ids).values_list("id", "latitude", "longitude")
+        }
+        statuses = {status["id"]: status for status in station_statuses(station_ids)}
+
+        close_old_connections()
+        return changes, coordinates, statuses, token
+
+    def publish(self, changes, coordinates, statuses, token):
+        changes_by_station = defaultdict(list)
+        for change in changes:
+            changes_by_station[change["station_id"]].append(change)
+
+        events = defaultdict(lambda: {"changes" : [], "stations" : [], "token" : token})
+        for station_id, station_changes in changes_by_station.items():
+            if station_id not in coordinates:
+                continue
+
+            for subscription in self.subscriptions.matching(station_id, *coordinates[station_id]):
+                events[subscription]["changes"].extend(station_changes)
+                if station_id in statuses:
+                    events[subscription]["stations"].append(statuses[station_id])
+
+        for subscription, event in events.items():
+            subscription.push(event)
+
+
+feed = ChangeFeed()
+
+
+def server_sent_event(name, data=None, event_id=None):
+    lines = [f"event: {name}"]
+    if event_id:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {json.dumps(data, cls=DjangoJSONEncoder)}")
+    return ("\n".join(lines) + "\n\n").encode()
+
+
+async def wait_for_disconnect(receive):
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+async def live_application(scope, receive, send):
+    """
+    GET /evs/live, server-sent events of the charger status changes in a viewport
+    (SW_latitude, SW_longitude, NE_latitude, NE_longitude) and/or of stations (station_id, repeatable).
+
+    Each `changes` event has the payload of /evs/changes; its id is a /evs/changes token, so a
+    client that reconnects can fetch what it missed. A `resync` event means the client fell behind
+    and should reload the map.
+    """
+    headers = [(b"cache-control", b"no-cache")]
+    origin  = dict(scope["headers"]).get(b"origin")
+    if origin and settings.CORS_ORIGIN_ALLOW_ALL:
+        headers += [(b"access-control-allow-origin", origin), (b"access-control-allow-credentials", b"true")]
+
+    try:
+        subscription = Subscription.from_query_string(scope["query_string"])
+
+    except KeyError:
+        return await send_json(send, 400, headers, {"MESSAGE" : "KEY_ERROR"})
+
+    except ValueError:
+        return await send_json(send, 400, headers, {"MESSAGE" : "VALUE_ERROR"})
+
+    feed.subscribe(subscription)
+    disconnected = asyncio.ensure_future(wait_for_disconnect(receive))
+
+    try:
+        await send({"type" : "http.response.start", "status" : 200, "headers" : headers + [(b"content-type", b"text/event-stream")]})
+        await send({"type" : "http.response.body", "body" : server_sent_event("ready", {"token" : sync_token()[1]}), "more_body" : True})
+
+        while not disconnected.done():
+            next_event = asyncio.ensure_future(subscription.queue.get())
+            await asyncio.wait({next_event, disconnected}, timeout=settings.LIVE_KEEPALIVE_SECONDS, return_when=asyncio.FIRST_COMPLETED)
+
+            if not next_event.done():
+                next_event.cancel()
+                if not disconnected.done():
+                    await send({"type" : "http.response.body", "body" : b": keepalive\n\n", "more_body" : True})
+                continue
+
+            if subscription.overflowed:
+                await send({"type" : "http.response.body", "body" : server_sent_event("resync"), "more_body" : False})
+                break
+
+            event = next_event.result()
+            await send({"type" : "http.response.body", "body" : server_sent_event("changes", event, event["token"]), "more_body" : True})
+
+    finally:
+        disconnected.cancel()
+        feed.unsubscribe(subscription)
+
+
+async def send_json(send, status, headers, body):
+    await send({"type" : "http.response.start", "status" : status, "headers" : headers + [(b"content-type", b"application/json")]})
+    await send({"type" : "http.response.body", "body" : json.dumps(body).encode()})
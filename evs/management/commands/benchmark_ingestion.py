@@ -0,0 +1,92 @@
+import time
+
+import pandas as pd
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db                   import transaction
+
+from evs.fetch           import REGION
+from evs.replay          import SyntheticDataset, RecordedDataset, replay_session
+from evs.charger_history import charger_status_fetcher, bulk_update_charger_history, bulk_update_charger_history_columns
+from evs.station_charger import charger_info_fetcher, bulk_upsert_stations_and_chargers
+
+
+class Command(BaseCommand):
+    help = "Runs the fetch -> parse -> write ingestion pipeline against a replayed EvCharger API and reports rows per second per stage"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--stations", type=int, default=1000, help="synthetic stations per zcode")
+        parser.add_argument("--chargers-per-station", type=int, default=4)
+        parser.add_argument("--recorded", help="directory of recorded API responses to replay instead of synthetic data")
+        parser.add_argument("--latency", type=float, default=0.05, help="seconds per replayed page")
+        parser.add_argument("--jitter", type=float, default=0.0, help="extra random seconds per replayed page")
+        parser.add_argument("--status-runs", type=int, default=3, help="getChargerStatus runs after the station sync")
+        parser.add_argument("--change-ratio", type=float, default=0.1, help="share of synthetic chargers changing status between runs")
+        parser.add_argument("--columnar", action="store_true", help="decode and write status pages column-wise")
+        parser.add_argument("--min-rows-per-second", type=float, default=0, help="fail when an end-to-end run is slower than this")
+        parser.add_argument("--keep", action="store_true", help="commit the written rows instead of rolling them back")
+
+    def handle(self, *args, **options):
+        if options["recorded"]:
+            dataset = RecordedDataset(options["recorded"])
+        else:
+            dataset = SyntheticDataset(options["stations"], options["chargers_per_station"])
+
+        session = replay_session(dataset, options["latency"], options["jitter"])
+        results = []
+
+        if options["columnar"]:
+            write_statuses = bulk_update_charger_history_columns
+        else:
+            write_statuses = bulk_update_charger_history
+
+        with transaction.atomic():
+            results.append(self.run("getChargerInfo", charger_info_fetcher(session), bulk_upsert_stations_and_chargers))
+
+            for run in range(options["status_runs"]):
+                if run and isinstance(dataset, SyntheticDataset):
+                    dataset.advance(options["change_ratio"])
+                results.append(self.run(f"getChargerStatus #{run + 1}", charger_status_fetcher(session, options["columnar"]), write_statuses, options["columnar"]))
+
+            if not options["keep"]:
+                transaction.set_rollback(True)
+
+        self.stdout.write("\n{:<22}{:>9}{:>10}{:>14}{:>14}{:>14}{:>14}".format("run", "rows", "wall(s)", "fetch rows/s", "parse rows/s", "write rows/s", "total rows/s"))
+        for result in results:
+            self.stdout.write("{name:<22}{rows:>9}{wall:>10.2f}{fetch:>14.0f}{parse:>14.0f}{write:>14.0f}{total:>14.0f}".format(**result))
+
+        slowest = min(result["total"] for result in results)
+        if slowest < options["min_rows_per_second"]:
+            raise CommandError(f"ingestion ran at {slowest:.0f} rows/s, below {options['min_rows_per_second']:.0f} rows/s")
+
+    def run(self, name, fetcher, write, columnar=False):
+        items         = []
+        fetch_seconds = 0
+        parse_seconds = 0
+
+        start = time.perf_counter()
+        for page in fetcher.iter_pages(REGION.values()):
+            if columnar:
+                items.append(page.records)
+            else:
+                items.extend(page.records)
+            fetch_seconds += page.fetch_seconds
+            parse_seconds += page.parse_seconds
+
+        if columnar:
+            items = pd.concat(items, ignore_index=True)
+
+        write_start = time.perf_counter()
+        write(items)
+        end = time.perf_counter()
+
+        rows = len(items)
+        return {
+            "name"  : name,
+            "rows"  : rows,
+            "wall"  : end - start,
+            "fetch" : rows / fetch_seconds if fetch_seconds else 0,
+            "parse" : rows / parse_seconds if parse_seconds else 0,
+            "write" : rows / (end - write_start) if end > write_start else 0,
+            "total" : rows / (end - start) if end > start else 0
+        }
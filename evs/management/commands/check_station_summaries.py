@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core           import versions
+from evs.models     import Station
+from evs.summaries  import find_drift, refresh_station_summaries, refresh_region_summaries
+from commons.models import Region
+
+
+class Command(BaseCommand):
+    help = "Compares station_summaries with a fresh count of chargers and optionally repairs the stations that drifted and region_summaries"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repair", action="store_true", help="recount and store the summaries of drifted stations")
+
+    def handle(self, *args, **options):
+        drifted = find_drift(Station.objects.values_list("id", flat=True).order_by("id").iterator())
+
+        self.stdout.write(f"drifted station summaries: {len(drifted)}")
+        for station_id in drifted[:100]:
+            self.stdout.write(f"  {station_id}")
+
+        if options["repair"]:
+            # a station that changed region without changing chargers only shows up here
+            created, updated = refresh_region_summaries(Region.objects.values_list("zcode", flat=True))
+            self.stdout.write(f"region summaries: {created} created, {updated} updated")
+
+        if not drifted:
+            return
+
+        if not options["repair"]:
+            raise CommandError(f"{len(drifted)} station summaries drifted, rerun with --repair")
+
+        created, updated = refresh_station_summaries(drifted)
+        versions.bump("evs")
+        self.stdout.write(self.style.SUCCESS(f"repaired: {created} created, {updated} updated"))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from evs.models    import Station
+from evs.proximity import refresh_station_cafes, refresh_cafe_stations
+
+
+class Command(BaseCommand):
+    help = "Rebuilds station_cafes, the links between stations and the cafes within settings.STATION_CAFE_RADII_M"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--cafes", nargs="+", type=int, help="only relink these cafe ids")
+        parser.add_argument("--stations", nargs="+", help="only relink these station ids")
+
+    def handle(self, *args, **options):
+        if options["cafes"] or options["stations"]:
+            linked  = refresh_cafe_stations(options["cafes"] or [])
+            linked += refresh_station_cafes(options["stations"] or [])
+        else:
+            linked = refresh_station_cafes(Station.objects.values_list("id", flat=True).iterator())
+
+        self.stdout.write(self.style.SUCCESS(f"station cafe links written: {linked}"))
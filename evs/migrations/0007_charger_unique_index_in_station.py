@@ -0,0 +1,39 @@
+# Generated by Django 4.0.4 on 2026-10-18 16:39
+
+from django.db        import migrations, models
+from django.db.models import Count, Max
+
+
+def remove_duplicate_chargers(apps, schema_editor):
+    Charger        = apps.get_model('evs', 'Charger')
+    ChargerHistory = apps.get_model('evs', 'ChargerHistory')
+
+    duplicates = Charger.objects\
+        .values('station_id', 'index_in_station')\
+        .annotate(count=Count('id'), keep_id=Max('id'))\
+        .filter(count__gt=1)
+
+    for duplicate in duplicates:
+        duplicate_ids = list(Charger.objects
+            .filter(station_id=duplicate['station_id'], index_in_station=duplicate['index_in_station'])
+            .exclude(id=duplicate['keep_id'])
+            .values_list('id', flat=True)
+        )
+
+        ChargerHistory.objects.filter(charger_id__in=duplicate_ids).update(charger_id=duplicate['keep_id'])
+        Charger.objects.filter(id__in=duplicate_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evs', '0006_charger_created_at_charger_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_chargers, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='charger',
+            constraint=models.UniqueConstraint(fields=('station', 'index_in_station'), name='unique_index_in_station'),
+        ),
+    ]
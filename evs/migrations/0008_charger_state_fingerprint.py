@@ -0,0 +1,18 @@
+# Generated by Django 4.0.4 on 2026-10-18 16:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evs', '0007_charger_unique_index_in_station'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='charger',
+            name='state_fingerprint',
+            field=models.BigIntegerField(null=True),
+        ),
+    ]
@@ -0,0 +1,99 @@
+# Generated by Django 4.0.4 on 2026-10-18 16:45
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Min
+from django.utils import timezone
+import django.db.models.deletion
+
+
+def partition_definition(day):
+    return f"PARTITION p{day:%Y%m%d} VALUES LESS THAN ('{day + timedelta(days=1):%Y-%m-%d}')"
+
+
+def partition_charger_histories(apps, schema_editor):
+    # MySQL only: the partitioning key has to be part of every unique key, so the primary key becomes (id, created_at).
+    # Partitions start at the day of the oldest row within CHARGER_HISTORY_RETENTION_DAYS, older rows land in that
+    # first partition; they end CHARGER_HISTORY_PARTITIONS_AHEAD days after the day the migration is applied, from
+    # where evs.history_maintenance keeps adding them.
+    if schema_editor.connection.vendor != 'mysql':
+        return
+
+    ChargerHistory = apps.get_model('evs', 'ChargerHistory')
+
+    today         = timezone.now().date()
+    first_history = ChargerHistory.objects.aggregate(first_history=Min('created_at'))['first_history']
+    first_day     = max(first_history.date(), today - timedelta(days=settings.CHARGER_HISTORY_RETENTION_DAYS)) if first_history else today
+    days          = [first_day + timedelta(days=offset) for offset in range((today - first_day).days + settings.CHARGER_HISTORY_PARTITIONS_AHEAD + 1)]
+
+    schema_editor.execute('ALTER TABLE charger_histories DROP PRIMARY KEY, ADD PRIMARY KEY (id, created_at)')
+    schema_editor.execute(
+        'ALTER TABLE charger_histories PARTITION BY RANGE COLUMNS(created_at) ('
+        + ', '.join(partition_definition(day) for day in days)
+        + ', PARTITION pmax VALUES LESS THAN (MAXVALUE))'
+    )
+
+
+def unpartition_charger_histories(apps, schema_editor):
+    if schema_editor.connection.vendor != 'mysql':
+        return
+
+    schema_editor.execute('ALTER TABLE charger_histories REMOVE PARTITIONING')
+    schema_editor.execute('ALTER TABLE charger_histories DROP PRIMARY KEY, ADD PRIMARY KEY (id)')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evs', '0008_charger_state_fingerprint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChargerStatusRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('H', 'Hour'), ('D', 'Day')], max_length=1)),
+                ('period_start', models.DateTimeField()),
+                ('seconds', models.PositiveIntegerField()),
+            ],
+            options={
+                'db_table': 'charger_status_rollups',
+            },
+        ),
+        migrations.AlterField(
+            model_name='chargerhistory',
+            name='charger',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, to='evs.charger'),
+        ),
+        migrations.AlterField(
+            model_name='chargerhistory',
+            name='charging_status',
+            field=models.ForeignKey(db_constraint=False, default=9, on_delete=django.db.models.deletion.PROTECT, to='evs.chargingstatus'),
+        ),
+        migrations.AddIndex(
+            model_name='chargerhistory',
+            index=models.Index(fields=['created_at'], name='charger_histories_created_at'),
+        ),
+        migrations.AddIndex(
+            model_name='chargerhistory',
+            index=models.Index(fields=['charger', 'created_at'], name='charger_histories_charger'),
+        ),
+        migrations.AddField(
+            model_name='chargerstatusrollup',
+            name='charger',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='evs.charger'),
+        ),
+        migrations.AddField(
+            model_name='chargerstatusrollup',
+            name='charging_status',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='evs.chargingstatus'),
+        ),
+        migrations.AddConstraint(
+            model_name='chargerstatusrollup',
+            constraint=models.UniqueConstraint(fields=('period', 'period_start', 'charger', 'charging_status'), name='unique_charger_status_rollup'),
+        ),
+        migrations.RunPython(partition_charger_histories, unpartition_charger_histories),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.0.4 on 2026-10-18 16:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evs', '0009_charger_history_partitioning_and_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngestionRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('job', models.CharField(choices=[('charger_status', 'Charger Status'), ('stations_and_chargers', 'Stations And Chargers')], max_length=30)),
+                ('status', models.CharField(choices=[('running', 'Running'), ('succeeded', 'Succeeded'), ('failed', 'Failed')], default='running', max_length=10)),
+                ('started_at', models.DateTimeField()),
+                ('finished_at', models.DateTimeField(null=True)),
+                ('duration_seconds', models.FloatField(default=0)),
+                ('crawl_seconds', models.FloatField(default=0)),
+                ('fetch_seconds', models.FloatField(default=0)),
+                ('parse_seconds', models.FloatField(default=0)),
+                ('write_seconds', models.FloatField(default=0)),
+                ('pages_fetched', models.PositiveIntegerField(default=0)),
+                ('rows', models.PositiveIntegerField(default=0)),
+                ('rows_per_second', models.FloatField(default=0)),
+                ('retries', models.PositiveIntegerField(default=0)),
+                ('skipped', models.PositiveIntegerField(default=0)),
+                ('unknown_chargers', models.PositiveIntegerField(default=0)),
+                ('peak_memory_kb', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+            ],
+            options={
+                'db_table': 'ingestion_runs',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='ingestionrun',
+            index=models.Index(fields=['job', 'started_at'], name='ingestion_runs_job'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.0.4 on 2026-10-18 16:49
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evs', '0010_ingestion_run'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngestionCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('job', models.CharField(choices=[('charger_status', 'Charger Status'), ('stations_and_chargers', 'Stations And Chargers')], max_length=30)),
+                ('cycle_start', models.DateTimeField()),
+                ('zcode', models.PositiveSmallIntegerField()),
+                ('page_no', models.PositiveIntegerField()),
+                ('total_count', models.PositiveIntegerField()),
+                ('rows', models.PositiveIntegerField()),
+                ('completed_at', models.DateTimeField(auto_now_add=True)),
+                ('run', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='evs.ingestionrun')),
+            ],
+            options={
+                'db_table': 'ingestion_checkpoints',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='ingestioncheckpoint',
+            constraint=models.UniqueConstraint(fields=('job', 'cycle_start', 'zcode', 'page_no'), name='unique_ingestion_checkpoint'),
+        ),
+    ]
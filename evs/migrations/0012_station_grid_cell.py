@@ -0,0 +1,40 @@
+# Generated by Django 4.0.4 on 2026-10-18 17:20
+
+from django.db import migrations, models
+
+from core.geo import grid_cell
+
+
+def fill_grid_cells(apps, schema_editor):
+    Station = apps.get_model('evs', 'Station')
+
+    stations = list(Station.objects.only('id', 'latitude', 'longitude'))
+    for station in stations:
+        station.grid_cell = grid_cell(station.latitude, station.longitude)
+
+    Station.objects.bulk_update(stations, ['grid_cell'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evs', '0011_ingestion_checkpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='station',
+            name='grid_cell',
+            field=models.PositiveIntegerField(editable=False, null=True),
+        ),
+        migrations.RunPython(fill_grid_cells, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='station',
+            name='grid_cell',
+            field=models.PositiveIntegerField(editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='station',
+            index=models.Index(fields=['grid_cell', 'latitude', 'longitude'], name='stations_grid_cell'),
+        ),
+    ]
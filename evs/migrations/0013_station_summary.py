@@ -0,0 +1,69 @@
+# Generated by Django 4.0.4 on 2026-10-18 16:52
+
+from django.db        import migrations, models
+from django.db.models import Q, Count
+import django.db.models.deletion
+
+
+def fill_station_summaries(apps, schema_editor):
+    Station        = apps.get_model('evs', 'Station')
+    StationSummary = apps.get_model('evs', 'StationSummary')
+
+    quick = Q(charger__output__gte=30)
+    slow  = Q(charger__output__lt=30)
+    ready = Q(charger__charging_status=2)
+
+    counts = Station.objects.values('id').annotate(
+        total_charger                 = Count('charger'),
+        communication_abnomal_charger = Count('charger', filter=Q(charger__charging_status=1)),
+        ready_charger                 = Count('charger', filter=ready),
+        charging_charger              = Count('charger', filter=Q(charger__charging_status=3)),
+        suspending_charger            = Count('charger', filter=Q(charger__charging_status=4)),
+        inspecting_charger            = Count('charger', filter=Q(charger__charging_status=5)),
+        not_confirmed_charger         = Count('charger', filter=Q(charger__charging_status=9)),
+        quick_charger                 = Count('charger', filter=quick),
+        slow_charger                  = Count('charger', filter=slow),
+        quick_charger_of_ready        = Count('charger', filter=quick & ready),
+        slow_charger_of_ready         = Count('charger', filter=slow & ready),
+    )
+
+    StationSummary.objects.bulk_create(
+        [StationSummary(station_id=count.pop('id'), **count) for count in counts],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evs', '0012_station_grid_cell'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StationSummary',
+            fields=[
+                ('station', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='summary', serialize=False, to='evs.station')),
+                ('total_charger', models.PositiveIntegerField(default=0)),
+                ('communication_abnomal_charger', models.PositiveIntegerField(default=0)),
+                ('ready_charger', models.PositiveIntegerField(default=0)),
+                ('charging_charger', models.PositiveIntegerField(default=0)),
+                ('suspending_charger', models.PositiveIntegerField(default=0)),
+                ('inspecting_charger', models.PositiveIntegerField(default=0)),
+                ('not_confirmed_charger', models.PositiveIntegerField(default=0)),
+                ('quick_charger', models.PositiveIntegerField(default=0)),
+                ('slow_charger', models.PositiveIntegerField(default=0)),
+                ('quick_charger_of_ready', models.PositiveIntegerField(default=0)),
+                ('slow_charger_of_ready', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'station_summaries',
+            },
+        ),
+        migrations.RunPython(fill_station_summaries, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='stationsummary',
+            index=models.Index(fields=['ready_charger'], name='station_summaries_ready'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.0.4 on 2026-10-18 17:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evs', '0013_station_summary'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='charger',
+            index=models.Index(fields=['updated_at', 'station'], name='chargers_updated_at'),
+        ),
+    ]
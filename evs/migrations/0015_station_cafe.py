@@ -0,0 +1,35 @@
+# Generated by Django 4.0.4 on 2026-10-18 17:03
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cafes', '0003_cafe_grid_cell'),
+        ('evs', '0014_charger_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StationCafe',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('distance', models.PositiveIntegerField()),
+                ('cafe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='nearby_stations', to='cafes.cafe')),
+                ('station', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='nearby_cafes', to='evs.station')),
+            ],
+            options={
+                'db_table': 'station_cafes',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='stationcafe',
+            index=models.Index(fields=['station', 'distance'], name='station_cafes_distance'),
+        ),
+        migrations.AddConstraint(
+            model_name='stationcafe',
+            constraint=models.UniqueConstraint(fields=('station', 'cafe'), name='unique_station_cafe'),
+        ),
+    ]
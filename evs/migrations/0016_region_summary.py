@@ -0,0 +1,91 @@
+# Generated by Django 4.0.4 on 2026-10-18 17:15
+
+from django.db        import migrations, models
+from django.db.models import Count, Sum
+import django.db.models.deletion
+
+
+COUNTERS = (
+    'total_charger', 'communication_abnomal_charger', 'ready_charger', 'charging_charger', 'suspending_charger',
+    'inspecting_charger', 'not_confirmed_charger', 'quick_charger', 'slow_charger', 'quick_charger_of_ready', 'slow_charger_of_ready',
+)
+
+
+def fill_region_summaries(apps, schema_editor):
+    Region         = apps.get_model('commons', 'Region')
+    StationSummary = apps.get_model('evs', 'StationSummary')
+    RegionSummary  = apps.get_model('evs', 'RegionSummary')
+
+    counts = {
+        count.pop('station__region_id'): count
+        for count in StationSummary.objects.values('station__region_id').annotate(
+            total_station=Count('station_id'), **{counter: Sum(counter) for counter in COUNTERS}
+        )
+    }
+
+    RegionSummary.objects.bulk_create([
+        RegionSummary(region_id=zcode, **counts.get(zcode, {}))
+        for zcode in Region.objects.values_list('zcode', flat=True)
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('commons', '0001_initial'),
+        ('evs', '0015_station_cafe'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegionSummary',
+            fields=[
+                ('region', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='ev_summary', serialize=False, to='commons.region')),
+                ('total_station', models.PositiveIntegerField(default=0)),
+                ('total_charger', models.PositiveIntegerField(default=0)),
+                ('communication_abnomal_charger', models.PositiveIntegerField(default=0)),
+                ('ready_charger', models.PositiveIntegerField(default=0)),
+                ('charging_charger', models.PositiveIntegerField(default=0)),
+                ('suspending_charger', models.PositiveIntegerField(default=0)),
+                ('inspecting_charger', models.PositiveIntegerField(default=0)),
+                ('not_confirmed_charger', models.PositiveIntegerField(default=0)),
+                ('quick_charger', models.PositiveIntegerField(default=0)),
+                ('slow_charger', models.PositiveIntegerField(default=0)),
+                ('quick_charger_of_ready', models.PositiveIntegerField(default=0)),
+                ('slow_charger_of_ready', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'region_summaries',
+            },
+        ),
+        migrations.CreateModel(
+            name='RegionSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('taken_at', models.DateTimeField()),
+                ('total_station', models.PositiveIntegerField(default=0)),
+                ('total_charger', models.PositiveIntegerField(default=0)),
+                ('communication_abnomal_charger', models.PositiveIntegerField(default=0)),
+                ('ready_charger', models.PositiveIntegerField(default=0)),
+                ('charging_charger', models.PositiveIntegerField(default=0)),
+                ('suspending_charger', models.PositiveIntegerField(default=0)),
+                ('inspecting_charger', models.PositiveIntegerField(default=0)),
+                ('not_confirmed_charger', models.PositiveIntegerField(default=0)),
+                ('quick_charger', models.PositiveIntegerField(default=0)),
+                ('slow_charger', models.PositiveIntegerField(default=0)),
+                ('quick_charger_of_ready', models.PositiveIntegerField(default=0)),
+                ('slow_charger_of_ready', models.PositiveIntegerField(default=0)),
+                ('region', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='commons.region')),
+                ('run', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='evs.ingestionrun')),
+            ],
+            options={
+                'db_table': 'region_snapshots',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='regionsnapshot',
+            index=models.Index(fields=['taken_at'], name='region_snapshots_taken_at'),
+        ),
+        migrations.RunPython(fill_region_summaries, migrations.RunPython.noop),
+    ]
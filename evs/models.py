@@ -1,11 +1,13 @@
-from enum import Enum
+from enum     import Enum
+from datetime import datetime, timedelta
 
 from django.db   import models
 
-from core.models import TimeStampModel
+from core.models import TimeStampModel, GridCellModel
 
 
-class ChargingStatus(Enum):
+# the codes of the ChargingStatus model below, which takes over the name once it is defined
+class ChargingStatusCode(Enum):
     communication_abnomal = 1
     ready                 = 2
     charging              = 3
@@ -14,7 +16,7 @@ class ChargingStatus(Enum):
     not_confirmed         = 9
 
 
-class Station(TimeStampModel):
+class Station(TimeStampModel, GridCellModel):
 
     class YesOrNo(models.TextChoices):
         YES = "Y"
@@ -42,30 +44,186 @@ class Station(TimeStampModel):
 
     class Meta:
         db_table = "stations"
+        indexes  = [
+            models.Index(fields=["grid_cell", "latitude", "longitude"], name="stations_grid_cell")
+        ]
 
 
 class Charger(TimeStampModel):
-    index_in_station = models.PositiveSmallIntegerField()
-    output           = models.PositiveSmallIntegerField(blank=True, null=True)
-    method           = models.CharField(max_length=10, blank=True)
-    charger_type     = models.ForeignKey("ChargerType", on_delete=models.PROTECT)
-    station          = models.ForeignKey("Station", on_delete=models.CASCADE)
-    charging_status  = models.ForeignKey("ChargingStatus", on_delete=models.PROTECT, default=ChargingStatus.not_confirmed.value)
+    index_in_station  = models.PositiveSmallIntegerField()
+    output            = models.PositiveSmallIntegerField(blank=True, null=True)
+    method            = models.CharField(max_length=10, blank=True)
+    charger_type      = models.ForeignKey("ChargerType", on_delete=models.PROTECT)
+    station           = models.ForeignKey("Station", on_delete=models.CASCADE)
+    charging_status   = models.ForeignKey("ChargingStatus", on_delete=models.PROTECT, default=ChargingStatusCode.not_confirmed.value)
+    state_fingerprint = models.BigIntegerField(null=True)  # last state recorded in charger_histories, see state_fingerprint()
 
     class Meta:
-        db_table = "chargers"
+        db_table    = "chargers"
+        constraints = [
+            models.UniqueConstraint(fields=["station", "index_in_station"], name="unique_index_in_station")
+        ]
+        indexes     = [
+            models.Index(fields=["updated_at", "station"], name="chargers_updated_at")
+        ]
+
+
+class StationSummary(models.Model):
+    # charger counters of a station, refreshed by the ingestion jobs (see evs.summaries)
+    station                       = models.OneToOneField("Station", on_delete=models.CASCADE, primary_key=True, related_name="summary")
+    total_charger                 = models.PositiveIntegerField(default=0)
+    communication_abnomal_charger = models.PositiveIntegerField(default=0)
+    ready_charger                 = models.PositiveIntegerField(default=0)
+    charging_charger              = models.PositiveIntegerField(default=0)
+    suspending_charger            = models.PositiveIntegerField(default=0)
+    inspecting_charger            = models.PositiveIntegerField(default=0)
+    not_confirmed_charger         = models.PositiveIntegerField(default=0)
+    quick_charger                 = models.PositiveIntegerField(default=0)
+    slow_charger                  = models.PositiveIntegerField(default=0)
+    quick_charger_of_ready        = models.PositiveIntegerField(default=0)
+    slow_charger_of_ready         = models.PositiveIntegerField(default=0)
+    updated_at                    = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "station_summaries"
+        indexes  = [
+            models.Index(fields=["ready_charger"], name="station_summaries_ready"),
+        ]
+
+
+class RegionSummary(models.Model):
+    # station summaries added up per region, refreshed together with them (see evs.summaries)
+    region                        = models.OneToOneField("commons.Region", on_delete=models.CASCADE, primary_key=True, related_name="ev_summary")
+    total_station                 = models.PositiveIntegerField(default=0)
+    total_charger                 = models.PositiveIntegerField(default=0)
+    communication_abnomal_charger = models.PositiveIntegerField(default=0)
+    ready_charger                 = models.PositiveIntegerField(default=0)
+    charging_charger              = models.PositiveIntegerField(default=0)
+    suspending_charger            = models.PositiveIntegerField(default=0)
+    inspecting_charger            = models.PositiveIntegerField(default=0)
+    not_confirmed_charger         = models.PositiveIntegerField(default=0)
+    quick_charger                 = models.PositiveIntegerField(default=0)
+    slow_charger                  = models.PositiveIntegerField(default=0)
+    quick_charger_of_ready        = models.PositiveIntegerField(default=0)
+    slow_charger_of_ready         = models.PositiveIntegerField(default=0)
+    updated_at                    = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "region_summaries"
+
+
+class RegionSnapshot(models.Model):
+    # region summaries as they were at the end of an ingestion run
+    run                           = models.ForeignKey("IngestionRun", on_delete=models.SET_NULL, null=True)
+    region                        = models.ForeignKey("commons.Region", on_delete=models.CASCADE)
+    taken_at                      = models.DateTimeField()
+    total_station                 = models.PositiveIntegerField(default=0)
+    total_charger                 = models.PositiveIntegerField(default=0)
+    communication_abnomal_charger = models.PositiveIntegerField(default=0)
+    ready_charger                 = models.PositiveIntegerField(default=0)
+    charging_charger              = models.PositiveIntegerField(default=0)
+    suspending_charger            = models.PositiveIntegerField(default=0)
+    inspecting_charger            = models.PositiveIntegerField(default=0)
+    not_confirmed_charger         = models.PositiveIntegerField(default=0)
+    quick_charger                 = models.PositiveIntegerField(default=0)
+    slow_charger                  = models.PositiveIntegerField(default=0)
+    quick_charger_of_ready        = models.PositiveIntegerField(default=0)
+    slow_charger_of_ready         = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = "region_snapshots"
+        indexes  = [
+            models.Index(fields=["taken_at"], name="region_snapshots_taken_at")
+        ]
+
+class StationCafe(models.Model):
+    # cafes within the largest of settings.STATION_CAFE_RADII_M of a station, kept by evs.proximity
+    station  = models.ForeignKey("Station", on_delete=models.CASCADE, related_name="nearby_cafes")
+    cafe     = models.ForeignKey("cafes.Cafe", on_delete=models.CASCADE, related_name="nearby_stations")
+    distance = models.PositiveIntegerField()  # m
+
+    class Meta:
+        db_table    = "station_cafes"
+        constraints = [
+            models.UniqueConstraint(fields=["station", "cafe"], name="unique_station_cafe")
+        ]
+        indexes     = [
+            models.Index(fields=["station", "distance"], name="station_cafes_distance")
+        ]
+
+
+STATE_FIELDS = (
+    "charging_status",
+    "charger_status_update_datetime",
+    "last_charging_start_datetime",
+    "last_charging_end_datetime",
+    "now_charging_start_datetime"
+)
+
+
+# FNV-1a over the 64 bit state codes of STATE_FIELDS, evs.charger_history.frame_fingerprints is the column-wise twin
+FINGERPRINT_OFFSET = 0xcbf29ce484222325
+FINGERPRINT_PRIME  = 0x100000001b3
+UINT64_MASK        = (1 << 64) - 1
+
+# the code of None, the int64 value of NaT
+NULL_STATE = -(1 << 63)
+EPOCH      = datetime(1970, 1, 1)
+
+
+def state_code(value):
+    # int -> itself, datetime -> seconds since the epoch, None -> NULL_STATE
+    if value is None:
+        return NULL_STATE
+    if isinstance(value, datetime):
+        return (value - EPOCH) // timedelta(seconds=1)
+    return value
+
+
+def state_fingerprint(item):
+    # item: the STATE_FIELDS of a status record as python values (int, datetime or None)
+    fingerprint = FINGERPRINT_OFFSET
+    for key in STATE_FIELDS:
+        fingerprint = ((fingerprint ^ (state_code(item[key]) & UINT64_MASK)) * FINGERPRINT_PRIME) & UINT64_MASK
+
+    return fingerprint - (1 << 64) if fingerprint >> 63 else fingerprint
 
 
 class ChargerHistory(TimeStampModel):
+    # on MySQL the table is range-partitioned by created_at (see evs.partitions),
+    # and partitioned InnoDB tables cannot carry foreign key constraints
     charger_status_update_datetime = models.DateTimeField(null=True)
     last_charging_start_datetime   = models.DateTimeField(null=True)
     last_charging_end_datetime     = models.DateTimeField(null=True)
     now_charging_start_datetime    = models.DateTimeField(null=True)
-    charging_status                = models.ForeignKey("ChargingStatus", on_delete=models.PROTECT, default=ChargingStatus.not_confirmed.value)
-    charger                        = models.ForeignKey("Charger", on_delete=models.CASCADE)
+    charging_status                = models.ForeignKey("ChargingStatus", on_delete=models.PROTECT, default=ChargingStatusCode.not_confirmed.value, db_constraint=False)
+    charger                        = models.ForeignKey("Charger", on_delete=models.CASCADE, db_constraint=False)
 
     class Meta:
         db_table = "charger_histories"
+        indexes  = [
+            models.Index(fields=["created_at"], name="charger_histories_created_at"),
+            models.Index(fields=["charger", "created_at"], name="charger_histories_charger"),
+        ]
+
+
+class ChargerStatusRollup(models.Model):
+
+    class Period(models.TextChoices):
+        HOUR = "H"
+        DAY  = "D"
+
+    period          = models.CharField(max_length=1, choices=Period.choices)
+    period_start    = models.DateTimeField()
+    seconds         = models.PositiveIntegerField()
+    charging_status = models.ForeignKey("ChargingStatus", on_delete=models.PROTECT)
+    charger         = models.ForeignKey("Charger", on_delete=models.CASCADE)
+
+    class Meta:
+        db_table    = "charger_status_rollups"
+        constraints = [
+            models.UniqueConstraint(fields=["period", "period_start", "charger", "charging_status"], name="unique_charger_status_rollup")
+        ]
 
 
 class ChargerType(models.Model):
@@ -81,4 +239,56 @@ class ChargingStatus(models.Model):
     explanation = models.CharField(max_length=10)
 
     class Meta:
-        db_table = "charging_statuses"
\ No newline at end of file
+        db_table = "charging_statuses"
+
+class IngestionRun(models.Model):
+
+    class Job(models.TextChoices):
+        CHARGER_STATUS        = "charger_status"
+        STATIONS_AND_CHARGERS = "stations_and_chargers"
+
+    class Status(models.TextChoices):
+        RUNNING   = "running"
+        SUCCEEDED = "succeeded"
+        FAILED    = "failed"
+
+    job              = models.CharField(max_length=30, choices=Job.choices)
+    status           = models.CharField(max_length=10, choices=Status.choices, default=Status.RUNNING)
+    started_at       = models.DateTimeField()
+    finished_at      = models.DateTimeField(null=True)
+    duration_seconds = models.FloatField(default=0)
+    crawl_seconds    = models.FloatField(default=0)
+    fetch_seconds    = models.FloatField(default=0)
+    parse_seconds    = models.FloatField(default=0)
+    write_seconds    = models.FloatField(default=0)
+    pages_fetched    = models.PositiveIntegerField(default=0)
+    rows             = models.PositiveIntegerField(default=0)
+    rows_per_second  = models.FloatField(default=0)
+    retries          = models.PositiveIntegerField(default=0)
+    skipped          = models.PositiveIntegerField(default=0)
+    unknown_chargers = models.PositiveIntegerField(default=0)
+    peak_memory_kb   = models.PositiveIntegerField(default=0)
+    error            = models.TextField(blank=True)
+
+    class Meta:
+        db_table = "ingestion_runs"
+        indexes  = [
+            models.Index(fields=["job", "started_at"], name="ingestion_runs_job"),
+        ]
+
+
+class IngestionCheckpoint(models.Model):
+    job          = models.CharField(max_length=30, choices=IngestionRun.Job.choices)
+    cycle_start  = models.DateTimeField()
+    zcode        = models.PositiveSmallIntegerField()
+    page_no      = models.PositiveIntegerField()
+    total_count  = models.PositiveIntegerField()
+    rows         = models.PositiveIntegerField()
+    run          = models.ForeignKey("IngestionRun", on_delete=models.SET_NULL, null=True)
+    completed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table    = "ingestion_checkpoints"
+        constraints = [
+            models.UniqueConstraint(fields=["job", "cycle_start", "zcode", "page_no"], name="unique_ingestion_checkpoint")
+        ]
@@ -0,0 +1,161 @@
+import math
+import threading
+
+from collections import defaultdict
+
+import numpy as np
+
+from core       import versions
+from core.geo   import CELL_SIZE, cell_row, cell_column
+from evs.models import Station, Charger, ChargingStatusCode
+
+# data version of the StationIndex; ingestion bumps "evs" after every page,
+# this one once per run that wrote any, so the index is rebuilt once per run
+VERSION = "nearest"
+
+# lower bound of the width of a grid cell in km; south of 40N a degree of longitude is longer than 85 km
+CELL_KM = CELL_SIZE * 85.0
+
+EARTH_RADIUS_KM = 6371.0088
+
+# a lookup that has not found its k stations within this many rings of cells (about 40 km)
+# measures the distance to every station instead, so far away positions cost one vectorized pass
+MAX_RING_RADIUS = 50
+
+
+def haversine_km(latitude, longitude, latitudes, longitudes):
+    latitude, longitude   = np.radians(latitude), np.radians(longitude)
+    latitudes, longitudes = np.radians(latitudes), np.radians(longitudes)
+
+    a = np.sin((latitudes - latitude) / 2) ** 2 + np.cos(latitude) * np.cos(latitudes) * np.sin((longitudes - longitude) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+class StationIndex:
+    """
+    In-memory grid index of every station for k-nearest lookups.
+
+    Stations are bucketed by core.geo grid cell; a lookup visits rings of cells around
+    the position until the k-th best distance is closer than any unvisited ring.
+    Chargers are kept column-wise so the map filters become one vectorized mask.
+    """
+    def __init__(self, version=None):
+        self.version = version
+
+        stations = list(Station.objects.values_list("id", "name", "latitude", "longitude").order_by("id"))
+        chargers = list(Charger.objects.values_list("station_id", "output", "charger_type_id", "charging_status_id"))
+
+        self.ids         = [station[0] for station in stations]
+        self.names       = [station[1] for station in stations]
+        self.coordinates = [(station[2], station[3]) for station in stations]  # as stored, for responses
+        self.latitudes   = np.array([float(station[2]) for station in stations])
+        self.longitudes  = np.array([float(station[3]) for station in stations])
+
+        position = {station_id: index for index, station_id in enumerate(self.ids)}
+
+        self.charger_stations = np.array([position[charger[0]] for charger in chargers], dtype=np.int64)
+        self.charger_outputs  = np.array([charger[1] if charger[1] is not None else -1 for charger in chargers], dtype=np.int64)
+        self.charger_types    = np.array([charger[2] for charger in chargers], dtype=np.int64)
+        self.charger_ready    = np.array([charger[3] == ChargingStatusCode.ready.value for charger in chargers], dtype=bool)
+
+        cells = defaultdict(list)
+        for index, (latitude, longitude) in enumerate(zip(self.latitudes, self.longitudes)):
+            cells[(cell_row(latitude), cell_column(longitude))].append(index)
+
+        self.cells = {cell: np.array(indexes, dtype=np.int64) for cell, indexes in cells.items()}
+
+        if cells:
+            rows, columns  = zip(*cells)
+            self.row_range    = (min(rows), max(rows))
+            self.column_range = (min(columns), max(columns))
+
+    def station_mask(self, outputs=None, charger_type_ids=None, usable=False):
+        # same rule as EVMapView: a charger of the station matches the output / type filters (either one),
+        # and with `usable` that charger is ready
+        if not (outputs or charger_type_ids or usable):
+            return None
+
+        chargers = np.zeros(len(self.charger_stations), dtype=bool) if (outputs or charger_type_ids) else np.ones(len(self.charger_stations), dtype=bool)
+
+        if outputs:
+            chargers |= np.isin(self.charger_outputs, [int(output) for output in outputs])
+
+        if charger_type_ids:
+            chargers |= np.isin(self.charger_types, [int(charger_type_id) for charger_type_id in charger_type_ids])
+
+        if usable:
+            chargers &= self.charger_ready
+
+        mask = np.zeros(len(self.ids), dtype=bool)
+        mask[self.charger_stations[chargers]] = True
+        return mask
+
+    def ring(self, row, column, radius):
+        if radius == 0:
+            cells = [(row, column)]
+        else:
+            cells  = [(row - radius, column + offset) for offset in range(-radius, radius + 1)]
+            cells += [(row + radius, column + offset) for offset in range(-radius, radius + 1)]
+            cells += [(row + offset, column - radius) for offset in range(-radius + 1, radius)]
+            cells += [(row + offset, column + radius) for offset in range(-radius + 1, radius)]
+
+        return [self.cells[cell] for cell in cells if cell in self.cells]
+
+    def nearest(self, latitude, longitude, k, mask=None):
+        """
+        [(km, station index)] of the k stations closest to the position, closest first.
+        Raises ValueError for a position that is not a finite latitude / longitude.
+        """
+        if not (math.isfinite(latitude) and math.isfinite(longitude) and abs(latitude) <= 90 and abs(longitude) <= 180):
+            raise ValueError("position out of range")
+
+        if not self.cells:
+            return []
+
+        row, column = cell_row(latitude), cell_column(longitude)
+        max_radius  = max(
+            abs(row - self.row_range[0]), abs(row - self.row_range[1]),
+            abs(column - self.column_range[0]), abs(column - self.column_range[1])
+        )
+
+        candidates = np.empty(0, dtype=np.int64)
+        distances  = np.empty(0)
+
+        for radius in range(min(max_radius, MAX_RING_RADIUS) + 1):
+            ring = self.ring(row, column, radius)
+
+            if ring:
+                indexes = np.concatenate(ring)
+                if mask is not None:
+                    indexes = indexes[mask[indexes]]
+
+                candidates = np.concatenate([candidates, indexes])
+                distances  = np.concatenate([distances, haversine_km(latitude, longitude, self.latitudes[indexes], self.longitudes[indexes])])
+
+            # every station outside the visited rings is at least `radius` cells away
+            if len(candidates) >= k and np.partition(distances, k - 1)[k - 1] <= radius * CELL_KM:
+                break
+        else:
+            if max_radius > MAX_RING_RADIUS:
+                candidates = np.arange(len(self.ids)) if mask is None else np.flatnonzero(mask)
+                distances  = haversine_km(latitude, longitude, self.latitudes[candidates], self.longitudes[candidates])
+
+        order = np.argsort(distances, kind="stable")[:k]
+        return [(float(distances[position]), int(candidates[position])) for position in order]
+
+
+index_lock    = threading.Lock()
+current_index = None
+
+
+def station_index():
+    # rebuilt by the first lookup after an ingestion run bumped VERSION
+    global current_index
+
+    version = versions.current(VERSION)
+
+    with index_lock:
+        if current_index is None or current_index.version != version:
+            current_index = StationIndex(version)
+
+        return current_index
@@ -0,0 +1,161 @@
+from datetime import datetime
+
+import pandas as pd
+
+from lxml import etree
+
+
+CHUNK_SIZE = 64 * 1024
+
+
+def to_datetime(text):
+    # YYYYMMDDhhmmss
+    if len(text) < 14:
+        return None
+
+    return datetime(int(text[0:4]), int(text[4:6]), int(text[6:8]), int(text[8:10]), int(text[10:12]), int(text[12:14]))
+
+
+def to_int(text):
+    return int(text) if text else None
+
+
+def charger_status_record(fields):
+    return {
+        "business_id"                    : fields.get("busiId", ""),
+        "station_id"                     : fields.get("statId", ""),
+        "index_in_station"               : int(fields["chgerId"]),
+        "charging_status"                : int(fields["stat"]),
+        "charger_status_update_datetime" : to_datetime(fields.get("statUpdDt", "")),
+        "last_charging_start_datetime"   : to_datetime(fields.get("lastTsdt", "")),
+        "last_charging_end_datetime"     : to_datetime(fields.get("lastTedt", "")),
+        "now_charging_start_datetime"    : to_datetime(fields.get("nowTsdt", "")),
+    }
+
+
+def charger_info_record(fields):
+    return {
+        "station_id"                : fields.get("statId", ""),
+        "station_name"              : fields.get("statNm", ""),
+        "location"                  : fields.get("location", ""),
+        "road_name_address"         : fields.get("addr", ""),
+        "latitude"                  : float(fields["lat"]),
+        "longitude"                 : float(fields["lng"]),
+        "hours_of_operation"        : fields.get("useTime", ""),
+        "index_in_station"          : int(fields["chgerId"]),
+        "charging_status"           : int(fields["stat"]),
+        "charger_type"              : int(fields["chgerType"]),
+        "output"                    : to_int(fields.get("output", "")),
+        "method"                    : fields.get("method", ""),
+        "parking_free_yes_or_no"    : fields.get("parkingFree", ""),
+        "parking_detail"            : fields.get("note", ""),
+        "limit_yes_or_no"           : fields.get("limitYn", ""),
+        "limit_detail"              : fields.get("limitDetail", ""),
+        "delete_yes_or_no"          : fields.get("delYn", ""),
+        "delete_detail"             : fields.get("delDetail", ""),
+        "business_id"               : fields.get("busiId", ""),
+        "business_name"             : fields.get("bnm", ""),
+        "business_manamgement_name" : fields.get("busiNm", ""),
+        "business_call"             : fields.get("busiCall", ""),
+        "zcode"                     : int(fields["zcode"])
+    }
+
+
+def raw_fields(fields):
+    return fields
+
+
+def text(column):
+    return column
+
+
+def integer(column):
+    return pd.to_numeric(column).astype("int64")
+
+
+def nullable_integer(column):
+    return pd.to_numeric(column, errors="coerce").astype("Int64")
+
+
+def real(column):
+    return pd.to_numeric(column, errors="coerce")
+
+
+def timestamp(column):
+    return pd.to_datetime(column, format="%Y%m%d%H%M%S", errors="coerce").astype("datetime64[ns]")
+
+
+class ColumnDecoder:
+    """
+    Turns the raw item fields of a page into a DataFrame of typed columns.
+    `columns` maps each API tag to (column name, vectorized converter).
+    """
+    def __init__(self, columns):
+        self.columns = columns
+
+    def __call__(self, records):
+        raw_columns = {tag: [] for tag in self.columns}
+
+        for fields in records:
+            for tag, values in raw_columns.items():
+                values.append(fields.get(tag, ""))
+
+        return pd.DataFrame({
+            name: convert(pd.Series(raw_columns[tag], dtype=object))
+            for tag, (name, convert) in self.columns.items()
+        })
+
+
+charger_status_columns = ColumnDecoder({
+    "busiId"    : ("business_id", text),
+    "statId"    : ("station_id", text),
+    "chgerId"   : ("index_in_station", integer),
+    "stat"      : ("charging_status", integer),
+    "statUpdDt" : ("charger_status_update_datetime", timestamp),
+    "lastTsdt"  : ("last_charging_start_datetime", timestamp),
+    "lastTedt"  : ("last_charging_end_datetime", timestamp),
+    "nowTsdt"   : ("now_charging_start_datetime", timestamp),
+})
+
+def python_values(column):
+    # NaN / NaT / <NA> become None so the values can be handed to the ORM
+    return column.astype(object).where(column.notna(), None).tolist()
+
+
+def children_text(element):
+    return {child.tag: (child.text or "").strip() for child in element}
+
+
+class PageStream:
+    """
+    Incrementally parses one EvCharger API page from an iterable of byte chunks.
+
+    Iterating yields one record per <item> as soon as its closing tag arrives;
+    each element is cleared afterwards so only the current item stays in memory.
+    `header` is filled in once <header> has been parsed.
+    """
+    def __init__(self, chunks, to_record):
+        self.chunks    = chunks
+        self.to_record = to_record
+        self.header    = {}
+
+    def __iter__(self):
+        parser = etree.XMLPullParser(events=("end",), tag=("header", "item"))
+
+        for chunk in self.chunks:
+            parser.feed(chunk)
+            yield from self._read_events(parser)
+
+        parser.close()
+        yield from self._read_events(parser)
+
+    def _read_events(self, parser):
+        for _, element in parser.read_events():
+            if element.tag == "header":
+                self.header = children_text(element)
+            else:
+                yield self.to_record(children_text(element))
+
+            element.clear()
+            while element.getprevious() is not None:
+                del element.getparent()[0]
@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta
+
+from django.db import connection
+
+
+TABLE = "charger_histories"
+
+
+def partition_name(day):
+    return f"p{day:%Y%m%d}"
+
+
+def partition_definition(day):
+    return f"PARTITION {partition_name(day)} VALUES LESS THAN ('{day + timedelta(days=1):%Y-%m-%d}')"
+
+
+def is_partitioned():
+    return connection.vendor == "mysql" and bool(partition_bounds())
+
+
+def partition_bounds():
+    """
+    {partition name: exclusive upper bound} of charger_histories, the catch-all
+    partition (VALUES LESS THAN MAXVALUE) has None as its bound.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT PARTITION_NAME, PARTITION_DESCRIPTION FROM information_schema.PARTITIONS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL",
+            [TABLE]
+        )
+        return {
+            name: None if description == "MAXVALUE" else datetime.fromisoformat(description.strip("'"))
+            for name, description in cursor.fetchall()
+        }
+
+
+def add_partitions(until):
+    # daily partitions are split off the catch-all `pmax` partition, which stays empty
+    bounds   = partition_bounds()
+    last_day = max(bound for bound in bounds.values() if bound is not None)
+    new_days = []
+
+    while last_day <= until:
+        new_days.append(last_day)
+        last_day += timedelta(days=1)
+
+    if not new_days:
+        return []
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"ALTER TABLE {TABLE} REORGANIZE PARTITION pmax INTO ("
+            + ", ".join(partition_definition(day) for day in new_days)
+            + ", PARTITION pmax VALUES LESS THAN (MAXVALUE))"
+        )
+
+    return [partition_name(day) for day in new_days]
+
+
+def drop_partitions(before):
+    expired = [name for name, bound in partition_bounds().items() if bound is not None and bound <= before]
+
+    if expired:
+        with connection.cursor() as cursor:
+            cursor.execute(f"ALTER TABLE {TABLE} DROP PARTITION {', '.join(expired)}")
+
+    return expired
@@ -0,0 +1,123 @@
+import math
+
+from enum        import Enum
+from collections import defaultdict
+
+import numpy as np
+
+from django.conf import settings
+
+from cafes.models import Cafe
+from core.geo     import bounding_box, cell_row, cell_column
+from core.utils   import chunked
+from evs.models   import Station, StationCafe
+from evs.nearest  import haversine_km
+
+
+class BatchSize(Enum):
+    LOOKUP = 1000
+    INSERT = 5000
+
+
+# km per degree of latitude, and of longitude at the equator
+DEGREE_KM = 111.19
+
+# places are relinked by blocks of BLOCK_CELLS x BLOCK_CELLS grid cells (about 10 km wide)
+BLOCK_CELLS = 10
+
+
+def max_radius_m():
+    return max(settings.STATION_CAFE_RADII_M)
+
+
+def within_radius(places, candidates):
+    """
+    Yields (place id, candidate id, distance in m) for every pair closer than the largest radius.
+    `places` and `candidates` are lists of (id, latitude, longitude).
+    """
+    if not places or not candidates:
+        return
+
+    radius_km  = max_radius_m() / 1000
+    latitudes  = np.array([float(latitude) for _, latitude, _ in candidates])
+    longitudes = np.array([float(longitude) for _, _, longitude in candidates])
+
+    for place_id, latitude, longitude in places:
+        latitude, longitude = float(latitude), float(longitude)
+        latitude_span       = radius_km / DEGREE_KM
+        longitude_span      = radius_km / (DEGREE_KM * math.cos(math.radians(abs(latitude) + latitude_span)))
+
+        window    = np.flatnonzero((np.abs(latitudes - latitude) <= latitude_span) & (np.abs(longitudes - longitude) <= longitude_span))
+        distances = haversine_km(latitude, longitude, latitudes[window], longitudes[window]) * 1000
+
+        for index, distance in zip(window, distances):
+            if distance <= radius_km * 1000:
+                yield place_id, candidates[index][0], round(distance)
+
+
+def candidates_around(places, model):
+    # (id, latitude, longitude) of `model` rows in the bounding box of `places`, padded by the largest radius
+    # in degrees of longitude, which are the shorter ones
+    if not places:
+        return []
+
+    latitudes  = [float(latitude) for _, latitude, _ in places]
+    longitudes = [float(longitude) for _, _, longitude in places]
+    padding    = max_radius_m() / 1000 / (DEGREE_KM * math.cos(math.radians(max(map(abs, latitudes)) + 1)))
+
+    return list(model.objects
+        .filter(bounding_box(min(latitudes) - padding, min(longitudes) - padding, max(latitudes) + padding, max(longitudes) + padding))
+        .values_list("id", "latitude", "longitude")
+    )
+
+
+def compact_chunks(model, ids):
+    """
+    Yields the (id, latitude, longitude) of the given `model` rows in chunks that each lie in one
+    block of grid cells, so the candidates loaded around a chunk are the ones of a small area.
+    """
+    blocks = defaultdict(list)
+
+    for id_chunk in chunked(ids, BatchSize.LOOKUP.value):
+        for place in model.objects.filter(id__in=id_chunk).values_list("id", "latitude", "longitude"):
+            blocks[(cell_row(place[1]) // BLOCK_CELLS, cell_column(place[2]) // BLOCK_CELLS)].append(place)
+
+    for places in blocks.values():
+        yield from chunked(places, BatchSize.LOOKUP.value)
+
+
+def refresh_station_cafes(station_ids):
+    """
+    Relinks the given stations to the cafes around them, for stations that were added or moved.
+    Returns the number of links written.
+    """
+    linked = 0
+
+    for stations in compact_chunks(Station, station_ids):
+        links = [
+            StationCafe(station_id=station_id, cafe_id=cafe_id, distance=distance)
+            for station_id, cafe_id, distance in within_radius(stations, candidates_around(stations, Cafe))
+        ]
+
+        StationCafe.objects.filter(station_id__in=[station_id for station_id, _, _ in stations]).delete()
+        StationCafe.objects.bulk_create(links, batch_size=BatchSize.INSERT.value)
+        linked += len(links)
+
+    return linked
+
+
+def refresh_cafe_stations(cafe_ids):
+    # the same as refresh_station_cafes, from the side of cafes that were added or moved
+    linked = 0
+
+    for cafes in compact_chunks(Cafe, cafe_ids):
+        links = [
+            StationCafe(station_id=station_id, cafe_id=cafe_id, distance=distance)
+            for cafe_id, station_id, distance in within_radius(cafes, candidates_around(cafes, Station))
+        ]
+
+        StationCafe.objects.filter(cafe_id__in=[cafe_id for cafe_id, _, _ in cafes]).delete()
+        StationCafe.objects.bulk_create(links, batch_size=BatchSize.INSERT.value)
+        linked += len(links)
+
+    return linked
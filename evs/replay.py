@@ -0,0 +1,195 @@
+import io
+import random
+import time
+
+from pathlib          import Path
+from datetime         import datetime, timedelta
+from urllib.parse     import urlsplit, parse_qsl
+from xml.sax.saxutils import escape
+
+import requests
+
+from lxml                import etree
+from requests.adapters   import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+from evs.fetch import REGION
+
+
+# rough bounding boxes (SW latitude, SW longitude, NE latitude, NE longitude) used for synthetic stations
+REGION_BOUNDARY = {
+    11 : (37.43, 126.76, 37.70, 127.18),
+    41 : (36.90, 126.40, 38.20, 127.80),
+    28 : (37.35, 126.40, 37.60, 126.80)
+}
+
+CHARGER_TYPES     = (1, 2, 4, 7)
+CHARGING_STATUSES = (1, 2, 3, 4, 5, 9)
+OUTPUTS           = ("7", "50", "100", "200", "")
+
+
+def xml_item(fields):
+    return b"<item>" + "".join(f"<{tag}>{escape(value)}</{tag}>" for tag, value in fields.items()).encode() + b"</item>"
+
+
+def response_xml(items, total_count, page_no, num_of_rows):
+    header = (
+        "<header>"
+        "<resultCode>00</resultCode>"
+        "<resultMsg>NORMAL SERVICE.</resultMsg>"
+        f"<totalCount>{total_count}</totalCount>"
+        f"<pageNo>{page_no}</pageNo>"
+        f"<numOfRows>{num_of_rows}</numOfRows>"
+        "</header>"
+    )
+    return b"".join([
+        b'<?xml version="1.0" encoding="UTF-8"?><response>',
+        header.encode(),
+        b"<body><items>",
+        *items,
+        b"</items></body></response>"
+    ])
+
+
+class SyntheticDataset:
+    """
+    Deterministic stations and chargers for every crawled zcode.
+
+    `advance()` moves the clock forward and changes the status of a share of
+    chargers, so consecutive getChargerStatus replays look like cron runs.
+    """
+    def __init__(self, stations_per_zcode=1000, chargers_per_station=4, seed=0):
+        self.random   = random.Random(seed)
+        self.now      = datetime(2022, 6, 1)
+        self.chargers = {}
+        self.cache    = {}
+
+        for zcode in REGION.values():
+            SW_latitude, SW_longitude, NE_latitude, NE_longitude = REGION_BOUNDARY[zcode]
+            chargers = self.chargers[zcode] = []
+
+            for number in range(stations_per_zcode):
+                station = {
+                    "statNm"      : f"synthetic station {zcode}-{number}",
+                    "statId"      : f"SY{zcode}{number:06d}",
+                    "addr"        : f"synthetic road {number}",
+                    "location"    : "",
+                    "useTime"     : "24시간 이용가능",
+                    "lat"         : f"{self.random.uniform(SW_latitude, NE_latitude):.14f}",
+                    "lng"         : f"{self.random.uniform(SW_longitude, NE_longitude):.14f}",
+                    "busiId"      : "SY",
+                    "bnm"         : "synthetic",
+                    "busiNm"      : "synthetic",
+                    "busiCall"    : "1588-0000",
+                    "zcode"       : str(zcode),
+                    "parkingFree" : self.random.choice("YN"),
+                    "note"        : "",
+                    "limitYn"     : "N",
+                    "limitDetail" : "",
+                    "delYn"       : "N",
+                    "delDetail"   : ""
+                }
+                for index_in_station in range(1, chargers_per_station + 1):
+                    chargers.append(dict(station,
+                        chgerId   = f"{index_in_station:02d}",
+                        chgerType = f"{self.random.choice(CHARGER_TYPES):02d}",
+                        output    = self.random.choice(OUTPUTS),
+                        method    = "단독",
+                        stat      = str(self.random.choice(CHARGING_STATUSES)),
+                        statUpdDt = self.now.strftime("%Y%m%d%H%M%S"),
+                        lastTsdt  = "",
+                        lastTedt  = "",
+                        nowTsdt   = ""
+                    ))
+
+    def advance(self, change_ratio=0.1, minutes=10):
+        self.now  += timedelta(minutes=minutes)
+        self.cache = {}
+        timestamp  = self.now.strftime("%Y%m%d%H%M%S")
+
+        for chargers in self.chargers.values():
+            for charger in self.random.sample(chargers, int(len(chargers) * change_ratio)):
+                charger["stat"]      = str(self.random.choice(CHARGING_STATUSES))
+                charger["statUpdDt"] = timestamp
+
+    def items(self, operation, zcode):
+        if (operation, zcode) not in self.cache:
+            chargers = self.chargers.get(zcode, [])
+
+            if operation == "getChargerStatus":
+                tags  = ("busiId", "statId", "chgerId", "stat", "statUpdDt", "lastTsdt", "lastTedt", "nowTsdt")
+                items = [xml_item({tag: charger[tag] for tag in tags}) for charger in chargers]
+            else:
+                items = [xml_item(charger) for charger in chargers]
+
+            self.cache[(operation, zcode)] = items
+
+        return self.cache[(operation, zcode)]
+
+
+class RecordedDataset:
+    """
+    Items of previously saved API responses, laid out as
+    `<directory>/<operation>/<zcode>*.xml` (e.g. getChargerStatus/11_1.xml).
+    Every file of a zcode is merged, so any page size can be replayed.
+    """
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.cache     = {}
+
+    def items(self, operation, zcode):
+        if (operation, zcode) not in self.cache:
+            items = []
+            for path in sorted((self.directory / operation).glob(f"{zcode}*.xml")):
+                for _, element in etree.iterparse(str(path), tag="item"):
+                    items.append(etree.tostring(element))
+                    element.clear()
+            self.cache[(operation, zcode)] = items
+
+        return self.cache[(operation, zcode)]
+
+
+class ReplayAdapter(BaseAdapter):
+    """
+    requests transport that answers EvCharger API calls from a dataset instead of data.go.kr.
+    Honours pageNo / numOfRows / zcode and sleeps `latency` (+ up to `jitter`) seconds per page.
+
+        session = requests.Session()
+        session.mount("http://apis.data.go.kr/", ReplayAdapter(SyntheticDataset()))
+    """
+    def __init__(self, dataset, latency=0.0, jitter=0.0):
+        super().__init__()
+        self.dataset = dataset
+        self.latency = latency
+        self.jitter  = jitter
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        url       = urlsplit(request.url)
+        params    = dict(parse_qsl(url.query))
+        operation = url.path.rsplit("/", 1)[-1]
+
+        page_no     = int(params.get("pageNo", 1))
+        num_of_rows = int(params.get("numOfRows", 10))
+        items       = self.dataset.items(operation, int(params.get("zcode", 0)))
+        page_items  = items[(page_no - 1) * num_of_rows : page_no * num_of_rows]
+
+        time.sleep(self.latency + random.uniform(0, self.jitter))
+
+        response             = requests.Response()
+        response.status_code = 200
+        response.reason      = "OK"
+        response.headers     = CaseInsensitiveDict({"Content-Type": "text/xml;charset=UTF-8"})
+        response.raw         = io.BytesIO(response_xml(page_items, len(items), page_no, num_of_rows))
+        response.encoding    = "utf-8"
+        response.url         = request.url
+        response.request     = request
+        return response
+
+    def close(self):
+        pass
+
+
+def replay_session(dataset, latency=0.0, jitter=0.0):
+    session = requests.Session()
+    session.mount("http://apis.data.go.kr/", ReplayAdapter(dataset, latency, jitter))
+    return session
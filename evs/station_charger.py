@@ -1,15 +1,21 @@
-import requests
-import pandas as pd
-
-from enum     import Enum
-from datetime import datetime
-
-from bs4 import BeautifulSoup
+from enum        import Enum
+from collections import defaultdict
 
 from django.conf import settings
 from django.db   import transaction
 
-from evs.models import Station, Charger
+from core            import versions
+from core.geo        import grid_cell
+from core.utils      import chunked, bulk_upsert
+from evs.models      import Station, Charger, IngestionRun
+from evs.telemetry   import RunRecorder
+from evs.checkpoints import Checkpoints
+from evs.summaries   import refresh_station_summaries, snapshot_region_summaries
+from evs.proximity   import refresh_station_cafes
+from evs.fetch       import PageFetcher, REGION
+from evs             import nearest
+from evs.parsers     import charger_info_record
+from commons         import lookups
 
 
 class Category(Enum):
@@ -17,144 +23,176 @@ class Category(Enum):
     EV         = 2
 
 
-def get_charger_info_API():
-    URL = 'http://apis.data.go.kr/B552584/EvCharger/getChargerInfo'
+class BatchSize(Enum):
+    UPSERT = 1000
 
-    region = {
-        '서울' : 11,
-        '경기' : 41,
-        '인천' : 28
-    }
+
+def charger_info_fetcher(session=None):
+    URL = 'http://apis.data.go.kr/B552584/EvCharger/getChargerInfo'
 
     MAX_SHIFT_SIZE = 10000
-    totalCount     = 1e9
     UPDATE_PERIOD  = 1
 
+    params = {
+        'serviceKey' : settings.DECODED_SERVICE_KEY,
+        'numOfRows'  : MAX_SHIFT_SIZE,
+        'period'     : UPDATE_PERIOD
+    }
+    return PageFetcher(URL, params, charger_info_record, session=session)
+
+def get_charger_info_API(session=None, recorder=None):
     item_list = []
-    
-    print("------------------------------------------------------------------------------------------------------")
-    print("charger info crawling start\n")
-    crawling_start_time = datetime.now()
-    for city, zcode in region.items():
-        pageNo = 0
-        print("city: ", city)
-
-        while pageNo <= (totalCount / MAX_SHIFT_SIZE):
-            pageNo += 1
-            params = {
-                'serviceKey' : settings.DECODED_SERVICE_KEY,
-                'pageNo'     : pageNo,
-                'numOfRows'  : MAX_SHIFT_SIZE,
-                'period'     : UPDATE_PERIOD,
-                'zcode'      : zcode
-            }
 
-            response = requests.get(URL, params=params)
-
-            content = response.text
-
-            xml = BeautifulSoup(content, "lxml-xml")
-
-            header = xml.find("header")
-            items  = xml.find("items")
-
-            header_list = [{
-                "resultCode" : header.find("resultCode").text.strip(),
-                "resultMsg"  : header.find("resultMsg").text.strip(),
-                "totalCount" : header.find("totalCount").text.strip(),
-                "pageNo"     : header.find("pageNo").text.strip(),
-                "numOfRows"  : header.find("numOfRows").text.strip(),
-            }]
-            totalCount = int(header.find("totalCount").text.strip())
-
-            for item in items:
-                item_list.append({
-                    "station_id"                : item.find("statId").text.strip(),
-                    "station_name"              : item.find("statNm").text.strip(),
-                    "location"                  : item.find("location").text.strip(),
-                    "road_name_address"         : item.find("addr").text.strip(),
-                    "latitude"                  : float(item.find("lat").text.strip()),
-                    "longitude"                 : float(item.find("lng").text.strip()),
-                    "hours_of_operation"        : item.find("useTime").text.strip(),
-                    "index_in_station"          : int(item.find("chgerId").text.strip()),
-                    "charging_status"           : int(item.find("stat").text.strip()),
-                    "charger_type"              : int(item.find("chgerType").text.strip()),
-                    "output"                    : int(item.find("output").text.strip()) if item.find("output").text != '' else None,
-                    "method"                    : item.find("method").text.strip(),
-                    "parking_free_yes_or_no"    : item.find("parkingFree").text.strip(),
-                    "parking_detail"            : item.find("note").text.strip(),
-                    "limit_yes_or_no"           : item.find("limitYn").text.strip(),
-                    "limit_detail"              : item.find("limitDetail").text.strip(),
-                    "delete_yes_or_no"          : item.find("delYn").text.strip(),
-                    "delete_detail"             : item.find("delDetail").text.strip(),
-                    "business_id"               : item.find("busiId").text.strip(),
-                    "business_name"             : item.find("bnm").text.strip(),
-                    "business_manamgement_name" : item.find("busiNm").text.strip(),
-                    "business_call"             : item.find("busiCall").text.strip(),
-                    "zcode"                     : int(item.find("zcode").text.strip())
-                })
-
-    crawling_end_time = datetime.now()
-
-    print("charger info crawling complete\n")
-    print("crawling start time", crawling_start_time)
-    print("crawling end time", crawling_end_time)
-    print("crawling running time", crawling_end_time - crawling_start_time, "\n")
-
-    response_df = pd.DataFrame(header_list)
-    ev_df       = pd.DataFrame(item_list)
-
-    print(response_df.head(len(header_list)))
-    print(ev_df.head(len(item_list)))
-    
+    fetcher = charger_info_fetcher(session)
+
+    print("cities: ", *REGION)
+    for page in fetcher.iter_pages(REGION.values()):
+        item_list.extend(page.records)
+
+        if recorder:
+            recorder.add_page(page)
+
     return item_list
 
-def update_stations_and_chargers():
+def station_values(item):
+    return {
+        "name"                      : item["station_name"],
+        "detail_location"           : item["location"],
+        "road_name_address"         : item["road_name_address"],
+        "latitude"                  : item["latitude"],
+        "longitude"                 : item["longitude"],
+        "grid_cell"                 : grid_cell(item["latitude"], item["longitude"]),
+        "hours_of_operation"        : item["hours_of_operation"],
+        "business_id"               : item["business_id"],
+        "business_name"             : item["business_name"],
+        "business_manamgement_name" : item["business_manamgement_name"],
+        "business_call"             : item["business_call"],
+        "parking_free_yes_or_no"    : item["parking_free_yes_or_no"],
+        "parking_detail"            : item["parking_detail"],
+        "limit_yes_or_no"           : item["limit_yes_or_no"],
+        "limit_detail"              : item["limit_detail"],
+        "delete_yes_or_no"          : item["delete_yes_or_no"],
+        "delete_detail"             : item["delete_detail"],
+        "category_id"               : Category.EV.value,
+        "region_id"                 : item["zcode"]
+    }
 
-    item_list = get_charger_info_API()
+def charger_values(item):
+    return {
+        "output"             : item["output"],
+        "method"             : item["method"],
+        "charger_type_id"    : item["charger_type"],
+        "charging_status_id" : item["charging_status"]
+    }
 
-    print("\nstart update tables; stations and chargers")
-    update_start_time = datetime.now()
+def bulk_upsert_stations_and_chargers(item_list):
+    station_rows = {}
+    charger_rows = {}
 
+    for item in item_list:
+        station_rows[item["station_id"]] = dict(id=item["station_id"], **station_values(item))
+        charger_rows[(item["station_id"], item["index_in_station"])] = dict(
+            station_id       = item["station_id"],
+            index_in_station = item["index_in_station"],
+            **charger_values(item)
+        )
+
+    chargers_by_station = defaultdict(dict)
+    for key, values in charger_rows.items():
+        chargers_by_station[key[0]][key] = values
+
+    created_stations = updated_stations = created_chargers = updated_chargers = 0
+
+    for station_id_chunk in chunked(station_rows, BatchSize.UPSERT.value):
+        chunk_station_rows = {station_id: station_rows[station_id] for station_id in station_id_chunk}
+        chunk_charger_rows = {key: values for station_id in station_id_chunk for key, values in chargers_by_station[station_id].items()}
+
+        with transaction.atomic():
+            existing_stations = Station.objects.in_bulk(station_id_chunk)
+            existing_chargers = {
+                (charger.station_id, charger.index_in_station): charger
+                for charger in Charger.objects.filter(station_id__in=station_id_chunk)
+            }
+            locations = {station_id: (station.latitude, station.longitude) for station_id, station in existing_stations.items()}
+
+            created, updated = bulk_upsert(Station, chunk_station_rows, existing_stations, BatchSize.UPSERT.value)
+            created_stations += created
+            updated_stations += updated
+
+            # bulk_upsert updates the existing instances in place, so added and moved stations differ from `locations`
+            moved_station_ids = [
+                station_id for station_id in station_id_chunk
+                if station_id not in locations or locations[station_id] != (existing_stations[station_id].latitude, existing_stations[station_id].longitude)
+            ]
+            if moved_station_ids:
+                refresh_station_cafes(moved_station_ids)
+
+            created, updated = bulk_upsert(Charger, chunk_charger_rows, existing_chargers, BatchSize.UPSERT.value)
+            created_chargers += created
+            updated_chargers += updated
+
+            if created or updated:
+                refresh_station_summaries(station_id_chunk)
+
+    unchanged_chargers = len(charger_rows) - created_chargers - updated_chargers
+
+    print("stations created:", created_stations, "updated:", updated_stations, "unchanged:", len(station_rows) - created_stations - updated_stations)
+    print("chargers created:", created_chargers, "updated:", updated_chargers, "unchanged:", unchanged_chargers)
+
+    return unchanged_chargers
+
+def update_stations_and_chargers_one_by_one(item_list):
     for item in item_list:
         with transaction.atomic():
             Station.objects.update_or_create(
-                id = item["station_id"],
-                defaults={
-                    "name"                      : item["station_name"],
-                    "detail_location"           : item["location"],
-                    "road_name_address"         : item["road_name_address"],
-                    "latitude"                  : item["latitude"],
-                    "longitude"                 : item["longitude"],
-                    "hours_of_operation"        : item["hours_of_operation"],
-                    "business_id"               : item["business_id"],
-                    "business_name"             : item["business_name"],
-                    "business_manamgement_name" : item["business_manamgement_name"],
-                    "business_call"             : item["business_call"],
-                    "parking_free_yes_or_no"    : item["parking_free_yes_or_no"],
-                    "parking_detail"            : item["parking_detail"],
-                    "limit_yes_or_no"           : item["limit_yes_or_no"],
-                    "limit_detail"              : item["limit_detail"],
-                    "delete_yes_or_no"          : item["delete_yes_or_no"],
-                    "delete_detail"             : item["delete_detail"],
-                    "category_id"               : Category.EV.value,
-                    "region_id"                 : item["zcode"]
-                }
+                id       = item["station_id"],
+                defaults = station_values(item)
             )
             Charger.objects.update_or_create(
                 index_in_station = item["index_in_station"],
                 station_id       = item["station_id"],
-                defaults={
-                    "output"             : item["output"],
-                    "method"             : item["method"],
-                    "charger_type_id"    : item["charger_type"],
-                    "charging_status_id" : item["charging_status"]
-               }
+                defaults         = charger_values(item)
             )
-        
-    print("\nUpdateChargerHistory complete\n")
-    update_end_time = datetime.now()
-    print("update start time", update_start_time)
-    print("update end time", update_end_time)
-    print("update running time :", update_end_time - update_start_time)
-    print("------------------------------------------------------------------------------------------------------")
\ No newline at end of file
+
+    refresh_station_summaries({item["station_id"] for item in item_list})
+    refresh_station_cafes({item["station_id"] for item in item_list})
+
+    return 0
+
+def update_stations_and_chargers(bulk=True, session=None):
+    print("------------------------------------------------------------------------------------------------------")
+
+    if bulk:
+        write = bulk_upsert_stations_and_chargers
+    else:
+        write = update_stations_and_chargers_one_by_one
+
+    with RunRecorder(IngestionRun.Job.STATIONS_AND_CHARGERS) as recorder:
+        checkpoints = Checkpoints(IngestionRun.Job.STATIONS_AND_CHARGERS, recorder.run)
+        completed   = checkpoints.completed()
+        outputs     = lookups.charger_outputs()
+
+        print("cities: ", *REGION)
+        print("resumed pages:", sum(len(page_numbers) for _, page_numbers in completed.values()))
+
+        pages         = charger_info_fetcher(session).iter_pages(REGION.values(), completed)
+        pages_written = 0
+        try:
+            for page in recorder.crawl(pages):
+                with recorder.phase("write"):
+                    written = checkpoints.commit(page, write)
+
+                if written is not None:
+                    versions.bump("evs")
+                    pages_written += 1
+                    recorder.run.skipped += written
+        finally:
+            if pages_written:
+                versions.bump(nearest.VERSION)
+
+        snapshot_region_summaries(recorder.run)
+
+        if lookups.charger_outputs() != outputs:
+            versions.bump(lookups.VERSION)
+
+    print("------------------------------------------------------------------------------------------------------")
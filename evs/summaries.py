@@ -0,0 +1,122 @@
+from enum import Enum
+
+from datetime import timedelta
+
+from django.conf      import settings
+from django.db.models import Q, Count, Sum
+from django.utils     import timezone
+
+from core.utils import chunked, bulk_upsert
+from evs.models import Station, StationSummary, RegionSummary, RegionSnapshot, ChargingStatusCode
+
+
+class BatchSize(Enum):
+    LOOKUP = 1000
+    UPSERT = 1000
+
+
+# kW, chargers from this output on count as quick chargers
+QUICK_OUTPUT = 30
+
+COUNTERS = {
+    "total_charger"                 : Count("charger"),
+    "communication_abnomal_charger" : Count("charger", filter=Q(charger__charging_status=ChargingStatusCode.communication_abnomal.value)),
+    "ready_charger"                 : Count("charger", filter=Q(charger__charging_status=ChargingStatusCode.ready.value)),
+    "charging_charger"              : Count("charger", filter=Q(charger__charging_status=ChargingStatusCode.charging.value)),
+    "suspending_charger"            : Count("charger", filter=Q(charger__charging_status=ChargingStatusCode.suspending.value)),
+    "inspecting_charger"            : Count("charger", filter=Q(charger__charging_status=ChargingStatusCode.inspecting.value)),
+    "not_confirmed_charger"         : Count("charger", filter=Q(charger__charging_status=ChargingStatusCode.not_confirmed.value)),
+    "quick_charger"                 : Count("charger", filter=Q(charger__output__gte=QUICK_OUTPUT)),
+    "slow_charger"                  : Count("charger", filter=Q(charger__output__lt=QUICK_OUTPUT)),
+    "quick_charger_of_ready"        : Count("charger", filter=Q(charger__output__gte=QUICK_OUTPUT, charger__charging_status=ChargingStatusCode.ready.value)),
+    "slow_charger_of_ready"         : Count("charger", filter=Q(charger__output__lt=QUICK_OUTPUT, charger__charging_status=ChargingStatusCode.ready.value)),
+}
+
+
+def count_chargers(station_ids):
+    # {station id: {counter: value}} straight from chargers
+    counts = {}
+
+    for station_id_chunk in chunked(station_ids, BatchSize.LOOKUP.value):
+        station_counts = Station.objects\
+            .filter(id__in=station_id_chunk)\
+            .values("id")\
+            .annotate(**COUNTERS)
+
+        counts.update({station_count.pop("id"): station_count for station_count in station_counts})
+
+    return counts
+
+
+def fill_missing_counts(counts_by_station, station_ids):
+    # stations without a summary row yet (not refreshed or backfilled) are counted straight from their chargers
+    counts_by_station.update(count_chargers([station_id for station_id in station_ids if station_id not in counts_by_station]))
+    return counts_by_station
+
+
+def refresh_station_summaries(station_ids):
+    """
+    Recounts the chargers of the given stations and stores the counters that changed.
+    Called by the ingestion jobs for the stations whose chargers they touched.
+    Returns (number of created summaries, number of updated summaries).
+    """
+    created = updated = 0
+
+    for station_id_chunk in chunked(station_ids, BatchSize.UPSERT.value):
+        rows = {
+            station_id: dict(station_id=station_id, **counters)
+            for station_id, counters in count_chargers(station_id_chunk).items()
+        }
+
+        chunk_created, chunk_updated = bulk_upsert(StationSummary, rows, StationSummary.objects.in_bulk(station_id_chunk), BatchSize.UPSERT.value)
+        created += chunk_created
+        updated += chunk_updated
+
+        if chunk_created or chunk_updated:
+            refresh_region_summaries(Station.objects.filter(id__in=station_id_chunk).values_list("region_id", flat=True).distinct())
+
+    return created, updated
+
+
+def refresh_region_summaries(region_ids):
+    # adds up the station summaries of the given regions; regions without stations get zeros
+    region_ids = list(region_ids)
+    counts     = StationSummary.objects\
+        .filter(station__region_id__in=region_ids)\
+        .values("station__region_id")\
+        .annotate(total_station=Count("station_id"), **{counter: Sum(counter) for counter in COUNTERS})
+
+    rows = {region_id: {"region_id": region_id, "total_station": 0, **dict.fromkeys(COUNTERS, 0)} for region_id in region_ids}
+    for count in counts:
+        rows[count.pop("station__region_id")].update(count)
+
+    return bulk_upsert(RegionSummary, rows, RegionSummary.objects.in_bulk(region_ids), BatchSize.UPSERT.value)
+
+
+def snapshot_region_summaries(run=None):
+    # one row per region, snapshots older than REGION_SNAPSHOT_RETENTION_DAYS are dropped
+    now = timezone.now()
+
+    RegionSnapshot.objects.bulk_create([
+        RegionSnapshot(run=run, region_id=summary.region_id, taken_at=now, **{
+            field: getattr(summary, field) for field in ("total_station", *COUNTERS)
+        })
+        for summary in RegionSummary.objects.all()
+    ])
+    RegionSnapshot.objects.filter(taken_at__lt=now - timedelta(days=settings.REGION_SNAPSHOT_RETENTION_DAYS)).delete()
+
+
+def find_drift(station_ids):
+    # station ids whose summary is missing or differs from a fresh count
+    drifted = []
+
+    for station_id_chunk in chunked(station_ids, BatchSize.LOOKUP.value):
+        summaries = StationSummary.objects.in_bulk(station_id_chunk)
+
+        for station_id, counters in count_chargers(station_id_chunk).items():
+            summary = summaries.get(station_id)
+
+            if summary is None or any(getattr(summary, counter) != value for counter, value in counters.items()):
+                drifted.append(station_id)
+
+    return drifted
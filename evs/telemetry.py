@@ -0,0 +1,89 @@
+import resource
+import time
+
+from django.conf  import settings
+from django.utils import timezone
+
+from evs.models import IngestionRun
+
+
+class RunRecorder:
+    """
+    Collects the numbers of one ingestion run and stores them as an IngestionRun.
+
+        with RunRecorder(IngestionRun.Job.CHARGER_STATUS) as recorder:
+            for page in recorder.crawl(fetcher.iter_pages(zcodes)):
+                with recorder.phase("write"):
+                    ...
+    """
+    def __init__(self, job):
+        self.job = job
+        self.run = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        self.run   = IngestionRun.objects.create(job=self.job, started_at=timezone.now())
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        run = self.run
+
+        run.finished_at      = timezone.now()
+        run.duration_seconds = time.perf_counter() - self.start
+        run.rows_per_second  = run.rows / run.duration_seconds if run.duration_seconds else 0
+        run.peak_memory_kb   = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        run.status           = IngestionRun.Status.FAILED if exc_type else IngestionRun.Status.SUCCEEDED
+        run.error            = repr(exc_value) if exc_value else ""
+        run.save()
+
+        print(
+            f"ingestion run {run.id} ({run.job}) {run.status}: {run.rows} rows from {run.pages_fetched} pages in {run.duration_seconds:.1f}s "
+            f"[crawl {run.crawl_seconds:.1f}s, write {run.write_seconds:.1f}s] {run.rows_per_second:.0f} rows/s, "
+            f"{run.retries} retries, {run.skipped} skipped, {run.unknown_chargers} unknown, peak {run.peak_memory_kb} KB"
+        )
+        if is_near_deadline(run):
+            print(f"WARNING: ingestion run {run.id} took {run.duration_seconds:.0f}s of its {settings.INGESTION_RUN_PERIODS[run.job]}s cron period")
+
+        return False
+
+    def phase(self, name):
+        return Phase(self.run, f"{name}_seconds")
+
+    def crawl(self, pages):
+        # times the fetch of every page as "crawl", whatever the caller does between pages
+        pages = iter(pages)
+
+        while True:
+            with self.phase("crawl"):
+                page = next(pages, None)
+
+            if page is None:
+                return
+
+            self.add_page(page)
+            yield page
+
+    def add_page(self, page):
+        self.run.pages_fetched += 1
+        self.run.rows          += len(page.records)
+        self.run.retries       += page.retries
+        self.run.fetch_seconds += page.fetch_seconds
+        self.run.parse_seconds += page.parse_seconds
+
+
+class Phase:
+    def __init__(self, run, attribute):
+        self.run       = run
+        self.attribute = attribute
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        setattr(self.run, self.attribute, getattr(self.run, self.attribute) + time.perf_counter() - self.start)
+        return False
+
+
+def is_near_deadline(run):
+    period = settings.INGESTION_RUN_PERIODS.get(run.job)
+    return bool(period) and run.duration_seconds >= period * settings.INGESTION_ALERT_RATIO
@@ -1,3 +1,988 @@
-from django.test import TestCase
+import io
+import os
+import json
+import asyncio
+import random
+import tempfile
 
-# Create your tests here.
+from unittest import mock
+
+from datetime import date, datetime, timedelta
+
+import requests
+
+from lxml                import etree
+from requests.adapters   import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+from django.db                   import connection
+from django.test                 import TestCase, SimpleTestCase, override_settings
+from django.core.management      import call_command
+from django.core.management.base import CommandError
+from django.utils.cache          import has_vary_header
+
+from core                    import versions
+from core.geo                import bounding_box, grid_cell
+from cafes.models            import Cafe
+from commons.models          import Region, Category
+from evs.models              import Station, StationCafe, StationSummary, RegionSummary, RegionSnapshot, Charger, ChargerHistory, ChargerStatusRollup, ChargerType, ChargingStatus, IngestionRun, state_fingerprint
+from evs.fetch               import Page, PageFetcher, ApiError
+from evs.parsers             import PageStream, charger_status_record, charger_info_record, charger_status_columns, raw_fields
+from evs.replay              import REGION_BOUNDARY, SyntheticDataset, replay_session, xml_item, response_xml
+from evs.charger_history     import UpdateChargerHistory, bulk_update_charger_history, bulk_update_charger_history_columns, update_charger_history_one_by_one, frame_fingerprints
+from evs.history_maintenance import rollup_hours, rollup_days, expire_histories
+from evs.checkpoints         import Checkpoints
+from evs.station_charger     import update_stations_and_chargers, bulk_upsert_stations_and_chargers
+from evs.live                import live_application
+from evs.proximity           import refresh_station_cafes, refresh_cafe_stations
+from evs.nearest             import VERSION as NEAREST_VERSION, StationIndex, station_index, haversine_km
+from evs.summaries           import refresh_station_summaries, snapshot_region_summaries, find_drift
+from evs.views               import COLUMNAR_MEDIA_TYPE, AdminHistory
+
+
+URL = "http://apis.data.go.kr/B552584/EvCharger/getChargerStatus"
+
+# data versions of the test run, kept apart from the ones of the processes on the host
+VERSION_DIR = os.path.join(tempfile.gettempdir(), "maze-test-versions")
+
+# (SW latitude, SW longitude, NE latitude, NE longitude) of map windows from 100m to 20km wide
+MAP_WINDOWS = [
+    (37.4890, 127.0170, 37.5070, 127.0400),
+    (37.5200, 126.9300, 37.6000, 127.0500),
+    (37.1800, 126.9000, 37.3600, 127.1200),
+    (37.4560, 126.7050, 37.4569, 126.7061)
+]
+
+
+def status_item(station_id="ST000001", index_in_station="01", stat="2", updated="20220601120000"):
+    return xml_item({
+        "busiId"    : "ST",
+        "statId"    : station_id,
+        "chgerId"   : index_in_station,
+        "stat"      : stat,
+        "statUpdDt" : updated,
+        "lastTsdt"  : "",
+        "lastTedt"  : "",
+        "nowTsdt"   : ""
+    })
+
+
+def status_record(station_id="ST000001", index_in_station="01", stat="2", updated="20220601120000"):
+    return charger_status_record({
+        "busiId"    : "ST",
+        "statId"    : station_id,
+        "chgerId"   : index_in_station,
+        "stat"      : stat,
+        "statUpdDt" : updated
+    })
+
+
+def create_lookups():
+    Region.objects.create(zcode=11, city="서울")
+    Category.objects.create(id=1, type="station")
+
+    ChargingStatus.objects.bulk_create([ChargingStatus(code=code, explanation=str(code)) for code in (1, 2, 3, 4, 5, 9)])
+    ChargerType.objects.bulk_create([ChargerType(code=code, explanation=str(code)) for code in (1, 2, 4, 7)])
+
+
+def create_regions():
+    # every crawled region, and the categories of the ingested stations (2) and cafes (1)
+    for zcode in REGION_BOUNDARY:
+        Region.objects.get_or_create(zcode=zcode, defaults={"city" : str(zcode)})
+    Category.objects.get_or_create(id=1, defaults={"type" : "cafe"})
+    Category.objects.get_or_create(id=2, defaults={"type" : "ev"})
+
+
+def load_synthetic_places(stations_per_zcode, cafes):
+    # stations of SyntheticDataset (category 2) and random cafes (category 1) in the crawled regions
+    create_regions()
+
+    dataset = SyntheticDataset(stations_per_zcode, 1)
+    bulk_upsert_stations_and_chargers([charger_info_record(charger) for chargers in dataset.chargers.values() for charger in chargers])
+
+    random_point = random.Random(0)
+    places       = []
+    for number in range(cafes):
+        zcode = random_point.choice(list(REGION_BOUNDARY))
+        SW_latitude, SW_longitude, NE_latitude, NE_longitude = REGION_BOUNDARY[zcode]
+        latitude  = round(random_point.uniform(SW_latitude, NE_latitude), 10)
+        longitude = round(random_point.uniform(SW_longitude, NE_longitude), 10)
+
+        places.append(Cafe(
+            land_lot_number_address = f"synthetic lot {number}",
+            road_name_address       = f"synthetic road {number}",
+            name                    = f"synthetic cafe {number}",
+            latitude                = latitude,
+            longitude               = longitude,
+            grid_cell               = grid_cell(latitude, longitude),
+            category_id             = 1,
+            region_id               = zcode
+        ))
+    Cafe.objects.bulk_create(places, batch_size=5000)
+
+
+def create_station(station_id, latitude, longitude, chargers=1):
+    station = Station.objects.create(
+        id                        = station_id,
+        name                      = station_id,
+        latitude                  = latitude,
+        longitude                 = longitude,
+        business_id               = "ST",
+        business_name             = "test",
+        business_manamgement_name = "test",
+        category_id               = 1,
+        region_id                 = 11
+    )
+    Charger.objects.bulk_create([
+        Charger(station=station, index_in_station=index_in_station, charger_type_id=1, charging_status_id=9)
+        for index_in_station in range(1, chargers + 1)
+    ])
+    return station
+
+
+class CannedAdapter(BaseAdapter):
+    # answers every request with the next of `bodies`, and keeps the requested urls
+    def __init__(self, bodies):
+        super().__init__()
+        self.bodies   = list(bodies)
+        self.requests = []
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        self.requests.append(request.url)
+
+        response             = requests.Response()
+        response.status_code = 200
+        response.headers     = CaseInsensitiveDict({"Content-Type": "text/xml;charset=UTF-8"})
+        response.raw         = io.BytesIO(self.bodies.pop(0))
+        response.request     = request
+        return response
+
+    def close(self):
+        pass
+
+
+def canned_fetcher(bodies, **kwargs):
+    adapter = CannedAdapter(bodies)
+    session = requests.Session()
+    session.mount("http://apis.data.go.kr/", adapter)
+
+    return PageFetcher(URL, {"numOfRows" : 2}, charger_status_record, session=session, max_workers=1, **kwargs), adapter
+
+
+class PageStreamTest(SimpleTestCase):
+    def test_records_and_header_across_chunks(self):
+        body   = response_xml([status_item("ST000001"), status_item("ST000002", stat="3", updated="")], 2, 1, 10)
+        chunks = [body[index:index + 7] for index in range(0, len(body), 7)]
+        page   = PageStream(chunks, charger_status_record)
+
+        records = list(page)
+
+        self.assertEqual(page.header["totalCount"], "2")
+        self.assertEqual([record["station_id"] for record in records], ["ST000001", "ST000002"])
+        self.assertEqual(records[0]["charger_status_update_datetime"].isoformat(), "2022-06-01T12:00:00")
+        self.assertIsNone(records[1]["charger_status_update_datetime"])
+        self.assertEqual(records[1]["charging_status"], 3)
+
+    def test_columns_match_records(self):
+        body    = response_xml([status_item("ST000001"), status_item("ST000002", updated="")], 2, 1, 10)
+        frame   = charger_status_columns(PageStream([body], raw_fields))
+        records = list(PageStream([body], charger_status_record))
+
+        self.assertEqual(frame["station_id"].tolist(), [record["station_id"] for record in records])
+        self.assertEqual(frame["index_in_station"].tolist(), [record["index_in_station"] for record in records])
+        self.assertTrue(frame["charger_status_update_datetime"].isna()[1])
+
+    def test_truncated_body(self):
+        body = response_xml([status_item()], 1, 1, 10)
+
+        with self.assertRaises(etree.XMLSyntaxError):
+            list(PageStream([body[:-20]], charger_status_record))
+
+
+@override_settings(EV_API_MAX_RETRIES=2, EV_API_BACKOFF_BASE=0, EV_API_BACKOFF_MAX=0)
+class PageFetcherTest(SimpleTestCase):
+    def test_fetches_remaining_pages(self):
+        fetcher, adapter = canned_fetcher([
+            response_xml([status_item("ST000001"), status_item("ST000002")], 3, 1, 2),
+            response_xml([status_item("ST000003")], 3, 2, 2)
+        ])
+
+        pages = list(fetcher.iter_pages([11]))
+
+        self.assertEqual([page.page_no for page in pages], [1, 2])
+        self.assertEqual(sum(len(page.records) for page in pages), 3)
+
+    def test_skips_completed_pages(self):
+        fetcher, adapter = canned_fetcher([response_xml([status_item("ST000003")], 3, 2, 2)])
+
+        pages = list(fetcher.iter_pages([11], {11 : (3, {1})}))
+
+        self.assertEqual([page.page_no for page in pages], [2])
+        self.assertEqual(len(adapter.requests), 1)
+
+    def test_retries_truncated_body(self):
+        body             = response_xml([status_item()], 1, 1, 2)
+        fetcher, adapter = canned_fetcher([body[:-20], body])
+
+        page = fetcher.fetch_page(11, 1)
+
+        self.assertEqual(page.retries, 1)
+        self.assertEqual(len(page.records), 1)
+
+    def test_error_result(self):
+        body = (
+            b'<?xml version="1.0" encoding="UTF-8"?><response><header>'
+            b"<resultCode>22</resultCode><resultMsg>LIMITED NUMBER OF SERVICE REQUESTS EXCEEDS ERROR.</resultMsg>"
+            b"</header></response>"
+        )
+        fetcher, adapter = canned_fetcher([body])
+
+        with self.assertRaisesMessage(ApiError, "LIMITED NUMBER OF SERVICE REQUESTS"):
+            fetcher.fetch_page(11, 1)
+
+    def test_response_without_header(self):
+        body = b"<OpenAPI_ServiceResponse><cmmMsgHeader><errMsg>SERVICE ERROR</errMsg></cmmMsgHeader></OpenAPI_ServiceResponse>"
+        fetcher, adapter = canned_fetcher([body])
+
+        with self.assertRaises(ApiError):
+            fetcher.fetch_page(11, 1)
+
+
+class ChargerHistoryTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_lookups()
+        create_station("ST000001", 37.5, 127.0, chargers=2)
+
+    def test_bulk_skips_unchanged_chargers(self):
+        records = [status_record(index_in_station="01"), status_record(index_in_station="02")]
+
+        self.assertEqual(bulk_update_charger_history(records), ([], 0))
+        self.assertEqual(bulk_update_charger_history(records), ([], 2))
+        self.assertEqual(ChargerHistory.objects.count(), 2)
+
+    def test_one_by_one_skips_unchanged_chargers(self):
+        record = status_record(stat="2")
+
+        self.assertEqual(update_charger_history_one_by_one([record]), ([], 0))
+        updated_at = Charger.objects.get(index_in_station=1).updated_at
+
+        self.assertEqual(update_charger_history_one_by_one([record]), ([], 1))
+        self.assertEqual(ChargerHistory.objects.count(), 1)
+
+        # a new status timestamp is history, but leaves updated_at (and /evs/changes) alone
+        self.assertEqual(update_charger_history_one_by_one([status_record(stat="2", updated="20220601121000")]), ([], 0))
+        self.assertEqual(ChargerHistory.objects.count(), 2)
+        self.assertEqual(Charger.objects.get(index_in_station=1).updated_at, updated_at)
+
+    def test_modes_share_fingerprints(self):
+        record = status_record()
+
+        bulk_update_charger_history([record])
+
+        self.assertEqual(update_charger_history_one_by_one([record]), ([], 1))
+
+    def test_columnar_mode_shares_fingerprints(self):
+        items = [status_item(index_in_station="01"), status_item(index_in_station="02", stat="3", updated="20220601121500")]
+        frame = charger_status_columns(PageStream([response_xml(items, 2, 1, 10)], raw_fields))
+
+        bulk_update_charger_history([status_record(index_in_station="01")])
+
+        self.assertEqual(bulk_update_charger_history_columns(frame), ([], 1))
+        self.assertEqual(bulk_update_charger_history_columns(frame), ([], 2))
+        self.assertEqual(update_charger_history_one_by_one([status_record(index_in_station="02", stat="3", updated="20220601121500")]), ([], 1))
+        self.assertEqual(Charger.objects.get(index_in_station=2).charging_status_id, 3)
+        self.assertEqual(ChargerHistory.objects.count(), 2)
+        self.assertEqual(list(ChargerHistory.objects.filter(charger__index_in_station=2).values_list("charging_status_id", "charger_status_update_datetime", "last_charging_start_datetime", "created_at__date")), [(3, datetime(2022, 6, 1, 12, 15), None, date.today())])
+
+    def test_fingerprints_match_row_by_row(self):
+        random_state = random.Random(3)
+        items        = [
+            status_item(
+                index_in_station = f"{number:02d}",
+                stat             = str(random_state.choice((1, 2, 3, 4, 5, 9))),
+                updated          = random_state.choice(["", (datetime(2022, 6, 1) + timedelta(seconds=random_state.randrange(864000))).strftime("%Y%m%d%H%M%S")])
+            )
+            for number in range(1, 100)
+        ]
+        body    = response_xml(items, len(items), 1, len(items))
+        frame   = charger_status_columns(PageStream([body], raw_fields))
+        records = list(PageStream([body], charger_status_record))
+
+        self.assertEqual(frame_fingerprints(frame).tolist(), [state_fingerprint(record) for record in records])
+
+    def test_unknown_chargers(self):
+        records = [status_record("ST999999"), status_record(index_in_station="03")]
+
+        self.assertEqual(bulk_update_charger_history(records)[0], [("ST999999", 1), ("ST000001", 3)])
+        self.assertEqual(update_charger_history_one_by_one(records)[0], [("ST999999", 1), ("ST000001", 3)])
+
+
+class RollupTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_lookups()
+        create_station("ST000001", 37.5, 127.0, chargers=2)
+
+    def add_history(self, charger, charging_status, status_at, created_at):
+        history = ChargerHistory.objects.create(charger=charger, charging_status_id=charging_status, charger_status_update_datetime=status_at)
+        ChargerHistory.objects.filter(id=history.id).update(created_at=created_at)
+
+    def rollups(self):
+        return set(ChargerStatusRollup.objects.values_list("period_start__hour", "charger__index_in_station", "charging_status_id", "seconds"))
+
+    def test_hours_follow_status_time(self):
+        changing, steady = Charger.objects.order_by("index_in_station")
+        Charger.objects.filter(id=changing.id).update(charging_status_id=3)
+        Charger.objects.filter(id=steady.id).update(charging_status_id=2)
+
+        # fetched a few minutes after the status changed
+        self.add_history(changing, 2, datetime(2022, 6, 1, 9, 30), datetime(2022, 6, 1, 9, 31))
+        self.add_history(changing, 3, datetime(2022, 6, 1, 10, 55), datetime(2022, 6, 1, 11, 2))
+
+        self.assertEqual(rollup_hours(datetime(2022, 6, 1, 12)), 3)
+        self.assertEqual(self.rollups(), {
+            (9, 1, 2, 1800), (10, 1, 2, 3300), (10, 1, 3, 300), (11, 1, 3, 3600),
+            (9, 2, 2, 3600), (10, 2, 2, 3600), (11, 2, 2, 3600)
+        })
+
+        self.assertEqual(rollup_hours(datetime(2022, 6, 1, 12)), 0)
+
+    def test_days_are_rolled_up_before_histories_expire(self):
+        changing, steady = Charger.objects.order_by("index_in_station")
+        Charger.objects.filter(id=changing.id).update(charging_status_id=3)
+        Charger.objects.filter(id=steady.id).update(charging_status_id=2)
+
+        self.add_history(changing, 2, datetime(2022, 6, 1, 9, 30), datetime(2022, 6, 1, 9, 31))
+        self.add_history(changing, 3, datetime(2022, 6, 2, 6, 0), datetime(2022, 6, 2, 6, 5))
+        self.add_history(changing, 3, datetime(2022, 6, 3, 10, 0), datetime(2022, 6, 3, 10, 5))
+
+        rollup_hours(datetime(2022, 6, 4))
+        self.assertEqual(rollup_days(datetime(2022, 6, 4)), 3)
+
+        expected_days = {
+            (1, 1, 2, 52200), (1, 2, 2, 54000),
+            (2, 1, 2, 21600), (2, 1, 3, 64800), (2, 2, 2, 86400),
+            (3, 1, 3, 86400), (3, 2, 2, 86400)
+        }
+        days = ChargerStatusRollup.objects.filter(period=ChargerStatusRollup.Period.DAY)
+
+        self.assertEqual(set(days.values_list("period_start__day", "charger__index_in_station", "charging_status_id", "seconds")), expected_days)
+
+        with self.settings(CHARGER_HISTORY_RETENTION_DAYS=1, CHARGER_STATUS_HOURLY_ROLLUP_RETENTION_DAYS=1):
+            expire_histories(datetime(2022, 6, 4, 12))
+
+        # the rows of the rolled up days older than the retention are gone, the day rollups are not
+        self.assertEqual(list(ChargerHistory.objects.values_list("charger_status_update_datetime", flat=True)), [datetime(2022, 6, 3, 10, 0)])
+        self.assertEqual(set(days.values_list("period_start__day", "charger__index_in_station", "charging_status_id", "seconds")), expected_days)
+        self.assertEqual(set(ChargerStatusRollup.objects.filter(period=ChargerStatusRollup.Period.HOUR).values_list("period_start__day", flat=True)), {3})
+        self.assertEqual(rollup_days(datetime(2022, 6, 4)), 0)
+
+    @override_settings(CHARGER_HISTORY_RETENTION_DAYS=1)
+    def test_histories_stay_until_their_day_is_rolled_up(self):
+        self.add_history(Charger.objects.first(), 2, datetime(2022, 6, 1, 9, 30), datetime(2022, 6, 1, 9, 31))
+
+        expire_histories(datetime(2022, 6, 10))
+
+        self.assertEqual(ChargerHistory.objects.count(), 1)
+
+
+class CheckpointsTest(TestCase):
+    job   = IngestionRun.Job.STATIONS_AND_CHARGERS
+    start = datetime(2022, 6, 5, 0, 0)
+
+    def run_at(self, minutes, status=IngestionRun.Status.FAILED, job=None):
+        return IngestionRun.objects.create(job=job or self.job, started_at=self.start + timedelta(minutes=minutes), status=status)
+
+    def commit(self, checkpoints, page_no):
+        return checkpoints.commit(Page(11, page_no, {"totalCount" : "30"}, [], 0, 0, 0), len)
+
+    def test_rerun_resumes_missing_pages(self):
+        self.assertEqual(self.commit(Checkpoints(self.job, self.run_at(0)), 1), 0)
+
+        checkpoints = Checkpoints(self.job, self.run_at(60))
+
+        self.assertEqual(checkpoints.completed(), {11 : (30, {1})})
+        self.assertIsNone(self.commit(checkpoints, 1))
+        self.assertEqual(self.commit(checkpoints, 2), 0)
+        self.assertEqual(Checkpoints(self.job, self.run_at(120)).completed(), {11 : (30, {1, 2})})
+
+    def test_new_cycle_after_success(self):
+        self.commit(Checkpoints(self.job, self.run_at(0, IngestionRun.Status.SUCCEEDED)), 1)
+
+        self.assertEqual(Checkpoints(self.job, self.run_at(60)).completed(), {})
+
+    def test_new_cycle_after_resume_window(self):
+        self.commit(Checkpoints(self.job, self.run_at(0)), 1)
+
+        self.assertEqual(Checkpoints(self.job, self.run_at(25 * 60)).completed(), {})
+
+    def test_status_runs_never_resume(self):
+        job = IngestionRun.Job.CHARGER_STATUS
+        self.commit(Checkpoints(job, self.run_at(0, job=job)), 1)
+
+        self.assertEqual(Checkpoints(job, self.run_at(1, job=job)).completed(), {})
+
+
+class SpatialIndexTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_lookups()
+        load_synthetic_places(stations_per_zcode=2000, cafes=6000)
+
+        if connection.vendor == "sqlite":
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+
+    def test_bounding_box_uses_grid_cell_index(self):
+        for model, index_name in ((Station, "stations_grid_cell"), (Cafe, "cafes_grid_cell")):
+            for box in MAP_WINDOWS:
+                with self.subTest(model=model.__name__, box=box):
+                    self.assertIn(index_name, model.objects.filter(bounding_box(*box)).explain())
+
+    def test_bounding_box_is_exact(self):
+        places = list(Station.objects.values_list("id", "latitude", "longitude"))
+
+        for SW_latitude, SW_longitude, NE_latitude, NE_longitude in MAP_WINDOWS:
+            inside = {
+                station_id for station_id, latitude, longitude in places
+                if SW_latitude <= latitude <= NE_latitude and SW_longitude <= longitude <= NE_longitude
+            }
+            self.assertEqual(set(Station.objects.filter(bounding_box(SW_latitude, SW_longitude, NE_latitude, NE_longitude)).values_list("id", flat=True)), inside)
+
+
+class TiledMapTest(TestCase):
+    def test_too_large_viewport(self):
+        response = self.client.get("/evs", {"SW_latitude" : -85, "SW_longitude" : -180, "NE_latitude" : 85, "NE_longitude" : 180, "mode" : "tiles"})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"MESSAGE" : "TOO_LARGE_RANGE"})
+
+    def test_invalid_stream(self):
+        response = self.client.get("/evs", {"SW_latitude" : "inf", "SW_longitude" : 126.9, "NE_latitude" : 37.6, "NE_longitude" : 127.1, "mode" : "stream"})
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_tiles(self):
+        create_lookups()
+        create_station("ST000001", 37.5, 127.0)
+
+        response = self.client.get("/evs", {"SW_latitude" : 37.49, "SW_longitude" : 126.99, "NE_latitude" : 37.51, "NE_longitude" : 127.01, "mode" : "tiles"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([station["id"] for station in response.json()["results"]], ["ST000001"])
+
+
+@override_settings(DATA_VERSION_DIR=VERSION_DIR)
+class NearestTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_lookups()
+        load_synthetic_places(stations_per_zcode=300, cafes=0)
+
+    def setUp(self):
+        versions.bump("evs")
+
+    def brute_force(self, index, latitude, longitude, k, mask=None):
+        distances = haversine_km(latitude, longitude, index.latitudes, index.longitudes)
+        if mask is not None:
+            distances[~mask] = float("inf")
+        return [index.ids[position] for position in distances.argsort(kind="stable")[:k] if distances[position] != float("inf")]
+
+    def test_matches_brute_force(self):
+        index        = StationIndex()
+        random_point = random.Random(1)
+        positions    = [(random_point.uniform(36.8, 38.3), random_point.uniform(126.3, 127.9)) for _ in range(50)]
+        positions   += [(0, 0), (30, 127), (-89.9, 179.9), (37.5, 127.0)]
+        masks        = [None, index.station_mask(charger_type_ids=["7"]), index.station_mask(outputs=["50"], usable=True)]
+
+        for latitude, longitude in positions:
+            for mask in masks:
+                with self.subTest(latitude=latitude, longitude=longitude):
+                    nearest = [index.ids[station] for _, station in index.nearest(latitude, longitude, 5, mask)]
+                    self.assertEqual(nearest, self.brute_force(index, latitude, longitude, 5, mask))
+
+    def test_rejects_positions_out_of_range(self):
+        index = StationIndex()
+
+        for latitude, longitude in ((float("inf"), 127), (37.5, float("nan")), (91, 127), (37.5, -181)):
+            with self.subTest(latitude=latitude, longitude=longitude), self.assertRaises(ValueError):
+                index.nearest(latitude, longitude, 1)
+
+    def test_views(self):
+        for path in ("/evs/nearest", "/evs/k-nearest"):
+            with self.subTest(path=path):
+                self.assertEqual(self.client.get(path, {"user_latitude" : 37.5}).json(), {"MESSAGE" : "KEY_ERROR"})
+                self.assertEqual(self.client.get(path, {"user_latitude" : "inf", "user_longitude" : 127}).json(), {"MESSAGE" : "VALUE_ERROR"})
+                self.assertEqual(self.client.get(path, {"user_latitude" : 37.5, "user_longitude" : "nan"}).json(), {"MESSAGE" : "VALUE_ERROR"})
+                self.assertEqual(self.client.get(path, {"user_latitude" : 0, "user_longitude" : 0}).status_code, 200)
+
+
+@override_settings(DATA_VERSION_DIR=VERSION_DIR)
+class IngestionTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_lookups()
+        create_regions()
+
+    def test_index_is_rebuilt_once_per_run(self):
+        dataset = SyntheticDataset(stations_per_zcode=20, chargers_per_station=2)
+        session = replay_session(dataset)
+
+        update_stations_and_chargers(session=session)
+        index = station_index()
+        dataset.advance(change_ratio=0.5)
+
+        with mock.patch("core.versions.bump", wraps=versions.bump) as bump:
+            UpdateChargerHistory(session=session)
+
+        bumped = [call.args[0] for call in bump.call_args_list]
+        self.assertEqual(bumped.count("evs"), 3)
+        self.assertEqual(bumped.count(NEAREST_VERSION), 1)
+        self.assertIsNot(station_index(), index)
+        self.assertIs(station_index(), station_index())
+
+    def test_rerun_after_failure_loses_no_changes(self):
+        dataset = SyntheticDataset(stations_per_zcode=20, chargers_per_station=2)
+        session = replay_session(dataset)
+
+        update_stations_and_chargers(session=session)
+        UpdateChargerHistory(session=session)
+        dataset.advance(change_ratio=0.5)
+
+        # the run fails after writing its first page
+        written = []
+
+        def write_one_page(items):
+            if written:
+                raise RuntimeError("write failed")
+            written.append(items)
+            return bulk_update_charger_history(items)
+
+        with mock.patch("evs.charger_history.bulk_update_charger_history", write_one_page), self.assertRaises(RuntimeError):
+            UpdateChargerHistory(session=session)
+
+        self.assertEqual(len(written), 1)
+
+        # the next window changes chargers of the page the failed run wrote as well
+        dataset.advance(change_ratio=0.5)
+        UpdateChargerHistory(session=session)
+
+        expected = {
+            (charger["statId"], int(charger["chgerId"])): (int(charger["stat"]), datetime.strptime(charger["statUpdDt"], "%Y%m%d%H%M%S"))
+            for chargers in dataset.chargers.values() for charger in chargers
+        }
+        latest   = {
+            (history.charger.station_id, history.charger.index_in_station): (history.charging_status_id, history.charger_status_update_datetime)
+            for history in ChargerHistory.objects.select_related("charger").order_by("id")
+        }
+        statuses = {(station_id, index_in_station): status for station_id, index_in_station, status in Charger.objects.values_list("station_id", "index_in_station", "charging_status_id")}
+
+        self.assertEqual(latest, expected)
+        self.assertEqual(statuses, {key: status for key, (status, _) in expected.items()})
+
+
+class EVMapTest(TestCase):
+    viewport = {"SW_latitude" : 37.4, "SW_longitude" : 126.9, "NE_latitude" : 37.6, "NE_longitude" : 127.1}
+
+    @classmethod
+    def setUpTestData(cls):
+        create_lookups()
+        for number, chargers in enumerate((2, 1, 3, 1, 2), 1):
+            create_station(f"ST{number:06d}", 37.5, 127.0 + number / 1000, chargers=chargers)
+        create_station("ST000009", 35.1, 129.0)
+        refresh_station_summaries(Station.objects.values_list("id", flat=True))
+
+    def test_pages_add_up_to_the_whole_result(self):
+        results = self.client.get("/evs", self.viewport).json()["results"]
+        pages   = []
+        cursor  = None
+
+        while True:
+            response = self.client.get("/evs", dict(self.viewport, limit=2, **({"cursor" : cursor} if cursor else {}))).json()
+            pages.append(response["results"])
+            cursor = response["next_cursor"]
+            if cursor is None:
+                break
+
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+        self.assertEqual([station for page in pages for station in page], results)
+
+    def test_invalid_pagination(self):
+        for query in ({"limit" : 2, "cursor" : "%%%"}, {"limit" : 2, "cursor" : "not a cursor"}, {"limit" : "two"}, {"limit" : 0}):
+            with self.subTest(query=query):
+                response = self.client.get("/evs", dict(self.viewport, **query))
+
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), {"MESSAGE" : "VALUE_ERROR"})
+
+    def test_columnar_body(self):
+        response = self.client.get("/evs", self.viewport, HTTP_ACCEPT=COLUMNAR_MEDIA_TYPE)
+        results  = self.client.get("/evs", self.viewport).json()["results"]
+        body     = response.json()
+        stations = body["stations"]
+
+        self.assertEqual(response["Content-Type"], COLUMNAR_MEDIA_TYPE)
+        self.assertEqual(set(body), {"lookups", "stations", "chargers"})
+        self.assertEqual(stations["id"], [station["id"] for station in results])
+        self.assertEqual([body["lookups"]["region"][region] for region in stations["region"]], [station["region"] for station in results])
+        self.assertEqual(stations["total_charger"], [station["chargers"][0]["count_of_status"]["total_charger"] for station in results])
+        self.assertEqual(
+            [(stations["id"][station], index_in_station) for station, index_in_station in zip(body["chargers"]["station"], body["chargers"]["index_in_station"])],
+            [(station["id"], charger["index_in_station"]) for station in results for charger in station["chargers"][0]["chargers_in_station"]]
+        )
+
+    def test_vary_accept(self):
+        for accept in (COLUMNAR_MEDIA_TYPE, "application/json"):
+            with self.subTest(accept=accept):
+                self.assertTrue(has_vary_header(self.client.get("/evs", self.viewport, HTTP_ACCEPT=accept), "Accept"))
+
+    def test_other_accept_values_get_json(self):
+        for accept in ("application/json", "*/*", "application/*", "text/html, application/xhtml+xml", ""):
+            with self.subTest(accept=accept):
+                response = self.client.get("/evs", self.viewport, HTTP_ACCEPT=accept)
+
+                self.assertEqual(response["Content-Type"], "application/json")
+                self.assertEqual(len(response.json()["results"]), 5)
+
+
+@override_settings(DATA_VERSION_DIR=VERSION_DIR)
+class StationSummaryTest(TestCase):
+    viewport = {"SW_latitude" : 37.4, "SW_longitude" : 126.9, "NE_latitude" : 37.6, "NE_longitude" : 127.1}
+
+    @classmethod
+    def setUpTestData(cls):
+        create_lookups()
+        create_station("ST000001", 37.5, 127.0, chargers=2)
+        create_station("ST000002", 37.5, 127.01, chargers=1)
+        refresh_station_summaries(["ST000001"])
+
+    def test_station_without_summary_is_counted(self):
+        results = self.client.get("/evs", self.viewport).json()["results"]
+        counts  = {station["id"]: station["chargers"][0]["count_of_status"]["not_confirmed_charger"] for station in results}
+
+        self.assertEqual(counts, {"ST000001" : 2, "ST000002" : 1})
+
+        stations = self.client.get("/evs", self.viewport, HTTP_ACCEPT=COLUMNAR_MEDIA_TYPE).json()["stations"]
+
+        self.assertEqual(dict(zip(stations["id"], stations["total_charger"])), {"ST000001" : 2, "ST000002" : 1})
+
+    def test_drift_is_reported_and_repaired(self):
+        StationSummary.objects.filter(station_id="ST000001").update(ready_charger=2)
+        stdout = io.StringIO()
+
+        with self.assertRaisesMessage(CommandError, "2 station summaries drifted"):
+            call_command("check_station_summaries", stdout=stdout)
+        self.assertIn("  ST000001\n  ST000002", stdout.getvalue())
+
+        call_command("check_station_summaries", repair=True, stdout=io.StringIO())
+
+        self.assertEqual(find_drift(["ST000001", "ST000002"]), [])
+        self.assertEqual(StationSummary.objects.get(station_id="ST000001").ready_charger, 0)
+        self.assertEqual(RegionSummary.objects.get(region_id=11).total_station, 2)
+
+
+@override_settings(MAP_CLUSTER_MIN_KM=20, MAP_CLUSTER_GRID=8)
+class ClusterTest(TestCase):
+    large_viewport = {"SW_latitude" : 37.0, "SW_longitude" : 126.5, "NE_latitude" : 38.0, "NE_longitude" : 127.5, "mode" : "clusters"}
+
+    @classmethod
+    def setUpTestData(cls):
+        create_lookups()
+        for number in range(12):
+            create_station(f"ST{number:06d}", 37.1 + number * 0.07, 126.6 + number * 0.07, chargers=number % 3 + 1)
+        create_station("ST000099", 35.1, 129.0)
+
+        Charger.objects.filter(index_in_station=2).update(output=50)
+        Charger.objects.filter(station_id__in=["ST000000", "ST000001"]).update(charging_status_id=2)
+        refresh_station_summaries(Station.objects.values_list("id", flat=True))
+
+    def clusters(self, **query):
+        response = self.client.get("/evs", dict(self.large_viewport, **query))
+        self.assertEqual(response.status_code, 200)
+        return response.json()["clusters"]
+
+    def test_clusters_add_up_the_viewport(self):
+        clusters = self.clusters()
+
+        self.assertGreater(len(clusters), 1)
+        self.assertEqual(sum(cluster["total_station"] for cluster in clusters), 12)
+        self.assertEqual(sum(cluster["total_charger"] for cluster in clusters), sum(number % 3 + 1 for number in range(12)))
+        self.assertEqual(sum(cluster["ready_charger"] for cluster in clusters), 3)
+        for cluster in clusters:
+            self.assertTrue(37.0 <= float(cluster["latitude"]) <= 38.0 and 126.5 <= float(cluster["longitude"]) <= 127.5)
+
+    def test_filters(self):
+        quick = self.clusters(outputs=50)
+
+        self.assertEqual(sum(cluster["total_station"] for cluster in quick), len([number for number in range(12) if number % 3]))
+        self.assertEqual(sum(cluster["total_station"] for cluster in self.clusters(outputs=50, charger_type_ids="4")), len([number for number in range(12) if number % 3]))
+        self.assertEqual(self.clusters(charger_type_ids="4"), [])
+        self.assertEqual(sum(cluster["total_station"] for cluster in self.clusters(usable="YES")), 2)
+
+    def test_small_viewport_gets_stations(self):
+        response = self.client.get("/evs", {"SW_latitude" : 37.09, "SW_longitude" : 126.59, "NE_latitude" : 37.11, "NE_longitude" : 126.61, "mode" : "clusters"}).json()
+
+        self.assertNotIn("clusters", response)
+        self.assertEqual([station["id"] for station in response["results"]], ["ST000000"])
+
+
+@override_settings(STATION_CAFE_RADII_M=(100, 300, 500))
+class StationsWithCafesTest(TestCase):
+    viewport = {"SW_latitude" : 37.4, "SW_longitude" : 126.9, "NE_latitude" : 37.6, "NE_longitude" : 127.1}
+
+    @classmethod
+    def setUpTestData(cls):
+        create_lookups()
+
+        # (station, longitude, ready, latitude offsets of its cafes)
+        places = [("ST000001", 127.0, True, (0.0005, 0.001, 0.002)), ("ST000002", 127.02, True, (0.0003,)), ("ST000003", 127.04, False, (0.0001, 0.0002))]
+        cafes  = []
+        for station_id, longitude, ready, offsets in places:
+            create_station(station_id, 37.5, longitude)
+            if ready:
+                Charger.objects.filter(station_id=station_id).update(charging_status_id=2)
+
+            for offset in offsets:
+                cafes.append(Cafe(
+                    land_lot_number_address = f"lot {station_id} {offset}",
+                    road_name_address       = f"road {station_id} {offset}",
+                    name                    = f"cafe {station_id} {offset}",
+                    latitude                = 37.5 + offset,
+                    longitude               = longitude,
+                    grid_cell               = grid_cell(37.5 + offset, longitude),
+                    category_id             = 1,
+                    region_id               = 11
+                ))
+        create_station("ST000009", 35.1, 129.0)
+        Charger.objects.filter(station_id="ST000009").update(charging_status_id=2)
+        Cafe.objects.bulk_create(cafes)
+
+        refresh_station_summaries(Station.objects.values_list("id", flat=True))
+        refresh_station_cafes(Station.objects.values_list("id", flat=True))
+
+    def test_ranked_by_nearby_cafes(self):
+        results = self.client.get("/evs/with-cafes", self.viewport).json()["results"]
+
+        self.assertEqual([(station["id"], station["nearby_cafes"], station["ready_charger"]) for station in results], [("ST000001", 3, 1), ("ST000002", 1, 1)])
+        self.assertEqual([cafe["m"] for cafe in results[0]["cafes"]], sorted(cafe["m"] for cafe in results[0]["cafes"]))
+        self.assertEqual(results[0]["cafes"][0]["name"], "cafe ST000001 0.0005")
+
+    def test_radius_and_limit(self):
+        results = self.client.get("/evs/with-cafes", dict(self.viewport, radius=100)).json()["results"]
+
+        self.assertEqual([(station["id"], station["nearby_cafes"]) for station in results], [("ST000002", 1), ("ST000001", 1)])
+        self.assertEqual(len(self.client.get("/evs/with-cafes", dict(self.viewport, limit=1)).json()["results"]), 1)
+
+    def test_invalid_parameters(self):
+        for query in ({"radius" : 200}, {"radius" : "far"}, {"limit" : 0}):
+            with self.subTest(query=query):
+                self.assertEqual(self.client.get("/evs/with-cafes", dict(self.viewport, **query)).json(), {"MESSAGE" : "VALUE_ERROR"})
+
+        self.assertEqual(self.client.get("/evs/with-cafes", {"SW_latitude" : 37.4}).json(), {"MESSAGE" : "KEY_ERROR"})
+
+
+class EVAdminTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_lookups()
+        Region.objects.create(zcode=26, city="부산")
+        create_station("ST000001", 37.5, 127.0, chargers=2)
+        create_station("ST000002", 37.5, 127.01, chargers=1)
+        Station.objects.filter(id="ST000002").update(region_id=26)
+        refresh_station_summaries(["ST000001", "ST000002"])
+
+    def snapshot(self):
+        run = IngestionRun.objects.create(job=IngestionRun.Job.CHARGER_STATUS, started_at=datetime.now())
+        snapshot_region_summaries(run)
+        return run.id
+
+    def test_counters_and_history(self):
+        first = self.snapshot()
+        Charger.objects.filter(station_id="ST000001", index_in_station=1).update(charging_status_id=2)
+        refresh_station_summaries(["ST000001"])
+        second = self.snapshot()
+
+        results = {result["chargers"]["region"]: result["chargers"] for result in self.client.get("/evs/admin", {"history" : 5}).json()["results"]}
+
+        self.assertEqual(results["서울"]["count_of_status"]["total_station"], 1)
+        self.assertEqual(results["서울"]["count_of_status"]["ready_charger"], 1)
+        self.assertEqual(results["부산"]["count_of_status"]["total_charger"], 1)
+        self.assertEqual([(snapshot["run"], snapshot["count_of_status"]["ready_charger"]) for snapshot in results["서울"]["history"]], [(second, 1), (first, 0)])
+        self.assertEqual([snapshot["run"] for snapshot in results["부산"]["history"]], [second, first])
+
+    def test_regions_filter_and_no_history(self):
+        self.snapshot()
+
+        results = self.client.get("/evs/admin", {"regions" : "부산"}).json()["results"]
+
+        self.assertEqual([(result["chargers"]["region"], result["chargers"]["history"]) for result in results], [("부산", [])])
+
+    def test_history_is_capped(self):
+        taken_at = datetime(2022, 6, 1)
+        RegionSnapshot.objects.bulk_create([
+            RegionSnapshot(region_id=region_id, taken_at=taken_at + timedelta(minutes=number))
+            for number in range(AdminHistory.MAX_SNAPSHOTS.value + 1) for region_id in (11, 26)
+        ])
+
+        results = self.client.get("/evs/admin", {"history" : AdminHistory.MAX_SNAPSHOTS.value * 10}).json()["results"]
+
+        self.assertEqual([len(result["chargers"]["history"]) for result in results], [AdminHistory.MAX_SNAPSHOTS.value] * 2)
+        self.assertEqual(results[0]["chargers"]["history"][-1]["taken_at"], (taken_at + timedelta(minutes=1)).isoformat())
+
+    @override_settings(REGION_SNAPSHOT_RETENTION_DAYS=90)
+    def test_old_snapshots_expire(self):
+        RegionSnapshot.objects.create(region_id=11, taken_at=datetime.now() - timedelta(days=91))
+        run = self.snapshot()
+
+        self.assertEqual(set(RegionSnapshot.objects.values_list("run_id", "region_id")), {(run, 11), (run, 26)})
+
+    def test_invalid_history(self):
+        response = self.client.get("/evs/admin", {"history" : "all"})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"MESSAGE" : "VALUE_ERROR"})
+
+
+class IngestionRunViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        started_at = datetime(2022, 6, 1)
+        for number in range(3):
+            IngestionRun.objects.create(job=IngestionRun.Job.CHARGER_STATUS, started_at=started_at + timedelta(minutes=10 * number), status=IngestionRun.Status.SUCCEEDED, rows=number)
+        IngestionRun.objects.create(job=IngestionRun.Job.STATIONS_AND_CHARGERS, started_at=started_at, status=IngestionRun.Status.FAILED, error="RuntimeError()")
+
+    def test_newest_runs_first(self):
+        results = self.client.get("/evs/ingestion-runs", {"job" : "charger_status", "limit" : 2}).json()["results"]
+
+        self.assertEqual([(run["job"], run["rows"]) for run in results], [("charger_status", 2), ("charger_status", 1)])
+        self.assertEqual(len(self.client.get("/evs/ingestion-runs").json()["results"]), 4)
+
+    def test_invalid_parameters(self):
+        for query in ({"limit" : "ten"}, {"limit" : 0}, {"limit" : -1}, {"job" : "unknown"}):
+            with self.subTest(query=query):
+                response = self.client.get("/evs/ingestion-runs", query)
+
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), {"MESSAGE" : "VALUE_ERROR"})
+
+
+class ChangesTest(TestCase):
+    viewport = {"SW_latitude" : 37.4, "SW_longitude" : 126.9, "NE_latitude" : 37.6, "NE_longitude" : 127.1}
+
+    @classmethod
+    def setUpTestData(cls):
+        create_lookups()
+        create_station("ST000001", 37.5, 127.0, chargers=2)
+        create_station("ST000002", 35.1, 129.0)
+
+    def test_token_only_without_since(self):
+        response = self.client.get("/evs/changes", self.viewport).json()
+
+        self.assertEqual((response["changes"], response["stations"]), ([], []))
+        self.assertTrue(response["token"])
+
+    def test_changes_in_viewport(self):
+        token = self.client.get("/evs/changes", self.viewport).json()["token"]
+
+        bulk_update_charger_history([status_record("ST000001", "02", stat="3"), status_record("ST000002", "01", stat="3")])
+        response = self.client.get("/evs/changes", dict(self.viewport, since=token)).json()
+
+        self.assertIn((2, "3"), [(change["index_in_station"], change["charging_status"]) for change in response["changes"]])
+        self.assertEqual({change["station_id"] for change in response["changes"]}, {"ST000001"})
+        self.assertEqual([station["id"] for station in response["stations"]], ["ST000001"])
+        self.assertEqual(response["stations"][0]["count_of_status"]["charging_charger"], 1)
+
+    @override_settings(DELTA_SYNC_MAX_CHANGES=1)
+    def test_resync_when_too_many_changes(self):
+        token    = self.client.get("/evs/changes", self.viewport).json()["token"]
+        response = self.client.get("/evs/changes", dict(self.viewport, since=token))
+
+        self.assertEqual(response.status_code, 410)
+        self.assertEqual(response.json(), {"MESSAGE" : "RESYNC_REQUIRED"})
+
+    def test_invalid_token(self):
+        response = self.client.get("/evs/changes", dict(self.viewport, since="not a token"))
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get("/evs/changes", {"SW_latitude" : 37.4}).json(), {"MESSAGE" : "KEY_ERROR"})
+
+
+class LiveTest(SimpleTestCase):
+    def request(self, query_string):
+        messages = []
+
+        async def receive():
+            return {"type" : "http.disconnect"}
+
+        async def send(message):
+            messages.append(message)
+
+        scope = {"type" : "http", "path" : "/evs/live", "headers" : [], "query_string" : query_string.encode()}
+        asyncio.run(live_application(scope, receive, send))
+        return messages[0]["status"], json.loads(messages[1]["body"])
+
+    def test_invalid_viewports(self):
+        self.assertEqual(self.request("SW_latitude=37.4&SW_longitude=126.9"), (400, {"MESSAGE" : "KEY_ERROR"}))
+
+        for query_string in (
+            "SW_latitude=inf&SW_longitude=126.9&NE_latitude=37.6&NE_longitude=127.1",
+            "SW_latitude=37.4&SW_longitude=nan&NE_latitude=37.6&NE_longitude=127.1",
+            "SW_latitude=-85&SW_longitude=-180&NE_latitude=85&NE_longitude=180"
+        ):
+            with self.subTest(query_string=query_string):
+                self.assertEqual(self.request(query_string), (400, {"MESSAGE" : "VALUE_ERROR"}))
+
+
+@override_settings(STATION_CAFE_RADII_M=(100, 300, 500))
+class ProximityTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_lookups()
+        load_synthetic_places(stations_per_zcode=200, cafes=0)
+
+        random_point = random.Random(2)
+        stations     = list(Station.objects.values_list("latitude", "longitude"))
+        cafes        = []
+        for number in range(2000):
+            latitude, longitude = random_point.choice(stations)
+            latitude            = round(float(latitude) + random_point.uniform(-0.006, 0.006), 10)
+            longitude           = round(float(longitude) + random_point.uniform(-0.006, 0.006), 10)
+
+            cafes.append(Cafe(
+                land_lot_number_address = f"lot {number}",
+                road_name_address       = f"road {number}",
+                name                    = f"cafe {number}",
+                latitude                = latitude,
+                longitude               = longitude,
+                grid_cell               = grid_cell(latitude, longitude),
+                category_id             = 1,
+                region_id               = 11
+            ))
+        Cafe.objects.bulk_create(cafes)
+
+    def links(self):
+        return set(StationCafe.objects.values_list("station_id", "cafe_id", "distance"))
+
+    def brute_force(self):
+        cafes = list(Cafe.objects.values_list("id", "latitude", "longitude"))
+        cafe_latitudes  = [float(latitude) for _, latitude, _ in cafes]
+        cafe_longitudes = [float(longitude) for _, _, longitude in cafes]
+        links = set()
+
+        for station_id, latitude, longitude in Station.objects.values_list("id", "latitude", "longitude"):
+            distances = haversine_km(float(latitude), float(longitude), cafe_latitudes, cafe_longitudes) * 1000
+            links |= {(station_id, cafes[index][0], round(distance)) for index, distance in enumerate(distances) if distance <= 500}
+
+        return links
+
+    def test_links_match_brute_force_from_both_sides(self):
+        expected = self.brute_force()
+        self.assertTrue(expected)
+
+        refresh_station_cafes(Station.objects.values_list("id", flat=True))
+        self.assertEqual(self.links(), expected)
+
+        StationCafe.objects.all().delete()
+        refresh_cafe_stations(Cafe.objects.values_list("id", flat=True))
+        self.assertEqual(self.links(), expected)
@@ -1,8 +1,12 @@
 from django.urls import path
-from evs.views   import EVMapView, SearchNearestEVView, EVAdminView
+from evs.views   import EVMapView, SearchNearestEVView, KNearestEVView, EVChangesView, StationsWithCafesView, EVAdminView, IngestionRunView
 
 urlpatterns = [
     path("", EVMapView.as_view()),
     path("/nearest", SearchNearestEVView.as_view()),
-    path("/admin", EVAdminView.as_view())
+    path("/k-nearest", KNearestEVView.as_view()),
+    path("/changes", EVChangesView.as_view()),
+    path("/with-cafes", StationsWithCafesView.as_view()),
+    path("/admin", EVAdminView.as_view()),
+    path("/ingestion-runs", IngestionRunView.as_view())
 ]
\ No newline at end of file
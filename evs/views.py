@@ -1,15 +1,24 @@
-from enum import Enum
-
-from haversine import haversine
-
-from django.http            import JsonResponse
-from django.views           import View
-from django.core.exceptions import ValidationError
-from django.db.models       import Q, Count, Case, When, Prefetch
-
-from evs.models       import Station, Charger
-from commons.models   import Region
-from core.validations import validate_range, validate_search_position
+from enum        import Enum
+from collections import defaultdict
+
+from django.conf                import settings
+from django.http                import JsonResponse, StreamingHttpResponse
+from django.views               import View
+from django.core.exceptions     import ValidationError
+from django.db.models           import Q, Count, Sum, Min, Case, When, Prefetch, FloatField
+from django.db.models.functions import Coalesce, Cast
+from django.utils.cache         import patch_vary_headers
+
+from evs.models       import Station, Charger, StationSummary, StationCafe, RegionSummary, RegionSnapshot, IngestionRun
+from evs.telemetry    import is_near_deadline
+from evs.nearest      import station_index
+from evs.changes      import sync_token, token_time, changed_chargers, station_statuses
+from evs.summaries    import fill_missing_counts
+from core             import versions
+from core.geo         import bounding_box, is_large_viewport, cluster_size, clusters
+from core.tiles       import TileCache, tiled_response
+from core.utils       import encode_items, encode_cursor, decode_cursor, accepts_exactly, Lookup
+from core.validations import validate_range
 
 
 class ChargingStatus(Enum):
@@ -26,16 +35,73 @@ class Usable(Enum):
     NO  = "NO"
     
 
-class Length(Enum):
-    # 1 degree of longitude = 111.19 km
-    # 1 degree of latitude in seoul (longitude: 37 degree) = 88.80 km
-    LATITUDE_100m  = 0.0008993614533681087 
-    LONGITUDE_100m = 0.0011261261261261261
+class KNearest(Enum):
+    MAX_K = 50
+
+
+class MapMode(Enum):
+    TILES    = "tiles"
+    CLUSTERS = "clusters"
+    STREAM   = "stream"
+
+
+# Accept header value of the columnar map payload (see EVMapView.columnar_results)
+COLUMNAR_MEDIA_TYPE = "application/vnd.maze.columnar+json"
+
+STATION_COLUMNS = [
+    "id",
+    "name",
+    "detail_location",
+    "road_name_address",
+    "hours_of_operation",
+    "business_id",
+    "business_name",
+    "business_manamgement_name",
+    "business_call",
+    "parking_free_yes_or_no",
+    "parking_detail",
+    "limit_yes_or_no",
+    "limit_detail",
+    "delete_yes_or_no",
+    "delete_detail"
+]
+
+COUNTER_COLUMNS = [
+    "total_charger",
+    "communication_abnomal_charger",
+    "ready_charger",
+    "charging_charger",
+    "suspending_charger",
+    "inspecting_charger",
+    "not_confirmed_charger",
+    "quick_charger",
+    "slow_charger",
+    "quick_charger_of_ready",
+    "slow_charger_of_ready"
+]
+
+
+class NearbyCafes(Enum):
+    STATIONS          = 20
+    CAFES_PER_STATION = 5
+
+
+class AdminHistory(Enum):
+    MAX_SNAPSHOTS = 1000
+
+
+class RunHistory(Enum):
+    DEFAULT_LIMIT = 100
+    MAX_LIMIT     = 1000
+
 
+class Page(Enum):
+    MAX_LIMIT    = 500
+    STREAM_CHUNK = 200
 
-class Category(Enum):
-    STATION = 1
-    CAFE    = 2
+
+# map tiles served by this process, see core.tiles
+tile_cache = TileCache(settings.MAP_TILE_CACHE_BYTES)
 
 
 class EVMapView(View):
@@ -51,184 +117,533 @@ class EVMapView(View):
 
             # validate_range(NE_latitude, SW_latitude, NE_longitude, SW_longitude)  # 프론트 이슈(첫 렌더시 range 벗어남)
 
-            rectangle_boundary = (
-                    Q(latitude__range  = (SW_latitude, NE_latitude)) &
-                    Q(longitude__range = (SW_longitude, NE_longitude))
+            boundary = (SW_latitude, SW_longitude, NE_latitude, NE_longitude)
+
+            if request.GET.get("mode") == MapMode.CLUSTERS.value and is_large_viewport(*boundary):
+                return JsonResponse({"clusters" : self.station_clusters(boundary, outputs, charger_type_ids, usable)}, status=200)
+
+            if request.GET.get("mode") == MapMode.TILES.value:
+                return tiled_response(
+                    tile_cache,
+                    versions.current("evs"),
+                    boundary,
+                    ("evs", tuple(outputs), charger_type_ids, usable),
+                    lambda tile_boundary: self.station_results(tile_boundary, outputs, charger_type_ids, usable, half_open=True)
                 )
-                
-            q1 = Q()
-            q2 = Q()
-
-            if outputs:
-                q1 |= Q(charger__output__in=outputs) 
-
-            if charger_type_ids:
-                q1 |= Q(charger__charger_type__code__in=charger_type_ids)
-
-            if usable == Usable.YES.value:
-                q2 = Q(ready_charger__gte=1)
-
-            near_stations = Station.objects\
-                .select_related("category", "region")\
-                .prefetch_related(
-                        Prefetch("charger_set", queryset=Charger.objects.all().select_related("charger_type", "station", "charging_status"))
-                    )\
-                .filter(rectangle_boundary)\
-                .filter(q1)\
-                .annotate(ready_charger=Count("charger__charging_status", Case(When(charger__charging_status=ChargingStatus.READY.value, then=True))))\
-                .filter(q2)
-
-            target_stations = Station.objects\
-                .filter(rectangle_boundary)\
-                .annotate(total_charger=Count("charger"))\
-                .annotate(communication_abnomal_charger=Count("charger__charging_status", Case(When(charger__charging_status=ChargingStatus.COMMUNICATION_ABNOMAL.value, then=True))))\
-                .annotate(ready_charger=Count("charger__charging_status", Case(When(charger__charging_status=ChargingStatus.READY.value, then=True))))\
-                .annotate(charging_charger=Count("charger__charging_status", Case(When(charger__charging_status=ChargingStatus.CHARGING.value, then=True))))\
-                .annotate(suspending_charger=Count("charger__charging_status", Case(When(charger__charging_status=ChargingStatus.SUSPENDING.value, then=True))))\
-                .annotate(inspecting_charger=Count("charger__charging_status", Case(When(charger__charging_status=ChargingStatus.INSPECTING.value, then=True))))\
-                .annotate(not_confirmed_charger=Count("charger__charging_status", Case(When(charger__charging_status=ChargingStatus.NOT_CONFIRMED.value, then=True))))\
-                .annotate(quick_charger=Count("charger", Case(When(charger__output__gte=30, then=True))))\
-                .annotate(slow_charger=Count("charger", Case(When(charger__output__lt=30, then=True))))\
-                .annotate(quick_charger_of_ready=Count(Case(When(charger__output__gte=30, charger__charging_status=ChargingStatus.READY.value, then=True))))\
-                .annotate(slow_charger_of_ready=Count(Case(When(charger__output__lt=30, charger__charging_status=ChargingStatus.READY.value, then=True))))\
-                .filter(q2)
 
-            results = [{
-                "id"                        : station.id,
-                "name"                      : station.name,
-                "detail_location"           : station.detail_location,
-                "road_name_address"         : station.road_name_address,
-                "latitude"                  : station.latitude,
-                "longitude"                 : station.longitude,
-                "hours_of_operation"        : station.hours_of_operation,
-                "business_id"               : station.business_id,
-                "business_name"             : station.business_name,
-                "business_manamgement_name" : station.business_manamgement_name,
-                "business_call"             : station.business_call,
-                "parking_free_yes_or_no"    : station.parking_free_yes_or_no,
-                "parking_detail"            : station.parking_detail,
-                "limit_yes_or_no"           : station.limit_yes_or_no,
-                "limit_detail"              : station.limit_detail,
-                "delete_yes_or_no"          : station.delete_yes_or_no,
-                "delete_detail"             : station.delete_detail,
-                "category"                  : station.category.type,
-                "region"                    : station.region.city,
-                "chargers"                  : [{
-                    "usable_of_all"       : Usable.YES.value if target_station.ready_charger else Usable.NO.value,
-                    "usable_by_filtering" : Usable.YES.value if station.ready_charger else Usable.NO.value,
-                    "count_of_status"     : {
-                        "total_charger"                 : target_station.total_charger, 
-                        "communication_abnomal_charger" : target_station.communication_abnomal_charger,
-                        "ready_charger"                 : target_station.ready_charger,
-                        "charging_charger"              : target_station.charging_charger,
-                        "suspending_charger"            : target_station.suspending_charger,
-                        "inspecting_charger"            : target_station.inspecting_charger,
-                        "not_confirmed_charger"         : target_station.not_confirmed_charger,
-                    },
-                    "quick_and_slow" : {
-                        "of_total_charger" : {
-                            "quick" : target_station.quick_charger,
-                            "slow"  : target_station.slow_charger
-                        },
-                        "of_ready_charger" : {
-                            "quick" : target_station.quick_charger_of_ready,
-                            "slow"  : target_station.slow_charger_of_ready
-                        }
-                    },
-                    "chargers_in_station" : [{
-                        "id"               : charger.id,
-                        "index_in_station" : charger.index_in_station,
-                        "output"           : charger.output,
-                        "method"           : charger.method,
-                        "charger_type"     : charger.charger_type.explanation,
-                        "charging_status"  : charger.charging_status.explanation
-                    } for charger in station.charger_set.all()]
-                } for target_station in target_stations if target_station == station]
-            } for station in near_stations]
+            if request.GET.get("mode") == MapMode.STREAM.value:
+                return StreamingHttpResponse(self.stream_results(boundary, outputs, charger_type_ids, usable), content_type="application/json")
 
-            return JsonResponse({"results" : results}, status=200)
+            if "limit" in request.GET:
+                limit  = min(int(request.GET["limit"]), Page.MAX_LIMIT.value)
+                cursor = request.GET.get("cursor", None)
+                after  = decode_cursor(cursor) if cursor else None
+
+                if limit < 1:
+                    raise ValueError
+
+                results = self.station_results(boundary, outputs, charger_type_ids, usable, after=after, limit=limit)
+                next_cursor = encode_cursor(results[-1]["id"]) if len(results) == limit else None
+
+                return JsonResponse({"results" : results, "next_cursor" : next_cursor}, status=200)
+
+            if accepts_exactly(request, COLUMNAR_MEDIA_TYPE):
+                response = JsonResponse(self.columnar_results(boundary, outputs, charger_type_ids, usable), status=200, content_type=COLUMNAR_MEDIA_TYPE)
+            else:
+                response = JsonResponse({"results" : self.station_results(boundary, outputs, charger_type_ids, usable)}, status=200)
+
+            patch_vary_headers(response, ["Accept"])
+            return response
 
         except KeyError:
             return JsonResponse({"MESSAGE" : "KEY_ERROR"}, status=400)
+
+        except ValueError:
+            return JsonResponse({"MESSAGE" : "VALUE_ERROR"}, status=400)
         
         except ValidationError as error:
             return JsonResponse({"MESSAGE": error.message}, status=error.code)
 
+    def stream_results(self, boundary, outputs, charger_type_ids, usable):
+        # the first chunk is read before the response starts, so bad parameters still get a 400
+        results = self.station_results(boundary, outputs, charger_type_ids, usable, limit=Page.STREAM_CHUNK.value)
+        return self.stream_chunks(results, boundary, outputs, charger_type_ids, usable)
+
+    def stream_chunks(self, results, boundary, outputs, charger_type_ids, usable):
+        # pages through the stations by id, so only one chunk is held in memory at a time
+        yield b'{"results": ['
+
+        after = None
+        while True:
+            if results:
+                yield (b", " if after is not None else b"") + encode_items(results)
+
+            if len(results) < Page.STREAM_CHUNK.value:
+                break
+
+            after   = results[-1]["id"]
+            results = self.station_results(boundary, outputs, charger_type_ids, usable, after=after, limit=Page.STREAM_CHUNK.value)
+
+        yield b"]}"
+
+    def filters(self, outputs, charger_type_ids, usable):
+        q1 = Q()
+        q2 = Q()
+
+        if outputs:
+            q1 |= Q(charger__output__in=outputs) 
+
+        if charger_type_ids:
+            q1 |= Q(charger__charger_type__code__in=charger_type_ids)
+
+        if usable == Usable.YES.value:
+            q2 = Q(ready_charger__gte=1)
+
+        return q1, q2
+
+    def station_results(self, boundary, outputs, charger_type_ids, usable, half_open=False, after=None, limit=None):
+        q1, q2 = self.filters(outputs, charger_type_ids, usable)
+
+        near_stations = Station.objects\
+            .select_related("category", "region")\
+            .prefetch_related(
+                    Prefetch("charger_set", queryset=Charger.objects.all().select_related("charger_type", "station", "charging_status"))
+                )\
+            .filter(bounding_box(*boundary, half_open=half_open))\
+            .filter(q1)\
+            .annotate(ready_charger=Count("charger__charging_status", Case(When(charger__charging_status=ChargingStatus.READY.value, then=True))))\
+            .filter(q2)\
+            .order_by("id")
+
+        # counters precomputed by the ingestion jobs, looked up by station id below
+        charger_counts = StationSummary.objects\
+            .filter(bounding_box(*boundary, prefix="station__", half_open=half_open))\
+            .filter(q2)\
+            .values()
+
+        # keyset pagination by station id
+        if after is not None:
+            near_stations = near_stations.filter(id__gt=after)
+
+        if limit is not None:
+            near_stations  = near_stations[:limit]
+            charger_counts = charger_counts.filter(station_id__in=[station.id for station in near_stations])
+
+        counts_by_station = fill_missing_counts(
+            {counts["station_id"]: counts for counts in charger_counts},
+            [station.id for station in near_stations]
+        )
+
+        results = [{
+            "id"                        : station.id,
+            "name"                      : station.name,
+            "detail_location"           : station.detail_location,
+            "road_name_address"         : station.road_name_address,
+            "latitude"                  : station.latitude,
+            "longitude"                 : station.longitude,
+            "hours_of_operation"        : station.hours_of_operation,
+            "business_id"               : station.business_id,
+            "business_name"             : station.business_name,
+            "business_manamgement_name" : station.business_manamgement_name,
+            "business_call"             : station.business_call,
+            "parking_free_yes_or_no"    : station.parking_free_yes_or_no,
+            "parking_detail"            : station.parking_detail,
+            "limit_yes_or_no"           : station.limit_yes_or_no,
+            "limit_detail"              : station.limit_detail,
+            "delete_yes_or_no"          : station.delete_yes_or_no,
+            "delete_detail"             : station.delete_detail,
+            "category"                  : station.category.type,
+            "region"                    : station.region.city,
+            "chargers"                  : [{
+                "usable_of_all"       : Usable.YES.value if counts["ready_charger"] else Usable.NO.value,
+                "usable_by_filtering" : Usable.YES.value if station.ready_charger else Usable.NO.value,
+                "count_of_status"     : {
+                    "total_charger"                 : counts["total_charger"], 
+                    "communication_abnomal_charger" : counts["communication_abnomal_charger"],
+                    "ready_charger"                 : counts["ready_charger"],
+                    "charging_charger"              : counts["charging_charger"],
+                    "suspending_charger"            : counts["suspending_charger"],
+                    "inspecting_charger"            : counts["inspecting_charger"],
+                    "not_confirmed_charger"         : counts["not_confirmed_charger"],
+                },
+                "quick_and_slow" : {
+                    "of_total_charger" : {
+                        "quick" : counts["quick_charger"],
+                        "slow"  : counts["slow_charger"]
+                    },
+                    "of_ready_charger" : {
+                        "quick" : counts["quick_charger_of_ready"],
+                        "slow"  : counts["slow_charger_of_ready"]
+                    }
+                },
+                "chargers_in_station" : [{
+                    "id"               : charger.id,
+                    "index_in_station" : charger.index_in_station,
+                    "output"           : charger.output,
+                    "method"           : charger.method,
+                    "charger_type"     : charger.charger_type.explanation,
+                    "charging_status"  : charger.charging_status.explanation
+                } for charger in station.charger_set.all()]
+            } for counts in [counts_by_station[station.id]]]
+        } for station in near_stations]
+
+        return results
+
+    def columnar_results(self, boundary, outputs, charger_type_ids, usable):
+        # same content as station_results as parallel arrays; repeated strings become indexes into `lookups`
+        q1, q2 = self.filters(outputs, charger_type_ids, usable)
+
+        stations = Station.objects\
+            .filter(bounding_box(*boundary))\
+            .filter(q1)\
+            .annotate(ready_charger=Count("charger__charging_status", Case(When(charger__charging_status=ChargingStatus.READY.value, then=True))))\
+            .filter(q2)\
+            .annotate(latitude_value=Cast("latitude", FloatField()), longitude_value=Cast("longitude", FloatField()))\
+            .order_by("id")\
+            .values_list(*STATION_COLUMNS, "latitude_value", "longitude_value", "category__type", "region__city", "ready_charger")
+
+        charger_counts = StationSummary.objects\
+            .filter(bounding_box(*boundary, prefix="station__"))\
+            .values_list("station_id", *COUNTER_COLUMNS)
+
+        chargers = Charger.objects\
+            .filter(bounding_box(*boundary, prefix="station__"))\
+            .order_by("station_id", "index_in_station")\
+            .values_list("station_id", "id", "index_in_station", "output", "method", "charger_type__explanation", "charging_status__explanation")
+
+        lookups = {name: Lookup() for name in ("category", "region", "charger_type", "charging_status")}
+
+        station_columns = {name: [] for name in (*STATION_COLUMNS, "latitude", "longitude", "category", "region", "usable_by_filtering")}
+        position        = {}
+
+        for *values, latitude, longitude, category, region, ready_charger in stations:
+            position[values[0]] = len(position)
+
+            for name, value in zip(STATION_COLUMNS, values):
+                station_columns[name].append(value)
+            station_columns["latitude"].append(latitude)
+            station_columns["longitude"].append(longitude)
+            station_columns["category"].append(lookups["category"].index(category))
+            station_columns["region"].append(lookups["region"].index(region))
+            station_columns["usable_by_filtering"].append(ready_charger > 0)
+
+        counts_by_station = fill_missing_counts(
+            {station_id: dict(zip(COUNTER_COLUMNS, counters)) for station_id, *counters in charger_counts if station_id in position},
+            position
+        )
+
+        counter_columns = {name: [None] * len(position) for name in COUNTER_COLUMNS}
+        for station_id, counts in counts_by_station.items():
+            for name in COUNTER_COLUMNS:
+                counter_columns[name][position[station_id]] = counts[name]
+
+        charger_columns = {name: [] for name in ("station", "id", "index_in_station", "output", "method", "charger_type", "charging_status")}
+        for station_id, charger_id, index_in_station, output, method, charger_type, charging_status in chargers:
+            if station_id in position:
+                charger_columns["station"].append(position[station_id])
+                charger_columns["id"].append(charger_id)
+                charger_columns["index_in_station"].append(index_in_station)
+                charger_columns["output"].append(output)
+                charger_columns["method"].append(method)
+                charger_columns["charger_type"].append(lookups["charger_type"].index(charger_type))
+                charger_columns["charging_status"].append(lookups["charging_status"].index(charging_status))
+
+        return {
+            "lookups"  : {name: lookup.values for name, lookup in lookups.items()},
+            "stations" : {**station_columns, **counter_columns},
+            "chargers" : charger_columns
+        }
+
+    def station_clusters(self, boundary, outputs, charger_type_ids, usable):
+        q1, _ = self.filters(outputs, charger_type_ids, usable)
+        q     = Q()
+
+        if usable == Usable.YES.value:
+            q &= Q(summary__ready_charger__gte=1)
+
+        stations = Station.objects.filter(bounding_box(*boundary)).filter(q)
+
+        # a station matching through several chargers is still one station, joining chargers here would repeat it
+        if q1:
+            stations = stations.filter(id__in=Station.objects.filter(bounding_box(*boundary)).filter(q1).values("id"))
+
+        station_clusters = clusters(
+            stations,
+            cluster_size(*boundary),
+            total_charger = Coalesce(Sum("summary__total_charger"), 0),
+            ready_charger = Coalesce(Sum("summary__ready_charger"), 0)
+        )
+
+        return [{
+            "latitude"      : station_cluster["latitude"],
+            "longitude"     : station_cluster["longitude"],
+            "total_station" : station_cluster["count"],
+            "total_charger" : station_cluster["total_charger"],
+            "ready_charger" : station_cluster["ready_charger"]
+        } for station_cluster in station_clusters]
+
 
 class SearchNearestEVView(View):
     def get(self, request):
-        category = Category.STATION.value
+        try:
+            user_latitude  = float(request.GET["user_latitude"])
+            user_longitude = float(request.GET["user_longitude"])
 
-        user_latitude  = float(request.GET.get("user_latitude", None))
-        user_longitude = float(request.GET.get("user_longitude", None)) 
-        user_position  = (user_latitude, user_longitude)
+            index   = station_index()
+            nearest = index.nearest(user_latitude, user_longitude, 1)
 
-        search_position_latitude, search_position_longitude = validate_search_position(user_latitude, user_longitude, category)
+            if not nearest:
+                return JsonResponse({"MESSAGE" : "NO_STATION"}, status=404)
 
-        nearest_station = True
-        range           = 0
+            nearest_distance, nearest_station = nearest[0]
 
-        while nearest_station:
-            range += 1
-            search_range = (
-                    Q(latitude__range  = (search_position_latitude - Length.LATITUDE_100m.value * range, search_position_latitude + Length.LATITUDE_100m.value * range)) &
-                    Q(longitude__range = (search_position_longitude - Length.LONGITUDE_100m.value * range, search_position_longitude + Length.LONGITUDE_100m.value * range))
-                )
+            results = {
+                "nearest_station": {
+                        "km"        : nearest_distance,
+                        "id"        : index.ids[nearest_station],
+                        "name"      : index.names[nearest_station],
+                        "latitude"  : index.coordinates[nearest_station][0],
+                        "longitude" : index.coordinates[nearest_station][1]
+                    }
+                }
 
-            stations = Station.objects.filter(search_range)
-            
-            distances = [haversine(user_position, (station.latitude, station.longitude)) for station in stations]
-            if distances:
-                break
+            return JsonResponse({"results" : results}, status=200)
 
-        nearest_distance = min(distances)
-        nearest_station  = stations[distances.index(nearest_distance)]
+        except KeyError:
+            return JsonResponse({"MESSAGE" : "KEY_ERROR"}, status=400)
 
-        results = {
-            "nearest_station": {
-                    "km"        : nearest_distance,
-                    "id"        : nearest_station.id,
-                    "name"      : nearest_station.name,
-                    "latitude"  : nearest_station.latitude,
-                    "longitude" : nearest_station.longitude
-                }
-            }
+        except ValueError:
+            return JsonResponse({"MESSAGE" : "VALUE_ERROR"}, status=400)
 
-        return JsonResponse({"results" : results}, status=200)
+
+class KNearestEVView(View):
+    def get(self, request):
+        try:
+            user_latitude    = float(request.GET["user_latitude"])
+            user_longitude   = float(request.GET["user_longitude"])
+            k                = min(int(request.GET.get("k", 5)), KNearest.MAX_K.value)
+            outputs          = request.GET.getlist("outputs", None)
+            charger_type_ids = request.GET.getlist("charger_type_ids", None)
+            usable           = request.GET.get("usable", None)
+
+            if k < 1:
+                raise ValueError
+
+            index   = station_index()
+            mask    = index.station_mask(outputs, charger_type_ids, usable == Usable.YES.value)
+            nearest = index.nearest(user_latitude, user_longitude, k, mask)
+
+            results = [{
+                "km"        : distance,
+                "id"        : index.ids[station],
+                "name"      : index.names[station],
+                "latitude"  : index.coordinates[station][0],
+                "longitude" : index.coordinates[station][1]
+            } for distance, station in nearest]
+
+            return JsonResponse({"results" : results}, status=200)
+
+        except KeyError:
+            return JsonResponse({"MESSAGE" : "KEY_ERROR"}, status=400)
+
+        except ValueError:
+            return JsonResponse({"MESSAGE" : "VALUE_ERROR"}, status=400)
+
+
+class EVChangesView(View):
+    """
+    Chargers in the viewport whose status changed after `since`, for clients keeping a local copy
+    of EVMapView. Without `since` only a token is returned; pass it back as `since` on the next call.
+    """
+    def get(self, request):
+        try:
+            SW_latitude  = float(request.GET["SW_latitude"])
+            SW_longitude = float(request.GET["SW_longitude"])
+            NE_latitude  = float(request.GET["NE_latitude"])
+            NE_longitude = float(request.GET["NE_longitude"])
+            since        = request.GET.get("since", None)
+
+            _, token = sync_token()
+
+            if not since:
+                return JsonResponse({"changes" : [], "stations" : [], "token" : token}, status=200)
+
+            changes = changed_chargers(
+                token_time(since),
+                bounding_box(SW_latitude, SW_longitude, NE_latitude, NE_longitude, prefix="station__"),
+                limit=settings.DELTA_SYNC_MAX_CHANGES + 1
+            )
+
+            if len(changes) > settings.DELTA_SYNC_MAX_CHANGES:
+                return JsonResponse({"MESSAGE" : "RESYNC_REQUIRED"}, status=410)
+
+            stations = station_statuses({change["station_id"] for change in changes})
+
+            return JsonResponse({"changes" : changes, "stations" : stations, "token" : token}, status=200)
+
+        except KeyError:
+            return JsonResponse({"MESSAGE" : "KEY_ERROR"}, status=400)
+
+        except ValueError:
+            return JsonResponse({"MESSAGE" : "VALUE_ERROR"}, status=400)
+
+
+class StationsWithCafesView(View):
+    """
+    Stations of the viewport with ready chargers, ranked by the number of cafes within `radius` m
+    (one of settings.STATION_CAFE_RADII_M) and then by the nearest one. Distances come from station_cafes.
+    """
+    def get(self, request):
+        try:
+            SW_latitude  = float(request.GET["SW_latitude"])
+            SW_longitude = float(request.GET["SW_longitude"])
+            NE_latitude  = float(request.GET["NE_latitude"])
+            NE_longitude = float(request.GET["NE_longitude"])
+            radius       = int(request.GET.get("radius", max(settings.STATION_CAFE_RADII_M)))
+            limit        = min(int(request.GET.get("limit", NearbyCafes.STATIONS.value)), Page.MAX_LIMIT.value)
+
+            if radius not in settings.STATION_CAFE_RADII_M or limit < 1:
+                raise ValueError
+
+            ranking = list(StationCafe.objects
+                .filter(bounding_box(SW_latitude, SW_longitude, NE_latitude, NE_longitude, prefix="station__"))
+                .filter(distance__lte=radius, station__summary__ready_charger__gt=0)
+                .values("station_id")
+                .annotate(nearby_cafes=Count("id"), nearest_cafe=Min("distance"))
+                .order_by("-nearby_cafes", "nearest_cafe", "station_id")[:limit]
+            )
+
+            stations      = Station.objects.select_related("summary").in_bulk([rank["station_id"] for rank in ranking])
+            station_cafes = StationCafe.objects\
+                .select_related("cafe")\
+                .filter(station_id__in=stations, distance__lte=radius)\
+                .order_by("station_id", "distance")
+
+            cafes_by_station = defaultdict(list)
+            for station_cafe in station_cafes:
+                cafes_by_station[station_cafe.station_id].append(station_cafe)
+
+            results = [{
+                "id"            : station.id,
+                "name"          : station.name,
+                "latitude"      : station.latitude,
+                "longitude"     : station.longitude,
+                "ready_charger" : station.summary.ready_charger,
+                "total_charger" : station.summary.total_charger,
+                "nearby_cafes"  : rank["nearby_cafes"],
+                "cafes"         : [{
+                    "id"        : station_cafe.cafe.id,
+                    "name"      : station_cafe.cafe.name,
+                    "latitude"  : station_cafe.cafe.latitude,
+                    "longitude" : station_cafe.cafe.longitude,
+                    "m"         : station_cafe.distance
+                } for station_cafe in cafes_by_station[station.id][:NearbyCafes.CAFES_PER_STATION.value]]
+            } for rank in ranking for station in [stations[rank["station_id"]]]]
+
+            return JsonResponse({"results" : results}, status=200)
+
+        except KeyError:
+            return JsonResponse({"MESSAGE" : "KEY_ERROR"}, status=400)
+
+        except ValueError:
+            return JsonResponse({"MESSAGE" : "VALUE_ERROR"}, status=400)
 
 
 class EVAdminView(View):
+    """
+    Charger counters per region from region_summaries. `history` adds the last snapshots
+    of every region (newest first), one per ingestion run.
+    """
     def get(self, request):
-        regions  = request.GET.getlist("regions", None)
-
-        if regions:
-            regions = Q(city__in = regions)
-
-        regions = Region.objects\
-            .filter(regions)\
-            .annotate(total_station=Count("station", distinct=True))\
-            .annotate(total_charger=Count("station__charger"))\
-            .annotate(communication_abnomal_charger=Count("station__charger__charging_status", Case(When(station__charger__charging_status=ChargingStatus.COMMUNICATION_ABNOMAL.value, then=True))))\
-            .annotate(ready_charger=Count("station__charger__charging_status", Case(When(station__charger__charging_status=ChargingStatus.READY.value, then=True))))\
-            .annotate(charging_charger=Count("station__charger__charging_status", Case(When(station__charger__charging_status=ChargingStatus.CHARGING.value, then=True))))\
-            .annotate(suspending_charger=Count("station__charger__charging_status", Case(When(station__charger__charging_status=ChargingStatus.SUSPENDING.value, then=True))))\
-            .annotate(inspecting_charger=Count("station__charger__charging_status", Case(When(station__charger__charging_status=ChargingStatus.INSPECTING.value, then=True))))\
-            .annotate(not_confirmed_charger=Count("station__charger__charging_status", Case(When(station__charger__charging_status=ChargingStatus.NOT_CONFIRMED.value, then=True))))
+        try:
+            regions = request.GET.getlist("regions", None)
+            history = min(int(request.GET.get("history", 0)), AdminHistory.MAX_SNAPSHOTS.value)
 
-        results = [{
-            "chargers" : {
-                "region"          : region.city,
-                "count_of_status" : {
-                    "total_station"                 : region.total_station,
-                    "total_charger"                 : region.total_charger,
-                    "communication_abnomal_charger" : region.communication_abnomal_charger,
-                    "ready_charger"                 : region.ready_charger,
-                    "charging_charger"              : region.charging_charger,
-                    "suspending_charger"            : region.suspending_charger,
-                    "inspecting_charger"            : region.inspecting_charger,
-                    "not_confirmed_charger"         : region.not_confirmed_charger
+            q = Q()
+
+            if regions:
+                q &= Q(region__city__in=regions)
+
+            summaries = list(RegionSummary.objects.select_related("region").filter(q).order_by("region_id"))
+
+            # every run snapshots all regions at once, so the newest rows hold the last `history` snapshots of each
+            snapshots = defaultdict(list)
+            if history > 0:
+                for snapshot in RegionSnapshot.objects.filter(q).order_by("-taken_at", "region_id")[:history * len(summaries)]:
+                    snapshots[snapshot.region_id].append(snapshot)
+
+            results = [{
+                "chargers" : {
+                    "region"          : summary.region.city,
+                    "count_of_status" : count_of_status(summary),
+                    "history"         : [{
+                        "run"             : snapshot.run_id,
+                        "taken_at"        : snapshot.taken_at,
+                        "count_of_status" : count_of_status(snapshot)
+                    } for snapshot in snapshots[summary.region_id]]
                 }
-            }
-        } for region in regions]
+            } for summary in summaries]
+
+            return JsonResponse({"results" : results}, status=200)
+
+        except ValueError:
+            return JsonResponse({"MESSAGE" : "VALUE_ERROR"}, status=400)
+
+
+def count_of_status(region_counts):
+    return {
+        "total_station"                 : region_counts.total_station,
+        "total_charger"                 : region_counts.total_charger,
+        "communication_abnomal_charger" : region_counts.communication_abnomal_charger,
+        "ready_charger"                 : region_counts.ready_charger,
+        "charging_charger"              : region_counts.charging_charger,
+        "suspending_charger"            : region_counts.suspending_charger,
+        "inspecting_charger"            : region_counts.inspecting_charger,
+        "not_confirmed_charger"         : region_counts.not_confirmed_charger
+    }
+
+
+class IngestionRunView(View):
+    def get(self, request):
+        try:
+            job   = request.GET.get("job", None)
+            limit = min(int(request.GET.get("limit", RunHistory.DEFAULT_LIMIT.value)), RunHistory.MAX_LIMIT.value)
+
+            if limit < 1 or (job and job not in IngestionRun.Job.values):
+                raise ValueError
+
+            q = Q()
+
+            if job:
+                q &= Q(job=job)
+
+            runs = IngestionRun.objects.filter(q).order_by("-started_at")[:limit]
+
+            results = [{
+                "id"               : run.id,
+                "job"              : run.job,
+                "status"           : run.status,
+                "started_at"       : run.started_at,
+                "finished_at"      : run.finished_at,
+                "duration_seconds" : run.duration_seconds,
+                "phases"           : {
+                    "crawl_seconds" : run.crawl_seconds,
+                    "fetch_seconds" : run.fetch_seconds,
+                    "parse_seconds" : run.parse_seconds,
+                    "write_seconds" : run.write_seconds
+                },
+                "pages_fetched"    : run.pages_fetched,
+                "rows"             : run.rows,
+                "rows_per_second"  : run.rows_per_second,
+                "retries"          : run.retries,
+                "skipped"          : run.skipped,
+                "unknown_chargers" : run.unknown_chargers,
+                "peak_memory_kb"   : run.peak_memory_kb,
+                "error"            : run.error,
+                "near_deadline"    : is_near_deadline(run)
+            } for run in runs]
+
+            return JsonResponse({"results" : results}, status=200)
 
-        return JsonResponse({"results" : results}, status=200)
\ No newline at end of file
+        except ValueError:
+            return JsonResponse({"MESSAGE" : "VALUE_ERROR"}, status=400)